@@ -0,0 +1,75 @@
+import threading
+import time
+
+
+class ActivityTracker:
+    """Schedule captures around user activity.
+
+    Remote input boosts the capture rate for ``boost_window`` seconds so
+    interactive use feels snappy. When there has been neither input nor a
+    screen change for ``idle_after`` seconds, streams fall back to a slow
+    ``heartbeat_interval``, and periodic keyframes stretch to
+    ``idle_keyframe_interval``, so idle sessions cost next to nothing.
+    """
+
+    def __init__(self, settings=None):
+        self.settings = {
+            'boost_fps': 30,
+            'boost_window': 1.5,
+            'idle_after': 10.0,
+            'heartbeat_interval': 2.0,
+            'idle_keyframe_interval': 60.0,
+        }
+        self.last_input = 0.0
+        self._wakers = []
+        self._lock = threading.Lock()
+        if settings:
+            self.configure(settings)
+
+    def configure(self, settings):
+        for key in self.settings:
+            if key in settings:
+                self.settings[key] = settings[key]
+
+    def subscribe(self, wake):
+        """Register a callable invoked whenever input arrives"""
+        with self._lock:
+            self._wakers.append(wake)
+
+    def unsubscribe(self, wake):
+        with self._lock:
+            if wake in self._wakers:
+                self._wakers.remove(wake)
+
+    def note_input(self):
+        """Record remote input and wake capture threads so the result shows up quickly"""
+        self.last_input = time.monotonic()
+        with self._lock:
+            wakers = list(self._wakers)
+        for wake in wakers:
+            wake()
+
+    def is_boosted(self):
+        return time.monotonic() - self.last_input < self.settings['boost_window']
+
+    def is_idle(self, last_change):
+        """No input and no screen change for ``idle_after`` seconds"""
+        now = time.monotonic()
+        idle_after = self.settings['idle_after']
+        return now - self.last_input >= idle_after and now - last_change >= idle_after
+
+    def interval(self, base, last_change):
+        """Capture interval given the controller's ``base`` interval"""
+        if self.is_boosted():
+            return min(base, 1.0 / self.settings['boost_fps'])
+        if self.is_idle(last_change):
+            return max(base, self.settings['heartbeat_interval'])
+        return base
+
+    def cursor_interval(self):
+        """Polling interval for cursor position and shape"""
+        if self.is_boosted():
+            return 1.0 / self.settings['boost_fps']
+        if time.monotonic() - self.last_input >= self.settings['idle_after']:
+            return 0.5
+        return 0.1
@@ -0,0 +1,233 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from telemetry import FIELDS, TelemetrySampler
+
+# Shorthand rule types mapped to the telemetry metric they watch
+RULE_METRICS = {
+    'cpu': 'cpu_percent',
+    'memory': 'memory_percent',
+    'disk': 'disk_percent',
+    'network': 'net_recv_rate',
+}
+PROCESS_METRICS = ('cpu_percent', 'memory_percent')
+AGGREGATES = {
+    'avg': lambda values: sum(values) / len(values),
+    'min': min,
+    'max': max,
+}
+
+
+class AlertRule:
+    """A threshold on a metric, evaluated over a rolling window with hysteresis.
+
+    The rule fires when the window aggregate rises above ``threshold`` and
+    resolves only once it drops below ``clear_threshold``, so a value
+    hovering around the threshold does not flap. After resolving, the rule
+    stays quiet for ``cooldown`` seconds.
+    """
+
+    def __init__(self, rule_id: str, type: str, threshold: float, metric: Optional[str] = None,
+                 clear_threshold: Optional[float] = None, window: float = 30.0, aggregate: str = 'avg',
+                 cooldown: float = 60.0, severity: str = 'warning', name: Optional[str] = None):
+        if type == 'process':
+            metric = metric or 'cpu_percent'
+            if metric not in PROCESS_METRICS:
+                raise ValueError(f"Unknown process metric: {metric}")
+        else:
+            metric = metric or RULE_METRICS.get(type)
+            if metric not in FIELDS[1:]:
+                raise ValueError(f"Unknown alert metric: {metric}")
+        if aggregate not in AGGREGATES:
+            raise ValueError(f"Unknown aggregate: {aggregate}")
+        self.rule_id = rule_id
+        self.type = type
+        self.metric = metric
+        self.threshold = float(threshold)
+        self.clear_threshold = float(threshold * 0.9 if clear_threshold is None else clear_threshold)
+        self.window = float(window)
+        self.aggregate = aggregate
+        self.cooldown = float(cooldown)
+        self.severity = severity
+        self.name = name  # Process name filter for process rules
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, object]) -> 'AlertRule':
+        """Build a rule from settings; without an ``id`` it is named after its type, name and metric"""
+        rule = cls(
+            data.get('id'),
+            data['type'],
+            data['threshold'],
+            metric=data.get('metric'),
+            clear_threshold=data.get('clear_threshold'),
+            window=data.get('window', 30.0),
+            aggregate=data.get('aggregate', 'avg'),
+            cooldown=data.get('cooldown', 60.0),
+            severity=data.get('severity', 'warning'),
+            name=data.get('name')
+        )
+        if not rule.rule_id:
+            rule.rule_id = ':'.join(part for part in (rule.type, rule.name, rule.metric) if part)
+        return rule
+
+    def describe(self) -> Dict[str, object]:
+        return {
+            'id': self.rule_id,
+            'type': self.type,
+            'metric': self.metric,
+            'threshold': self.threshold,
+            'clear_threshold': self.clear_threshold,
+            'window': self.window,
+            'aggregate': self.aggregate,
+            'cooldown': self.cooldown,
+            'severity': self.severity,
+            'name': self.name,
+        }
+
+
+class _AlertState:
+    __slots__ = ('firing', 'since', 'resolved_at', 'value')
+
+    def __init__(self):
+        self.firing = False
+        self.since = None
+        self.resolved_at = None
+        self.value = None
+
+
+class AlertEngine:
+    """Evaluate alert rules against cached telemetry and report state transitions.
+
+    Metric rules read the sampler's ring buffer; process rules read the
+    process tracker's cached rows and keep a short window per process.
+    ``evaluate`` only returns transitions (firing or resolved), so sustained
+    load produces one alert rather than one per tick. Rules and state are
+    guarded by a lock, since rules are replaced from the event loop while
+    evaluation runs on a worker thread.
+    """
+
+    def __init__(self, sampler: TelemetrySampler, processes=None):
+        self.sampler = sampler
+        self.processes = processes
+        self.rules: List[AlertRule] = []
+        self._states: Dict[tuple, _AlertState] = {}
+        self._process_windows: Dict[tuple, deque] = {}
+        self._lock = threading.Lock()
+
+    def set_rules(self, rules: List[AlertRule]):
+        """Replace the rule set; state is kept for rules whose id survives"""
+        ids = {rule.rule_id for rule in rules}
+        with self._lock:
+            self.rules = list(rules)
+            for key in [key for key in self._states if key[0] not in ids]:
+                del self._states[key]
+            for key in [key for key in self._process_windows if key[0] not in ids]:
+                del self._process_windows[key]
+
+    def _metric_window(self, rule: AlertRule, now: float) -> List[float]:
+        last = int(rule.window / self.sampler.interval) + 1
+        columns = self.sampler.snapshot(('timestamp', rule.metric), last)
+        timestamps, values = columns['timestamp'], columns[rule.metric]
+        return [value for timestamp, value in zip(timestamps, values) if now - timestamp <= rule.window]
+
+    def _process_values(self, rule: AlertRule, now: float) -> Dict[tuple, List[float]]:
+        """Window of values per matching process, keyed by (rule id, pid, name)"""
+        if self.processes is None:
+            return {}
+        windows = {}
+        for row in self.processes.current(rule.name):
+            key = (rule.rule_id, row['pid'], row['name'])
+            window = self._process_windows.setdefault(key, deque())
+            window.append((now, row[rule.metric]))
+            while window and now - window[0][0] > rule.window:
+                window.popleft()
+            windows[key] = [value for _, value in window]
+        # Processes that went away resolve through an empty window
+        for key in [key for key in self._process_windows if key[0] == rule.rule_id and key not in windows]:
+            del self._process_windows[key]
+            windows[key] = []
+        return windows
+
+    def _transition(self, rule: AlertRule, key: tuple, values: List[float], now: float) -> Optional[dict]:
+        value = AGGREGATES[rule.aggregate](values) if values else None
+        state = self._states.get(key)
+        if state is None or not state.firing:
+            if value is None:
+                # Nothing sampled yet, or the process is gone
+                if len(key) > 1:
+                    self._states.pop(key, None)
+                return None
+            if value <= rule.threshold:
+                return None
+            if state is not None and now - state.resolved_at < rule.cooldown:
+                return None
+            state = self._states[key] = self._states.get(key) or _AlertState()
+            state.firing, state.since, state.value = True, now, value
+            status = 'firing'
+        else:
+            state.value = value
+            if value is not None and value >= rule.clear_threshold:
+                return None
+            state.firing, state.resolved_at = False, now
+            status = 'resolved'
+            if value is None:
+                # The subject is gone; nothing left to cool down
+                del self._states[key]
+
+        alert = {
+            'rule': rule.rule_id,
+            'type': rule.type,
+            'metric': rule.metric,
+            'status': status,
+            'severity': rule.severity,
+            'value': value,
+            'threshold': rule.threshold,
+            'since': datetime.fromtimestamp(state.since).isoformat(),
+            'timestamp': datetime.fromtimestamp(now).isoformat(),
+        }
+        if rule.type == 'process':
+            alert['pid'], alert['name'] = key[1], key[2]
+        return alert
+
+    def evaluate(self, now: Optional[float] = None) -> List[dict]:
+        """Evaluate every rule once and return the alerts that changed state"""
+        now = time.time() if now is None else now
+        alerts = []
+        with self._lock:
+            for rule in self.rules:
+                if rule.type == 'process':
+                    series = self._process_values(rule, now)
+                else:
+                    series = {(rule.rule_id,): self._metric_window(rule, now)}
+                for key, values in series.items():
+                    alert = self._transition(rule, key, values, now)
+                    if alert is not None:
+                        alerts.append(alert)
+        return alerts
+
+    def active(self) -> List[dict]:
+        """Alerts currently firing"""
+        with self._lock:
+            rules = {rule.rule_id: rule for rule in self.rules}
+            states = list(self._states.items())
+        active = []
+        for key, state in states:
+            rule = rules.get(key[0])
+            if rule is None or not state.firing:
+                continue
+            alert = {
+                'rule': rule.rule_id,
+                'type': rule.type,
+                'metric': rule.metric,
+                'severity': rule.severity,
+                'value': state.value,
+                'threshold': rule.threshold,
+                'since': datetime.fromtimestamp(state.since).isoformat(),
+            }
+            if rule.type == 'process':
+                alert['pid'], alert['name'] = key[1], key[2]
+            active.append(alert)
+        return active
@@ -0,0 +1,33 @@
+import random
+from typing import Optional
+
+
+class Backoff:
+    """Exponential backoff with full jitter.
+
+    Each delay is drawn uniformly between zero and ``base * factor ** attempt``
+    (capped at ``cap``), so clients that lose the same server at the same
+    moment spread their reconnects out instead of arriving together.
+    """
+
+    def __init__(self, base: float = 1.0, cap: float = 60.0, factor: float = 2.0,
+                 rng: Optional[random.Random] = None):
+        self.base = base
+        self.cap = cap
+        self.factor = factor
+        self.attempts = 0
+        self._rng = rng or random.Random()
+
+    def ceiling(self) -> float:
+        """Upper bound of the next delay"""
+        return min(self.cap, self.base * self.factor ** self.attempts)
+
+    def next_delay(self) -> float:
+        ceiling = self.ceiling()
+        if ceiling < self.cap:
+            # Stop counting once capped so the exponent cannot overflow
+            self.attempts += 1
+        return self._rng.uniform(0, ceiling)
+
+    def reset(self):
+        self.attempts = 0
@@ -0,0 +1,90 @@
+"""Benchmark the frame encoder backends on recorded or synthetic desktop frames.
+
+Reports encode time, output size and PSNR against the source frame for every
+encoder available on this machine:
+
+    python benchmarks/bench_encoders.py --frames-dir recorded/ --quality 70
+    python benchmarks/bench_encoders.py --width 1920 --height 1080
+"""
+import argparse
+import io
+import math
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_encoders import ENCODERS, available_encoders  # noqa: E402
+from bench_frame_copies import SyntheticShot  # noqa: E402
+
+
+def load_frames(args):
+    """Recorded screenshots from ``--frames-dir``, or one synthetic frame"""
+    if args.frames_dir:
+        frames = []
+        for name in sorted(os.listdir(args.frames_dir)):
+            if name.lower().endswith(('.png', '.bmp', '.jpg', '.jpeg')):
+                with Image.open(os.path.join(args.frames_dir, name)) as img:
+                    frames.append(img.convert('RGB'))
+        if not frames:
+            raise SystemExit(f"No frames found in {args.frames_dir}")
+        return frames
+    shot = SyntheticShot(args.width, args.height)
+    return [Image.frombuffer('RGB', shot.size, shot.raw, 'raw', 'BGRX', 0, 1)]
+
+
+def psnr(original, encoded_bytes):
+    """Peak signal-to-noise ratio of the decoded output, in dB"""
+    decoded = Image.open(io.BytesIO(encoded_bytes)).convert('RGB')
+    diff = np.asarray(original, dtype=np.float32) - np.asarray(decoded, dtype=np.float32)
+    mse = float(np.mean(diff * diff))
+    return math.inf if mse == 0 else 10 * math.log10(255.0 ** 2 / mse)
+
+
+def bench(encoder, frames, quality, repeat):
+    timings, sizes, scores = [], [], []
+    for frame in frames:
+        out = io.BytesIO()
+        for _ in range(repeat):
+            out.seek(0)
+            out.truncate()
+            started = time.perf_counter()
+            encoder.encode(frame, quality, out)
+            timings.append(time.perf_counter() - started)
+        data = out.getvalue()
+        sizes.append(len(data))
+        scores.append(psnr(frame, data))
+    return (sum(timings) / len(timings) * 1000,
+            sum(sizes) / len(sizes) / 1000,
+            sum(scores) / len(scores))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--frames-dir', help="Directory of recorded screenshots")
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--quality', type=int, default=80)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--encoders', nargs='*', help="Subset of encoders to run")
+    args = parser.parse_args()
+
+    frames = load_frames(args)
+    names = args.encoders or available_encoders()
+    print(f"{len(frames)} frame(s) {frames[0].size[0]}x{frames[0].size[1]} quality={args.quality}")
+    print(f"{'encoder':<12}{'encode ms':>12}{'size KB':>12}{'PSNR dB':>12}")
+    for name in names:
+        encoder = ENCODERS[name]
+        if not encoder.available():
+            print(f"{name:<12}{'unavailable':>12}")
+            continue
+        ms, kb, score = bench(encoder, frames, args.quality, args.repeat)
+        print(f"{name:<12}{ms:>12.2f}{kb:>12.1f}{score:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
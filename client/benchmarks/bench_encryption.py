@@ -0,0 +1,74 @@
+"""Compare encryption throughput for the old Fernet path and the AEAD fast path.
+
+Payloads are random, frame-sized and incompressible, like encoded JPEG frames:
+
+    python benchmarks/bench_encryption.py --sizes 65536 262144 1048576 --rounds 50
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from secure_connection import SecureConnection, derive_key  # noqa: E402
+
+
+def old_encrypt(connection, frame):
+    """Baseline: base64 frame in a JSON message -> Fernet token"""
+    message = {'type': 'screen_frame', 'data': base64.b64encode(frame).decode()}
+    return connection.fernet.encrypt(json.dumps(message).encode())
+
+
+def old_decrypt(connection, token):
+    message = json.loads(connection.fernet.decrypt(token))
+    return base64.b64decode(message['data'])
+
+
+def measure(function, argument, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        result = function(argument)
+    return time.perf_counter() - start, result
+
+
+def run(args):
+    key = 'benchmark-key'
+    derive_key.cache_clear()
+    start = time.perf_counter()
+    derive_key(key)
+    cold = time.perf_counter() - start
+    start = time.perf_counter()
+    derive_key(key)
+    warm = time.perf_counter() - start
+    print(f"key derivation: cold {cold * 1000:.1f} ms, cached {warm * 1e6:.1f} us")
+
+    fernet = SecureConnection('', key, cipher='fernet')
+    paths = [('fernet+base64', lambda frame: old_encrypt(fernet, frame), lambda token: old_decrypt(fernet, token))]
+    for cipher in ('aesgcm', 'chacha20'):
+        connection = SecureConnection('', key, cipher=cipher)
+        paths.append((cipher, connection.encrypt_message, connection.decrypt_message))
+
+    print(f"{'payload':>9} {'path':<14} {'encrypt MB/s':>13} {'decrypt MB/s':>13} {'wire bytes':>11}")
+    for size in args.sizes:
+        frame = os.urandom(size)
+        megabytes = size * args.rounds / 1e6
+        for name, encrypt, decrypt in paths:
+            encrypt_time, wire = measure(encrypt, frame, args.rounds)
+            decrypt_time, plain = measure(decrypt, wire, args.rounds)
+            assert plain == frame
+            print(f"{size:>9} {name:<14} {megabytes / encrypt_time:>13.1f} "
+                  f"{megabytes / decrypt_time:>13.1f} {len(wire):>11}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[64 * 1024, 256 * 1024, 1024 * 1024])
+    parser.add_argument('--rounds', type=int, default=50)
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
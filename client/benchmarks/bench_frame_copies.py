@@ -0,0 +1,199 @@
+"""Compare bytes copied and time per frame for the old and zero-copy capture paths.
+
+Copies are measured, not assumed: every buffer produced along the way (pixel
+slices, Pillow images, encoder writes, base64/JSON text, and the masked
+websocket frame the client sends) is counted from the real object at that
+boundary. The Python-heap peak per frame is measured with tracemalloc; Pillow
+keeps pixels outside the Python heap, so images only show up in the counts.
+Runs on synthetic desktop-like BGRA frames, so no display is needed:
+
+    python benchmarks/bench_frame_copies.py --width 2560 --height 1440 --frames 30
+"""
+import argparse
+import base64
+import io
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+from PIL import Image
+from websockets.frames import Frame, Opcode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_buffer import FrameBuffer, FrameBufferPool  # noqa: E402
+from frame_protocol import SCREEN_FRAME, pack_message, pack_prefix  # noqa: E402
+
+
+# Bytes per pixel of Pillow's in-memory storage; multi-band modes are padded to 4
+PIXEL_BYTES = {'1': 1, 'L': 1, 'P': 1, 'RGB': 4, 'RGBA': 4, 'RGBX': 4}
+
+
+class CopyCounter:
+    """Sum of bytes written into buffers, taken from each buffer as it is produced"""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def __call__(self, obj):
+        if isinstance(obj, Image.Image):
+            self.bytes += obj.size[0] * obj.size[1] * PIXEL_BYTES[obj.mode]
+        elif isinstance(obj, memoryview):
+            self.bytes += obj.nbytes
+        else:
+            self.bytes += len(obj)
+        return obj
+
+
+class CountingWriter:
+    """File wrapper counting what an encoder writes into it"""
+
+    def __init__(self, file, count):
+        self.file = file
+        self.count = count
+
+    def write(self, data):
+        self.count(data)
+        return self.file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+
+def _uncounted(obj):
+    return obj
+
+
+class SyntheticShot:
+    """Mimics mss.ScreenShot: raw BGRA bytes plus a lazily converted ``rgb``"""
+
+    def __init__(self, width, height, seed=0):
+        self.size = (width, height)
+        self.count = _uncounted
+        rng = random.Random(seed)
+        row = bytearray()
+        # Flat UI-like bands with a little noise, roughly what desktops look like
+        for x in range(width):
+            shade = (x // 97) * 23 % 256
+            row += bytes((shade, (shade + 40) % 256, (shade + 80) % 256, 255))
+        raw = bytearray()
+        for y in range(height):
+            line = bytearray(row)
+            if y % 17 == 0:
+                for _ in range(width // 50):
+                    line[rng.randrange(0, width) * 4] = rng.randrange(256)
+            raw += line
+        self.raw = raw
+
+    @property
+    def rgb(self):
+        # Same slicing mss uses for ScreenShot.rgb
+        rgb = bytearray(self.size[0] * self.size[1] * 3)
+        raw = self.raw
+        for target, source in ((0, 2), (1, 1), (2, 0)):
+            # The strided slice copies one channel out, then it is copied into place
+            channel = self.count(raw[source::4])
+            rgb[target::3] = self.count(channel)
+        return self.count(bytes(rgb))
+
+
+def send_path(message, binary, count):
+    """What the client does after encoding: JSON text if needed, then a masked websocket frame"""
+    if binary:
+        frame = Frame(Opcode.BINARY, message)
+    else:
+        text = count(json.dumps({'type': 'screen_frame', 'data': message}))
+        frame = Frame(Opcode.TEXT, count(text.encode()))
+    # Clients must mask every frame, which copies the whole payload
+    count(frame.serialize(mask=True))
+
+
+def old_path(shot, scale, quality, binary, count=_uncounted):
+    """Baseline: screen.rgb -> frombytes -> resize -> BytesIO -> getvalue -> base64/join"""
+    shot.count = count
+    img = count(Image.frombytes('RGB', shot.size, shot.rgb))
+    if scale != 1.0:
+        img = count(img.resize(tuple(int(dim * scale) for dim in img.size), Image.LANCZOS))
+    buffer = io.BytesIO()
+    img.save(CountingWriter(buffer, count), format='JPEG', quality=quality)
+    encoded = len(buffer.getbuffer())
+    data = count(buffer.getvalue())
+    if binary:
+        message = count(pack_message(SCREEN_FRAME, 1, 1, data, {'width': img.size[0], 'height': img.size[1]}))
+    else:
+        message = count(count(base64.b64encode(data)).decode())
+    send_path(message, binary, count)
+    return encoded
+
+
+def new_path(shot, scale, quality, binary, pool, count=_uncounted):
+    """Zero-copy: frombuffer(BGRX) -> resize -> reused FrameBuffer -> header in headroom"""
+    # The BGRX raw decoder converts into a new RGB image: the one pixel copy left
+    img = count(Image.frombuffer('RGB', shot.size, shot.raw, 'raw', 'BGRX', 0, 1))
+    if scale != 1.0:
+        img = count(img.resize(tuple(int(dim * scale) for dim in img.size), Image.LANCZOS))
+    buffer = pool.acquire()
+    img.save(CountingWriter(buffer.file, count), format='JPEG', quality=quality)
+    end = buffer.tell()
+    encoded = end - FrameBuffer.HEADROOM
+    if binary:
+        prefix = count(pack_prefix(SCREEN_FRAME, 1, 1, encoded, {'width': img.size[0], 'height': img.size[1]}))
+        message = buffer.finish(prefix, end)
+        send_path(message, binary, count)
+        message.release()
+    else:
+        message = count(count(base64.b64encode(buffer.view(FrameBuffer.HEADROOM, end))).decode())
+        send_path(message, binary, count)
+    pool.release(buffer)
+    return encoded
+
+
+def measure(func):
+    """Bytes copied and Python-heap peak for one frame"""
+    count = CopyCounter()
+    tracemalloc.start()
+    try:
+        func(count)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return count.bytes, peak
+
+
+def run(args):
+    shot = SyntheticShot(args.width, args.height)
+    pool = FrameBufferPool(2)
+    print(f"{args.width}x{args.height} scale={args.scale} quality={args.quality} "
+          f"binary={args.binary} frames={args.frames}")
+    print(f"{'path':<10}{'copied MB/frame':>18}{'heap peak MB':>15}{'encoded KB':>14}{'ms/frame':>12}")
+    paths = (
+        ('old', lambda count=_uncounted: old_path(shot, args.scale, args.quality, args.binary, count)),
+        ('zero-copy', lambda count=_uncounted: new_path(shot, args.scale, args.quality, args.binary, pool, count)),
+    )
+    for name, func in paths:
+        # Counted once, then timed without tracing so the overhead does not skew timings
+        copied, peak = measure(func)
+        encoded = 0
+        started = time.perf_counter()
+        for _ in range(args.frames):
+            encoded = func()
+        elapsed = (time.perf_counter() - started) / args.frames
+        print(f"{name:<10}{copied / 1e6:>18.2f}{peak / 1e6:>15.2f}{encoded / 1e3:>14.1f}{elapsed * 1000:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--width', type=int, default=2560)
+    parser.add_argument('--height', type=int, default=1440)
+    parser.add_argument('--scale', type=float, default=1.0)
+    parser.add_argument('--quality', type=int, default=80)
+    parser.add_argument('--frames', type=int, default=20)
+    parser.add_argument('--binary', action='store_true', help="Use binary framing instead of base64 JSON")
+    run(parser.parse_args())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import asyncio
+import logging
+import threading
+import time
+
+import mss
+
+
+class CapturePipeline:
+    """Run screen capture and encoding on a dedicated worker thread.
+
+    The worker calls ``produce(sct)`` at the pace given by ``interval()`` and
+    hands finished frames to the event loop through a small bounded queue. When
+    the consumer falls behind, the oldest queued frame is dropped (and passed to
+    ``on_drop``) so the loop only ever sends recent frames.
+    """
+
+    def __init__(self, produce, interval, maxsize: int = 2, name: str = 'capture', on_drop=None):
+        self.logger = logging.getLogger(__name__)
+        self._produce = produce
+        self._interval = interval
+        self._on_drop = on_drop
+        self._queue = asyncio.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._loop = None
+        self.name = name
+        self.dropped = 0
+
+    def start(self, loop=None):
+        """Start the worker thread, delivering frames to ``loop``"""
+        self._loop = loop or asyncio.get_running_loop()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Ask the worker thread to exit after its current frame"""
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        """Capture the next frame now instead of waiting out the interval"""
+        self._wake.set()
+
+    def _sleep(self, seconds):
+        self._wake.wait(seconds)
+        self._wake.clear()
+
+    async def get(self):
+        """Wait for the next encoded frame"""
+        return await self._queue.get()
+
+    def _put(self, frame):
+        """Queue a frame on the event loop thread, dropping the oldest when full"""
+        if self._queue.full():
+            dropped = self._queue.get_nowait()
+            self.dropped += 1
+            if self._on_drop:
+                self._on_drop(dropped)
+        self._queue.put_nowait(frame)
+
+    def _run(self):
+        # mss handles are bound to the thread that created them
+        with mss.mss() as sct:
+            while not self._stop.is_set() and not self._loop.is_closed():
+                started = time.monotonic()
+                try:
+                    frame = self._produce(sct)
+                    if frame is not None:
+                        self._loop.call_soon_threadsafe(self._put, frame)
+                except Exception as e:
+                    self.logger.error(f"Capture pipeline error: {e}")
+                    self._sleep(1)  # Prevent rapid retries on error
+                    continue
+
+                elapsed = time.monotonic() - started
+                self._sleep(max(0.0, self._interval() - elapsed))
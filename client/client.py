@@ -1,5 +1,6 @@
 import asyncio
 import json
+import math
 import os
 import platform
 import psutil
@@ -17,36 +18,87 @@ import ctypes
 import signal
 import shutil
 import logging
+import time
 import mss
+from concurrent.futures import ThreadPoolExecutor
+import frame_protocol
+from backoff import Backoff
 from file_manager import FileManager
+from frame_encoders import available_encoders
 from remote_control import RemoteControl
+from telemetry import FIELDS as TELEMETRY_FIELDS, TelemetrySampler
+from metrics_history import MetricsHistory
+from process_snapshot import ProcessTracker
+from alerts import AlertEngine, AlertRule
+from command_dispatcher import CommandDispatcher
+from send_queue import (
+    DEFAULT_WINDOWS, OutboundQueue, PRIORITY_CONTROL, PRIORITY_FILE, PRIORITY_FRAME, PRIORITY_INPUT,
+    PRIORITY_NAMES
+)
+from transfer_engine import TransferEngine
+from ws_compression import CompressionPolicy, client_extensions, validate_settings as validate_network_settings
 
 class RemoteDesktopClient:
+    # Seconds a connection must last before the reconnect backoff starts over
+    STABLE_CONNECTION = 30.0
+
     def __init__(self):
         self.client_id = str(uuid.uuid4())
         self.keyboard = KeyboardController()
         self.mouse = MouseController()
         self.ws = None
+        self.outbound = None
+        self.binary_frames = False
+        # Issued by the server; presenting it on reconnect resumes the session
+        self.session_token = None
+        self.streaming = False
+        self.backoff = Backoff(base=1.0, cap=60.0)
         self.blocked_apps = set()
         self.file_manager = FileManager()
-        self.remote_control = RemoteControl(
-            os.getenv('REMOTE_SERVER_URL', 'ws://localhost:3002'),
-            os.getenv('ENCRYPTION_KEY', 'default-key')
-        )
+        self.transfers = TransferEngine(self.file_manager, self.send)
+        self.telemetry = TelemetrySampler()
+        self.history = MetricsHistory(self.telemetry)
+        self.metrics_pushed_until = 0.0
+        self.processes = ProcessTracker()
+        self.alerts = AlertEngine(self.telemetry, self.processes)
+        # Evaluation, including process table refreshes for process rules, stays on one thread
+        self.alert_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='alerts')
+        self.dispatcher = CommandDispatcher(self.send_response)
+        self.compression = CompressionPolicy()
+        # Shares this client's connection rather than opening its own
+        self.remote_control = RemoteControl()
         self.settings = {
             'monitoring': {
                 'updateInterval': 5,
                 'enableNotifications': True,
                 'cpuThreshold': 80,
                 'memoryThreshold': 80,
+                'diskThreshold': 90,
+                'alertWindow': 30,  # Seconds of samples averaged before an alert fires
+                'alertCooldown': 60,  # Seconds an alert stays quiet after resolving
+                'alertRules': [],  # Extra rules, e.g. {'type': 'process', 'name': 'chrome', 'threshold': 50}
+                'maxSampleAge': 2,  # Seconds a cached telemetry sample may be served for
+                'historyPushInterval': 10,  # Seconds between metrics_batch messages; 0 disables
             },
             'security': {
                 'encryptionEnabled': False,
                 'logLevel': 'info',
                 'autoBlockSuspicious': True,
+            },
+            'network': {
+                # permessage-deflate; level, window and memory apply from the next connection
+                'compression': True,
+                'compressionLevel': 6,
+                'compressionWindowBits': 12,  # 4 KB LZ77 window each way
+                'compressionMemLevel': 5,
+                'compressionMinSize': 256,  # Smaller messages are sent as-is
+                'compressBinary': False,  # Frames and file chunks are already compressed
             }
         }
         self.setup_logging()
+        self.configure_alerts()
+        self.configure_compression()
+        self.register_commands()
         # Generate encryption key - in production this should be securely distributed
         self.key = Fernet.generate_key()
         self.cipher = Fernet(self.key)
@@ -66,142 +118,427 @@ class RemoteDesktopClient:
         self.logger = logging.getLogger(__name__)
 
     async def connect(self):
+        self.telemetry.start()
         while True:
+            connected_at = None
             try:
-                self.ws = await websockets.connect('ws://localhost:3002')
-                await self.register()
-                await self.message_loop()
+                self.ws = await self.open_connection('ws://localhost:3002')
+                connected_at = time.monotonic()
+                self.binary_frames = False
+                # A single writer owns the socket; everything else enqueues
+                self.outbound = OutboundQueue()
+                writer = asyncio.create_task(self.writer_loop(self.ws, self.outbound))
+                pusher = asyncio.create_task(self.push_metrics())
+                monitor = asyncio.create_task(self.monitor_system())
+                reaper = asyncio.create_task(self.expire_uploads())
+                try:
+                    await self.register()
+                    await self.message_loop()
+                finally:
+                    writer.cancel()
+                    pusher.cancel()
+                    monitor.cancel()
+                    reaper.cancel()
+                    self.dispatcher.cancel_all()
+                    await self.outbound.close()
+                    # Transfers keep their offsets and wait for a resumed session or resume_download
+                    self.transfers.pause_all()
+                    # Nobody is left to finish uploads; drop their open files and .part files
+                    aborted = self.file_manager.abort_uploads()
+                    if aborted:
+                        self.logger.info(f"Aborted {aborted} unfinished uploads")
+                    # Stop capturing while offline; self.streaming remembers to restart on resume
+                    self.remote_control.stop_screen_stream()
             except Exception as e:
                 print(f"Connection error: {e}")
-                await asyncio.sleep(5)  # Wait before reconnecting
+            if connected_at is not None and time.monotonic() - connected_at >= self.STABLE_CONNECTION:
+                self.backoff.reset()
+            await asyncio.sleep(self.backoff.next_delay())
+
+    def open_connection(self, url):
+        network = self.settings['network']
+        if not network['compression']:
+            return websockets.connect(url, compression=None)
+        return websockets.connect(url, compression=None, extensions=client_extensions(
+            self.compression,
+            level=network['compressionLevel'],
+            window_bits=network['compressionWindowBits'],
+            mem_level=network['compressionMemLevel']
+        ))
+
+    def configure_compression(self):
+        """Apply the per-message compression policy from the network settings"""
+        network = self.settings['network']
+        self.compression.min_size = network['compressionMinSize']
+        self.compression.compress_binary = network['compressBinary']
 
     async def register(self):
+        """Register with the server, asking to resume the previous session if there was one"""
         message = {
             'type': 'register',
             'client_id': self.client_id,
-            'system_info': self.get_system_info()
+            # Cached sample; registering never waits for fresh telemetry
+            'system_info': self.get_system_info(max_age=math.inf),
+            'capabilities': {
+                # Binary framing is only used once the server confirms it
+                'binary_frames': frame_protocol.VERSION,
+                # Per-channel windows, enforced once the server agrees to grant credit
+                'flow_control': DEFAULT_WINDOWS
+            }
         }
-        await self.ws.send(json.dumps(message))
+        if self.session_token:
+            message['session_token'] = self.session_token
+        await self.send(message)
+
+    def registered(self, data):
+        """Apply the server's registration reply, restoring streams and transfers on resume"""
+        self.binary_frames = data.get('binary_frames') == frame_protocol.VERSION
+        self.session_token = data.get('session_token')
+        if data.get('flow_control'):
+            self.outbound.enable_flow_control(data['flow_control'])
+        if not data.get('resumed'):
+            # A fresh session: nobody is watching the old stream or waiting for old transfers
+            self.streaming = False
+            discarded = self.transfers.discard_paused()
+            if discarded:
+                self.logger.info(f"Discarded {discarded} transfers from the previous session")
+            return
+        for entry in data.get('transfers') or []:
+            try:
+                # The server reports how far it got, which may be behind what was queued here
+                self.transfers.resume(entry['transfer_id'], entry.get('offset'))
+            except ValueError:
+                self.logger.info(f"Transfer {entry.get('transfer_id')} is no longer known")
+        # Transfers paused before the server relayed any chunk are not in its list
+        restarted = self.transfers.restart_paused()
+        if restarted:
+            self.logger.info(f"Restarted {restarted} transfers the server had no progress for")
+        if self.streaming:
+            self._start_screen_stream()
+
+    async def send(self, message, priority=PRIORITY_CONTROL, key=None, wait=False):
+        """Queue a JSON-serializable dict or binary message for the writer.
+
+        With ``wait`` set, returns True once written or False if it was dropped.
+        """
+        if isinstance(message, (bytes, bytearray, memoryview)):
+            # The server tells binary channels apart by message type
+            payload = message
+        elif priority == PRIORITY_CONTROL:
+            payload = json.dumps(message)
+        else:
+            payload = json.dumps({**message, 'channel': PRIORITY_NAMES[priority]})
+        done = asyncio.get_running_loop().create_future() if wait else None
+        await self.outbound.put(payload, priority, key, done)
+        if done:
+            return await done
+        return True
+
+    async def writer_loop(self, ws, outbound):
+        """Drain the outbound queue onto the socket, highest priority first"""
+        while True:
+            payload, done = await outbound.get()
+            try:
+                await ws.send(payload)
+            except Exception as e:
+                self.logger.error(f"Send error: {str(e)}")
+                if done and not done.done():
+                    done.set_result(False)
+                if isinstance(e, websockets.exceptions.ConnectionClosed):
+                    return
+                continue
+            if done and not done.done():
+                done.set_result(True)
 
     async def message_loop(self):
         try:
             while True:
                 message = await self.ws.recv()
+                if isinstance(message, bytes):
+                    await self.handle_binary(message)
+                    continue
                 data = json.loads(message)
-                await self.handle_command(data)
+                if data.get('type') == 'registration_complete':
+                    self.registered(data)
+                    continue
+                if data.get('type') == 'window_update':
+                    await self.outbound.grant(data.get('channel'), data.get('increment', 0))
+                    continue
+                await self.dispatcher.dispatch(data)
         except websockets.exceptions.ConnectionClosed:
             print("Connection closed")
 
-    async def handle_command(self, data):
-        command = data.get('command')
-        response = {'type': 'response', 'client_id': self.client_id}
+    async def handle_binary(self, message):
+        """Handle a binary message; currently only upload chunks flow this way.
 
+        Viewers send FILE_CHUNK frames with the upload id as ``stream_id`` and
+        ``client_id``, ``offset`` and ``checksum`` in the metadata; the server
+        routes them to the client named there.
+        """
         try:
-            if command == 'start_stream':
-                settings = data.get('settings', {})
-                self.remote_control.update_stream_settings(settings)
-                self.remote_control.start_screen_stream(
-                    lambda frame: asyncio.create_task(self.ws.send(json.dumps(frame)))
-                )
-                response['data'] = {'success': True}
-            
-            elif command == 'stop_stream':
-                self.remote_control.stop_screen_stream()
-                response['data'] = {'success': True}
-            
-            elif command == 'mouse_event':
-                response['data'] = self.remote_control.handle_mouse_event(
-                    data.get('event_type'),
-                    data.get('x'),
-                    data.get('y'),
-                    data.get('button')
-                )
-            
-            elif command == 'keyboard_event':
-                response['data'] = self.remote_control.handle_keyboard_event(
-                    data.get('event_type'),
-                    data.get('key'),
-                    data.get('modifiers')
-                )
-            
-            elif command == 'take_screenshot':
-                response['data'] = self.remote_control.take_screenshot()
-            
-            # ... existing command handlers ...
-            elif command == 'update_settings':
-                response['data'] = self.update_settings(data.get('settings', {}))
-            elif command == 'get_settings':
-                response['data'] = self.settings
-            elif command == 'list_directory':
-                response['data'] = self.file_manager.list_directory(data.get('path', '/'))
-            elif command == 'download_file':
-                file_path = data.get('path')
-                async for chunk_data in self.file_manager.read_file_chunks(file_path):
-                    # Send chunk data with progress
-                    chunk_response = {
-                        'type': 'file_chunk',
-                        'client_id': self.client_id,
-                        'file_path': file_path,
-                        **chunk_data
-                    }
-                    await self.ws.send(json.dumps(chunk_response))
-                return  # Skip normal response
-            elif command == 'delete_file':
-                response['data'] = self.file_manager.delete_item(data.get('path'))
-            elif command == 'create_directory':
-                response['data'] = self.file_manager.create_directory(data.get('path'))
-            else:
-                # Handle other existing commands
-                response['data'] = await self.handle_system_command(command, data)
+            unpacked = frame_protocol.unpack_message(message)
+        except ValueError as e:
+            self.logger.error(f"Invalid binary message: {str(e)}")
+            return
+        upload_id = unpacked['stream_id']
+        if unpacked['msg_type'] != frame_protocol.FILE_CHUNK or upload_id not in self.file_manager.uploads:
+            return
+        meta = unpacked['meta']
+        ack = await self.file_manager.write_upload_chunk(
+            upload_id, meta.get('offset', 0), unpacked['payload'], meta.get('checksum')
+        )
+        # One ack per chunk lets the sender keep its window of chunks in flight full
+        await self.send({'type': 'upload_ack', 'client_id': self.client_id, **ack}, PRIORITY_FILE)
 
-            if self.settings['security']['encryptionEnabled']:
-                response = self.encrypt_response(response)
-            
+    async def send_response(self, data, result, error):
+        """Reply to a command, correlated by the sender's request_id"""
+        command = data.get('command')
+        response = {'type': 'response', 'client_id': self.client_id, 'command': command}
+        if data.get('request_id') is not None:
+            response['request_id'] = data['request_id']
+        if error is not None:
+            self.logger.error(f"Error handling command {command}: {str(error)}")
+            response['error'] = str(error)
+        else:
+            response['data'] = result
             self.logger.info(f"Handled command: {command}")
-        except Exception as e:
-            self.logger.error(f"Error handling command {command}: {str(e)}")
-            response['error'] = str(e)
 
-        await self.ws.send(json.dumps(response))
+        if self.settings['security']['encryptionEnabled']:
+            response = self.encrypt_response(response)
+        spec = self.dispatcher.commands.get(command)
+        # Input acks travel on the input channel, ahead of everything else
+        priority = PRIORITY_INPUT if spec and spec.command_class == 'input' else PRIORITY_CONTROL
+        await self.send(response, priority)
 
-    async def handle_system_command(self, command, data):
-        """Handle system-related commands separately"""
-        if command == 'shutdown':
-            if platform.system() == 'Windows':
-                os.system('shutdown /s /t 0')
-            else:
-                os.system('shutdown -h now')
-            return {'success': True}
-        elif command == 'restart':
-            if platform.system() == 'Windows':
-                os.system('shutdown /r /t 0')
-            else:
-                os.system('reboot')
-            return {'success': True}
-        elif command == 'screenshot':
-            return self.take_screenshot()
-        elif command == 'get_system_info':
-            return self.get_system_info()
-        elif command == 'block_website':
-            return self.block_website(data.get('website'))
-        elif command == 'process_list':
-            return self.get_process_list()
-        elif command == 'block_application':
-            return self.block_application(data.get('app_name'))
-        elif command == 'unblock_application':
-            return self.unblock_application(data.get('app_name'))
-        elif command == 'get_blocked_apps':
-            return list(self.blocked_apps)
-        elif command == 'terminate_process':
-            return self.terminate_process(data.get('pid'))
-        
-        return {'error': 'Unknown command'}
+    def register_commands(self):
+        """Command table: name -> (handler, class, runs on a thread)"""
+        fm = self.file_manager
+        rc = self.remote_control
+        commands = {
+            # Streaming
+            'start_stream': (self.start_stream, 'stream', False),
+            'stop_stream': (self.stop_stream, 'stream', False),
+            'update_stream_settings': (self.update_stream_settings, 'stream', False),
+            'request_keyframe': (self.request_keyframe, 'stream', False),
+            'take_screenshot': (self.take_remote_screenshot, 'system', False),
+            'list_monitors': (lambda data: rc.list_monitors(), 'system', True),
+            'list_encoders': (lambda data: available_encoders(), 'control', False),
+
+            # Settings and monitoring
+            'update_settings': (lambda data: self.update_settings(data.get('settings', {})), 'control', False),
+            'get_settings': (lambda data: self.settings, 'control', False),
+            'get_metrics_history': (
+                lambda data: self.history.query(
+                    data.get('start'), data.get('end'), data.get('resolution'), data.get('metrics')
+                ),
+                'system', True
+            ),
+            'get_alerts': (
+                lambda data: {
+                    'active': self.alerts.active(),
+                    'rules': [rule.describe() for rule in self.alerts.rules]
+                },
+                'control', False
+            ),
+            'get_send_metrics': (lambda data: self.outbound.metrics(), 'control', False),
+            'get_compression_stats': (lambda data: self.compression.stats(), 'control', False),
+            'get_system_info': (lambda data: self.get_system_info(data.get('max_age')), 'system', True),
+            'process_list': (lambda data: self.get_process_list(), 'system', True),
+            'process_snapshot': (
+                lambda data: self.processes.snapshot(
+                    since=data.get('since'),
+                    fields=data.get('fields'),
+                    name=data.get('name'),
+                    min_cpu=data.get('min_cpu'),
+                    min_memory=data.get('min_memory'),
+                    sort=data.get('sort'),
+                    reverse=data.get('reverse', True),
+                    limit=data.get('limit')
+                ),
+                'system', True
+            ),
+            'cancel_command': (
+                lambda data: {'success': self.dispatcher.cancel(data.get('target_request_id'))},
+                'control', False
+            ),
+
+            # Files
+            'list_directory': (
+                lambda data: fm.list_directory(
+                    data.get('path', '/'),
+                    data.get('cursor'),
+                    data.get('page_size'),
+                    data.get('sort', 'name'),
+                    data.get('reverse', False)
+                ),
+                'file', False
+            ),
+            'search_files': (
+                lambda data: fm.search_files(
+                    data.get('pattern'),
+                    data.get('min_size'),
+                    data.get('max_size'),
+                    data.get('modified_after'),
+                    data.get('modified_before'),
+                    data.get('include_directories', False),
+                    data.get('limit', 100)
+                ),
+                'file', False
+            ),
+            'build_file_index': (self.build_file_index, 'control', False),
+            'get_index_stats': (lambda data: fm.get_index_stats(), 'system', True),
+            'get_file_manifest': (lambda data: fm.get_manifest(data.get('path')), 'file', False),
+            'delete_file': (lambda data: fm.delete_item(data.get('path')), 'file', True),
+            'create_directory': (lambda data: fm.create_directory(data.get('path')), 'file', True),
+
+            # Transfers; these only queue work for the transfer engine
+            'download_file': (
+                lambda data: self.transfers.download(
+                    data.get('path'),
+                    data.get('offset', 0),
+                    data.get('length'),
+                    data.get('transfer_id'),
+                    binary=self.binary_frames,
+                    compression=data.get('compression'),
+                    level=data.get('level')
+                ),
+                'control', False
+            ),
+            'download_directory': (
+                lambda data: self.transfers.download_directory(
+                    data.get('path'),
+                    data.get('offset', 0),
+                    data.get('transfer_id'),
+                    binary=self.binary_frames,
+                    compression=data.get('compression'),
+                    level=data.get('level')
+                ),
+                'control', False
+            ),
+            'download_delta': (
+                lambda data: self.transfers.download_delta(
+                    data.get('path'),
+                    data.get('have', []),
+                    data.get('transfer_id'),
+                    binary=self.binary_frames
+                ),
+                'file', False
+            ),
+            'resume_download': (
+                lambda data: self.transfers.resume(
+                    data.get('transfer_id'), data.get('offset'), binary=self.binary_frames
+                ),
+                'control', False
+            ),
+            'cancel_transfer': (lambda data: self.transfers.cancel(data.get('transfer_id')), 'control', False),
+            'list_transfers': (lambda data: self.transfers.list_transfers(), 'control', False),
+            'begin_upload': (
+                lambda data: fm.begin_upload(data.get('path'), data.get('size', 0), data.get('overwrite', False)),
+                'file', True
+            ),
+            'seed_upload': (
+                lambda data: fm.seed_upload(data.get('upload_id'), data.get('chunks', []), data.get('basis')),
+                'file', False
+            ),
+            # JSON fallback for senders without binary framing
+            'upload_chunk': (
+                lambda data: fm.write_upload_chunk(
+                    data.get('upload_id'),
+                    data.get('offset', 0),
+                    base64.b64decode(data.get('data', '')),
+                    data.get('checksum')
+                ),
+                'file', False
+            ),
+            'commit_upload': (lambda data: fm.commit_upload(data.get('upload_id')), 'file', False),
+            'abort_upload': (lambda data: fm.abort_upload(data.get('upload_id')), 'file', True),
+
+            # System
+            'shutdown': (lambda data: self.shutdown(), 'system', True),
+            'restart': (lambda data: self.restart(), 'system', True),
+            'screenshot': (lambda data: self.take_screenshot(), 'system', True),
+            'block_website': (lambda data: self.block_website(data.get('website')), 'system', True),
+            'block_application': (lambda data: self.block_application(data.get('app_name')), 'system', True),
+            'unblock_application': (lambda data: self.unblock_application(data.get('app_name')), 'system', True),
+            'get_blocked_apps': (lambda data: list(self.blocked_apps), 'control', False),
+            'terminate_process': (lambda data: self.terminate_process(data.get('pid')), 'system', True),
+        }
+        for name, (handler, command_class, blocking) in commands.items():
+            self.dispatcher.register(name, handler, command_class, blocking)
+
+        # Input is fire-and-forget unless the sender asks for an ack
+        self.dispatcher.register('mouse_event', rc.handle_mouse_event, 'input', ack_only=True)
+        self.dispatcher.register('keyboard_event', rc.handle_keyboard_event, 'input', ack_only=True)
+        self.dispatcher.register(
+            'input_batch', lambda data: rc.handle_input_batch(data.get('events')), 'input', ack_only=True
+        )
+
+    def start_stream(self, data):
+        self.remote_control.update_stream_settings(data.get('settings', {}))
+        self.streaming = True
+        self._start_screen_stream()
+        return {'success': True}
+
+    def _start_screen_stream(self):
+        # Frames wait for the writer so the stream sees real send latency
+        self.remote_control.start_screen_stream(
+            lambda frame, stream_id: self.send(
+                frame, PRIORITY_FRAME, key=('screen', stream_id), wait=True
+            ),
+            binary=self.binary_frames,
+            send_cursor=lambda message: self.send(message, PRIORITY_FRAME, key='cursor')
+        )
+
+    def stop_stream(self, data):
+        self.streaming = False
+        self.remote_control.stop_screen_stream()
+        return {'success': True}
+
+    def request_keyframe(self, data):
+        """Resend a full frame, e.g. for a viewer that joined mid-stream or lost a delta"""
+        self.remote_control.request_keyframe(data.get('stream_id'))
+        return {'success': True}
+
+    def update_stream_settings(self, data):
+        self.remote_control.update_stream_settings(data.get('settings', {}))
+        return {'success': True}
+
+    def build_file_index(self, data):
+        self.file_manager.start_index()
+        return self.file_manager.get_index_stats()
+
+    async def take_remote_screenshot(self, data):
+        monitor = data.get('monitor', 1)
+        region = data.get('region')
+        loop = asyncio.get_running_loop()
+        if self.binary_frames:
+            message = await loop.run_in_executor(None, self.remote_control.take_screenshot, True, monitor, region)
+            await self.send(message, PRIORITY_FILE)
+            return {'success': True, 'binary': True}
+        return await loop.run_in_executor(None, self.remote_control.take_screenshot, False, monitor, region)
+
+    def shutdown(self):
+        if platform.system() == 'Windows':
+            os.system('shutdown /s /t 0')
+        else:
+            os.system('shutdown -h now')
+        return {'success': True}
+
+    def restart(self):
+        if platform.system() == 'Windows':
+            os.system('shutdown /r /t 0')
+        else:
+            os.system('reboot')
+        return {'success': True}
 
     def update_settings(self, new_settings):
         try:
             # Update monitoring settings
             if 'monitoring' in new_settings:
+                # Rules are built before storing: a bad rule would fail every later update
+                rules = self.alert_rules({**self.settings['monitoring'], **new_settings['monitoring']})
                 self.settings['monitoring'].update(new_settings['monitoring'])
+                self.alerts.set_rules(rules)
             
             # Update security settings
             if 'security' in new_settings:
@@ -209,6 +546,12 @@ class RemoteDesktopClient:
                 # Reconfigure logging if log level changed
                 self.setup_logging()
 
+            # Update network settings; compression policy applies immediately
+            if 'network' in new_settings:
+                # Checked before storing: a bad value would fail every reconnect
+                self.settings['network'].update(validate_network_settings(new_settings['network']))
+                self.configure_compression()
+
             return {'success': True, 'message': 'Settings updated successfully'}
         except Exception as e:
             return {'success': False, 'error': str(e)}
@@ -219,65 +562,95 @@ class RemoteDesktopClient:
         
         try:
             data = json.dumps(response).encode()
-            encrypted_data = self.cipher.encrypt(data)
+            # Fernet tokens are already URL-safe base64
             return {
                 'type': 'encrypted',
-                'data': base64.b64encode(encrypted_data).decode('utf-8')
+                'data': self.cipher.encrypt(data).decode('ascii')
             }
         except Exception as e:
             self.logger.error(f"Encryption error: {str(e)}")
             return response
 
+    def configure_alerts(self):
+        self.alerts.set_rules(self.alert_rules(self.settings['monitoring']))
+
+    def alert_rules(self, monitoring):
+        """Build alert rules from the monitoring thresholds plus any custom rules; raises on a bad rule"""
+        defaults = {'window': monitoring['alertWindow'], 'cooldown': monitoring['alertCooldown']}
+        rules = [
+            AlertRule('cpu', 'cpu', monitoring['cpuThreshold'], **defaults),
+            AlertRule('memory', 'memory', monitoring['memoryThreshold'], **defaults),
+            AlertRule('disk', 'disk', monitoring['diskThreshold'], **defaults),
+        ]
+        rules.extend(AlertRule.from_dict({**defaults, **rule}) for rule in monitoring['alertRules'])
+        # Alert state is keyed by rule id, so rules sharing one would reset each other
+        seen = set()
+        for rule in rules:
+            if rule.rule_id in seen:
+                raise ValueError(f"Duplicate alert rule id: {rule.rule_id}; give the rule a unique 'id'")
+            seen.add(rule.rule_id)
+        return rules
+
     async def monitor_system(self):
+        """Evaluate alert rules every updateInterval and send transitions as one batch"""
+        loop = asyncio.get_running_loop()
         while True:
             try:
                 if not self.ws:
                     break
 
-                system_info = self.get_system_info()
-                cpu_percent = system_info['cpu_percent']
-                memory_percent = (system_info['memory_used'] / system_info['memory_total']) * 100
-
-                # Check thresholds
-                if self.settings['monitoring']['enableNotifications']:
-                    if cpu_percent > self.settings['monitoring']['cpuThreshold']:
-                        self.logger.warning(f"CPU usage above threshold: {cpu_percent}%")
-                        await self.send_alert('cpu', cpu_percent)
-                    
-                    if memory_percent > self.settings['monitoring']['memoryThreshold']:
-                        self.logger.warning(f"Memory usage above threshold: {memory_percent}%")
-                        await self.send_alert('memory', memory_percent)
+                # Process rules may refresh the process table, which is slow-ish
+                alerts = await loop.run_in_executor(self.alert_executor, self.alerts.evaluate)
+                if alerts and self.settings['monitoring']['enableNotifications']:
+                    for alert in alerts:
+                        self.logger.warning(f"Alert {alert['rule']} {alert['status']}: {alert['value']}")
+                    await self.send_alerts(alerts)
 
                 await asyncio.sleep(self.settings['monitoring']['updateInterval'])
             except Exception as e:
                 self.logger.error(f"Monitoring error: {str(e)}")
                 await asyncio.sleep(5)
 
-    async def send_alert(self, alert_type, value):
-        alert = {
-            'type': 'alert',
-            'alert_type': alert_type,
-            'value': value,
-            'timestamp': datetime.now().isoformat()
-        }
-        await self.ws.send(json.dumps(alert))
+    async def expire_uploads(self):
+        """Abort uploads a viewer started and then abandoned"""
+        while True:
+            await asyncio.sleep(60)
+            aborted = self.file_manager.abort_uploads(self.file_manager.upload_idle_timeout)
+            if aborted:
+                self.logger.info(f"Aborted {aborted} idle uploads")
 
-    def get_system_info(self):
-        cpu_percent = psutil.cpu_percent(interval=1)
-        memory = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
-        
-        return {
-            'hostname': platform.node(),
-            'os': platform.system(),
-            'os_version': platform.version(),
-            'cpu_percent': cpu_percent,
-            'memory_total': memory.total,
-            'memory_used': memory.used,
-            'disk_total': disk.total,
-            'disk_used': disk.used,
+    async def push_metrics(self):
+        """Send new telemetry samples in periodic batches instead of one message per reading"""
+        while True:
+            interval = self.settings['monitoring']['historyPushInterval']
+            await asyncio.sleep(interval or 5)
+            if not interval:
+                continue
+            # Samples missed while disconnected are sent with the next batch
+            rows = self.history.since(self.metrics_pushed_until)
+            if not rows:
+                continue
+            await self.send({
+                'type': 'metrics_batch',
+                'client_id': self.client_id,
+                'fields': TELEMETRY_FIELDS,
+                'samples': rows
+            })
+            self.metrics_pushed_until = rows[-1][0]
+
+    async def send_alerts(self, alerts):
+        await self.send({
+            'type': 'alerts',
+            'client_id': self.client_id,
+            'alerts': alerts,
             'timestamp': datetime.now().isoformat()
-        }
+        })
+
+    def get_system_info(self, max_age=None):
+        """Latest telemetry sample, served from cache unless older than ``max_age`` seconds"""
+        if max_age is None:
+            max_age = self.settings['monitoring']['maxSampleAge']
+        return self.telemetry.latest(float(max_age))
 
     def take_screenshot(self):
         """Take a screenshot and save it to disk"""
@@ -294,15 +667,8 @@ class RemoteDesktopClient:
             return {'path': screenshot_path}
 
     def get_process_list(self):
-        processes = []
-        for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent', 'create_time']):
-            try:
-                pinfo = proc.info
-                pinfo['running_time'] = datetime.now().timestamp() - pinfo['create_time']
-                processes.append(pinfo)
-            except (psutil.NoSuchProcess, psutil.AccessDenied):
-                pass
-        return processes
+        """Full process list; use the process_snapshot command for deltas"""
+        return self.processes.snapshot()['processes']
 
     def block_website(self, website):
         hosts_path = "/etc/hosts" if platform.system() != "Windows" else r"C:\Windows\System32\drivers\etc\hosts"
@@ -0,0 +1,133 @@
+import asyncio
+import inspect
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+# Commands in one class share a concurrency limit
+CLASS_LIMITS = {
+    'input': 1,     # Run inline, in arrival order
+    'stream': 1,    # Start/stop/settings must apply in order
+    'control': 16,  # Cheap, non-blocking
+    'file': 4,
+    'system': 4,
+}
+
+
+class CommandSpec:
+    __slots__ = ('name', 'handler', 'command_class', 'blocking', 'ack_only')
+
+    def __init__(self, name: str, handler: Callable, command_class: str, blocking: bool, ack_only: bool):
+        self.name = name
+        self.handler = handler
+        self.command_class = command_class
+        self.blocking = blocking
+        self.ack_only = ack_only
+
+
+class CommandDispatcher:
+    """Run incoming commands concurrently.
+
+    Handlers are looked up in a registry and take the command's data dict.
+    Input commands run inline in the message loop, so they stay ordered and
+    never wait behind other work. Everything else runs as a task, bounded
+    by its class's concurrency limit; blocking handlers run on a thread
+    pool. Responses echo the sender's ``request_id``, and a command in
+    flight can be cancelled by that id.
+    """
+
+    def __init__(self, respond: Callable, limits: Optional[Dict[str, int]] = None, workers: int = 8):
+        self.logger = logging.getLogger(__name__)
+        self.respond = respond
+        self.commands: Dict[str, CommandSpec] = {}
+        self.limits = {**CLASS_LIMITS, **(limits or {})}
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._inflight: Dict[object, asyncio.Task] = {}
+        self._tasks = set()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='command')
+
+    def register(self, name: str, handler: Callable, command_class: str = 'control',
+                 blocking: bool = False, ack_only: bool = False):
+        """Register ``handler(data)``; ``ack_only`` commands reply only when the sender sets ``ack``"""
+        if command_class not in self.limits:
+            raise ValueError(f"Unknown command class: {command_class}")
+        self.commands[name] = CommandSpec(name, handler, command_class, blocking, ack_only)
+
+    def _semaphore(self, command_class: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(command_class)
+        if semaphore is None:
+            semaphore = self._semaphores[command_class] = asyncio.Semaphore(self.limits[command_class])
+        return semaphore
+
+    async def _reply(self, data: dict, result, error: Optional[Exception]):
+        try:
+            await self.respond(data, result, error)
+        except ConnectionError:
+            # The connection went away while the command ran; nobody is waiting for the answer
+            self.logger.info(f"Dropped response to {data.get('command')}: connection closed")
+
+    async def dispatch(self, data: dict):
+        """Start handling one command; returns once it is running, not once it is done"""
+        command = data.get('command')
+        spec = self.commands.get(command)
+        if spec is None:
+            await self._reply(data, {'error': 'Unknown command'}, None)
+            return
+
+        if spec.command_class == 'input':
+            try:
+                result, error = spec.handler(data), None
+            except Exception as e:
+                result, error = None, e
+            if data.get('ack') or not spec.ack_only:
+                await self._reply(data, result, error)
+            return
+
+        request_id = data.get('request_id')
+        if request_id is not None and request_id in self._inflight:
+            await self._reply(data, None, ValueError(f"Request {request_id} is already in flight"))
+            return
+        task = asyncio.create_task(self._run(spec, data))
+        self._tasks.add(task)
+        task.add_done_callback(lambda _: self._finished(task, data))
+        if request_id is not None:
+            self._inflight[request_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(request_id, None))
+
+    def _finished(self, task: asyncio.Task, data: dict):
+        self._tasks.discard(task)
+        if task.cancelled():
+            # Covers tasks cancelled before they ever started running
+            asyncio.ensure_future(self._reply(data, {'cancelled': True}, None))
+
+    async def _run(self, spec: CommandSpec, data: dict):
+        try:
+            async with self._semaphore(spec.command_class):
+                if spec.blocking:
+                    loop = asyncio.get_running_loop()
+                    result = await loop.run_in_executor(self._executor, spec.handler, data)
+                else:
+                    result = spec.handler(data)
+                    if inspect.isawaitable(result):
+                        result = await result
+        except Exception as e:
+            await self._reply(data, None, e)
+            return
+        if data.get('ack') or not spec.ack_only:
+            await self._reply(data, result, None)
+
+    def cancel(self, request_id) -> bool:
+        """Cancel a command in flight. Work already handed to a thread runs to completion."""
+        task = self._inflight.get(request_id)
+        if task is None:
+            return False
+        task.cancel()
+        return True
+
+    def cancel_all(self):
+        """Cancel every command in flight, e.g. when the connection drops"""
+        for task in list(self._tasks):
+            task.cancel()
+
+    def in_flight(self):
+        return list(self._inflight)
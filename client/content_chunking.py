@@ -0,0 +1,116 @@
+import hashlib
+import random
+from collections import deque
+from typing import Iterator, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Gear hash: h = (h << 1) + GEAR[byte], truncated to 32 bits, so each hash
+# depends only on the last 32 bytes and boundaries follow the content.
+WINDOW = 32
+_MASK32 = 0xFFFFFFFF
+_rng = random.Random(0x52444344)  # Fixed seed: every peer must cut at the same places
+_GEAR = [_rng.getrandbits(32) for _ in range(256)]
+_GEAR_ARRAY = np.array(_GEAR, dtype=np.uint32) if np is not None else None
+
+Chunk = Tuple[int, int, str]
+
+
+def chunk_digest(data) -> str:
+    """Content hash identifying a chunk in manifests"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _gear_hashes_numpy(context: bytes, data, bits: int = WINDOW) -> 'np.ndarray':
+    # h_i = sum over the window of GEAR[b_{i-j}] << j, evaluated for all i at
+    # once. Only the low ``bits`` bits are exact: higher shifts cannot reach them.
+    window = np.zeros(WINDOW - 1 + len(data), dtype=np.uint32)
+    if context:
+        window[WINDOW - 1 - len(context):WINDOW - 1] = _GEAR_ARRAY[np.frombuffer(context, dtype=np.uint8)]
+    window[WINDOW - 1:] = _GEAR_ARRAY[np.frombuffer(data, dtype=np.uint8)]
+    hashes = np.zeros(len(data), dtype=np.uint32)
+    for shift in range(min(bits, WINDOW)):
+        start = WINDOW - 1 - shift
+        hashes += window[start:start + len(data)] << np.uint32(shift)
+    return hashes
+
+
+def _boundaries_python(context: bytes, data, mask: int) -> List[int]:
+    gear = _GEAR
+    h = 0
+    for byte in context:
+        h = ((h << 1) + gear[byte]) & _MASK32
+    found = []
+    for index, byte in enumerate(data):
+        h = ((h << 1) + gear[byte]) & _MASK32
+        if not h & mask:
+            found.append(index)
+    return found
+
+
+class ContentChunker:
+    """Split a byte stream into content-defined chunks.
+
+    Boundaries sit where a rolling gear hash of the last 32 bytes matches a
+    mask, so an insertion or edit only changes the chunks around it and the
+    rest of the file still deduplicates against an older copy.
+    """
+
+    def __init__(self, min_size: int = 256 * 1024, avg_size: int = 1024 * 1024,
+                 max_size: int = 4 * 1024 * 1024, read_size: int = 4 * 1024 * 1024):
+        if not min_size <= avg_size <= max_size:
+            raise ValueError("Chunk sizes must satisfy min_size <= avg_size <= max_size")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.read_size = read_size
+        # Matching the low bits of the hash gives boundaries roughly every avg_size bytes
+        self.mask = (1 << max(avg_size - min_size, 1).bit_length() - 1) - 1
+
+    def _boundaries(self, context: bytes, data) -> List[int]:
+        """Indices into ``data`` after which a chunk may end"""
+        if np is not None:
+            hashes = _gear_hashes_numpy(context, data, self.mask.bit_length())
+            return np.flatnonzero((hashes & np.uint32(self.mask)) == 0).tolist()
+        return _boundaries_python(context, data, self.mask)
+
+    def _next_cut(self, candidates, start: int, end: int, eof: bool):
+        while candidates and candidates[0] - start < self.min_size:
+            candidates.popleft()
+        limit = start + self.max_size
+        if candidates and candidates[0] <= limit:
+            return candidates.popleft()
+        if end >= limit:
+            return limit
+        if eof and end > start:
+            return end
+        return None
+
+    def chunks(self, file) -> Iterator[Chunk]:
+        """Yield ``(offset, length, digest)`` for every chunk of a binary file object"""
+        pending = bytearray()
+        candidates = deque()
+        context = b''
+        start = end = 0
+        eof = False
+        while not eof:
+            block = file.read(self.read_size)
+            if block:
+                candidates.extend(end + index + 1 for index in self._boundaries(context, block))
+                context = (context + block[-(WINDOW - 1):])[-(WINDOW - 1):]
+                pending += block
+                end += len(block)
+            else:
+                eof = True
+
+            cut = self._next_cut(candidates, start, end, eof)
+            while cut is not None:
+                length = cut - start
+                with memoryview(pending) as view:
+                    digest = chunk_digest(view[:length])
+                del pending[:length]
+                yield start, length, digest
+                start = cut
+                cut = self._next_cut(candidates, start, end, eof)
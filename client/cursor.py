@@ -0,0 +1,57 @@
+import ctypes
+import platform
+
+import mouse
+
+# Windows system cursor ids mapped to CSS cursor names the viewer can apply
+_SYSTEM_CURSORS = {
+    32512: 'default',      # IDC_ARROW
+    32513: 'text',         # IDC_IBEAM
+    32514: 'wait',         # IDC_WAIT
+    32515: 'crosshair',    # IDC_CROSS
+    32642: 'nwse-resize',  # IDC_SIZENWSE
+    32643: 'nesw-resize',  # IDC_SIZENESW
+    32644: 'ew-resize',    # IDC_SIZEWE
+    32645: 'ns-resize',    # IDC_SIZENS
+    32646: 'move',         # IDC_SIZEALL
+    32648: 'not-allowed',  # IDC_NO
+    32649: 'pointer',      # IDC_HAND
+    32650: 'progress',     # IDC_APPSTARTING
+    32651: 'help',         # IDC_HELP
+}
+
+
+class _CursorInfo(ctypes.Structure):
+    _fields_ = [
+        ('cbSize', ctypes.c_uint32),
+        ('flags', ctypes.c_uint32),
+        ('hCursor', ctypes.c_void_p),
+        ('x', ctypes.c_long),
+        ('y', ctypes.c_long),
+    ]
+
+
+class CursorProbe:
+    """Read the pointer position and, on Windows, the current cursor shape"""
+
+    def __init__(self):
+        self._handles = {}
+        self._user32 = None
+        if platform.system() == 'Windows':
+            self._user32 = ctypes.windll.user32
+            self._user32.LoadCursorW.restype = ctypes.c_void_p
+            for cursor_id, name in _SYSTEM_CURSORS.items():
+                handle = self._user32.LoadCursorW(None, ctypes.c_void_p(cursor_id))
+                if handle:
+                    self._handles[handle] = name
+
+    def read(self):
+        """Return ``(x, y, shape)``; shape is a CSS cursor name or None"""
+        if self._user32 is not None:
+            info = _CursorInfo(cbSize=ctypes.sizeof(_CursorInfo))
+            if self._user32.GetCursorInfo(ctypes.byref(info)):
+                if not info.flags & 0x1:  # CURSOR_SHOWING
+                    return info.x, info.y, 'none'
+                return info.x, info.y, self._handles.get(info.hCursor, 'default')
+        x, y = mouse.get_position()
+        return x, y, None
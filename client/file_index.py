@@ -0,0 +1,362 @@
+import ctypes
+import ctypes.util
+import fnmatch
+import logging
+import os
+import re
+import select
+import struct
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# inotify event bits, from <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE |
+              IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+_EVENT = struct.Struct('iIII')
+
+# Per-entry record: (size, mtime); directories use size -1
+Entry = Tuple[int, float]
+DIRECTORY = -1
+
+
+def _entry_bytes(name: str, entry: Entry) -> int:
+    return sys.getsizeof(name) + sys.getsizeof(entry) + sys.getsizeof(entry[1])
+
+
+def _dir_bytes(path: str, entries: Dict[str, Entry]) -> int:
+    return sys.getsizeof(path) + sys.getsizeof(entries) + sum(
+        _entry_bytes(name, entry) for name, entry in entries.items()
+    )
+
+
+def _scan(path: str):
+    """One directory level: its entries, subdirectories and mtime. Symlinks are not followed."""
+    entries: Dict[str, Entry] = {}
+    subdirs = []
+    with os.scandir(path) as it:
+        for item in it:
+            try:
+                stats = item.stat(follow_symlinks=False)
+                if item.is_dir(follow_symlinks=False):
+                    entries[item.name] = (DIRECTORY, stats.st_mtime)
+                    subdirs.append(item.path)
+                else:
+                    entries[item.name] = (stats.st_size, stats.st_mtime)
+            except OSError:
+                continue  # Skip entries we can't access
+    return entries, subdirs, os.stat(path).st_mtime_ns
+
+
+class _Inotify:
+    """Minimal inotify binding through ctypes"""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path: str) -> int:
+        wd = self._add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), path)
+        return wd
+
+    def read_events(self, timeout: float):
+        """Yield ``(wd, mask, name)`` for events arriving within ``timeout`` seconds"""
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return
+        data = os.read(self.fd, 64 * 1024)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            yield wd, mask, name
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FileIndex:
+    """In-memory index of every file under ``root``.
+
+    The initial crawl scans directories in parallel. Afterwards the index is
+    kept current with inotify where available, or by polling directory mtimes
+    every ``poll_interval`` seconds otherwise. Polling only notices entries
+    being added, removed or renamed; inotify also picks up content changes.
+    """
+
+    def __init__(self, root: str, workers: int = 8, poll_interval: float = 30.0):
+        self.logger = logging.getLogger(__name__)
+        self.root = os.path.abspath(root)
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._dirs: Dict[str, Dict[str, Entry]] = {}
+        self._versions: Dict[str, int] = {}
+        # Running totals kept as the index changes, so stats() never walks it
+        self._dir_sizes: Dict[str, int] = {}
+        self._entries = 0
+        self._memory = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._inotify = None
+        self._watches: Dict[int, str] = {}
+        self.mode = None
+        self.ready = False
+        self.build_seconds = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='file-index', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _store(self, path: str, entries: Dict[str, Entry], version: int):
+        size = _dir_bytes(path, entries)
+        with self._lock:
+            self._drop(path)
+            self._dirs[path] = entries
+            self._versions[path] = version
+            self._dir_sizes[path] = size
+            self._entries += len(entries)
+            self._memory += size
+
+    def _drop(self, path: str):
+        """Remove one directory and its totals; caller holds the lock"""
+        previous = self._dirs.pop(path, None)
+        if previous is not None:
+            self._entries -= len(previous)
+            self._memory -= self._dir_sizes.pop(path)
+        self._versions.pop(path, None)
+
+    def _set_entry(self, path: str, name: str, entry: Optional[Entry]):
+        """Replace or (with ``entry=None``) remove one entry; caller holds the lock"""
+        entries = self._dirs.get(path)
+        if entries is None:
+            return
+        delta = 0
+        previous = entries.pop(name, None)
+        if previous is not None:
+            self._entries -= 1
+            delta -= _entry_bytes(name, previous)
+        if entry is not None:
+            entries[name] = entry
+            self._entries += 1
+            delta += _entry_bytes(name, entry)
+        self._dir_sizes[path] += delta
+        self._memory += delta
+
+    def _forget(self, path: str):
+        """Drop a directory and everything below it"""
+        prefix = path.rstrip(os.sep) + os.sep
+        with self._lock:
+            for key in [key for key in self._dirs if key == path or key.startswith(prefix)]:
+                self._drop(key)
+        if self._inotify is not None:
+            for wd in [wd for wd, key in self._watches.items() if key == path or key.startswith(prefix)]:
+                del self._watches[wd]
+
+    def _watch(self, path: str):
+        if self._inotify is None:
+            return
+        try:
+            self._watches[self._inotify.add_watch(path)] = path
+        except OSError as e:
+            # Usually the per-user watch limit; the rest of the tree is polled instead
+            self.logger.warning(f"inotify unavailable for {path}, falling back to polling: {str(e)}")
+            self._inotify.close()
+            self._inotify = None
+            self._watches.clear()
+            self.mode = 'polling'
+
+    def _crawl(self, top: str):
+        """Index ``top`` and everything below it, scanning directories in parallel"""
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='file-index-crawl') as pool:
+            pending = {pool.submit(_scan, top): top}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = pending.pop(future)
+                    try:
+                        entries, subdirs, version = future.result()
+                    except OSError:
+                        continue
+                    self._store(path, entries, version)
+                    self._watch(path)
+                    for subdir in subdirs:
+                        pending[pool.submit(_scan, subdir)] = subdir
+
+    def _rescan(self, path: str):
+        """Re-read one directory, crawling new subdirectories and dropping vanished ones"""
+        try:
+            entries, subdirs, version = _scan(path)
+        except OSError:
+            self._forget(path)
+            return
+        with self._lock:
+            previous = self._dirs.get(path, {})
+        self._store(path, entries, version)
+        for name, (size, _) in previous.items():
+            if size == DIRECTORY and entries.get(name, (None,))[0] != DIRECTORY:
+                self._forget(os.path.join(path, name))
+        for subdir in subdirs:
+            if subdir not in self._dirs:
+                self._crawl(subdir)
+
+    def _handle_event(self, wd: int, mask: int, name: str):
+        if mask & IN_Q_OVERFLOW:
+            self._rescan_all()
+            return
+        path = self._watches.get(wd)
+        if path is None:
+            return
+        if mask & IN_IGNORED:
+            self._watches.pop(wd, None)
+            return
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            self._forget(path)
+            return
+        if not name:
+            return
+
+        full_path = os.path.join(path, name)
+        if mask & (IN_DELETE | IN_MOVED_FROM):
+            with self._lock:
+                self._set_entry(path, name, None)
+            if mask & IN_ISDIR:
+                self._forget(full_path)
+        elif mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+            self._rescan(path)
+        else:
+            try:
+                stats = os.stat(full_path, follow_symlinks=False)
+            except OSError:
+                return
+            entry = (DIRECTORY if mask & IN_ISDIR else stats.st_size, stats.st_mtime)
+            with self._lock:
+                self._set_entry(path, name, entry)
+
+    def _rescan_all(self):
+        """Rescan every directory whose mtime changed since it was indexed"""
+        with self._lock:
+            known = list(self._versions.items())
+        for path, version in known:
+            if self._stop.is_set():
+                return
+            try:
+                changed = os.stat(path).st_mtime_ns != version
+            except OSError:
+                changed = True
+            if changed:
+                self._rescan(path)
+
+    def _run(self):
+        try:
+            self._inotify = _Inotify() if sys.platform.startswith('linux') else None
+        except (OSError, AttributeError) as e:
+            self.logger.warning(f"inotify unavailable, falling back to polling: {str(e)}")
+            self._inotify = None
+        self.mode = 'inotify' if self._inotify is not None else 'polling'
+
+        started = time.perf_counter()
+        self._crawl(self.root)
+        self.build_seconds = time.perf_counter() - started
+        self.ready = True
+        self.logger.info(f"Indexed {self.root} in {self.build_seconds:.2f}s ({self.mode})")
+
+        while not self._stop.is_set():
+            try:
+                if self._inotify is not None:
+                    for wd, mask, name in self._inotify.read_events(1.0):
+                        self._handle_event(wd, mask, name)
+                else:
+                    self._stop.wait(self.poll_interval)
+                    self._rescan_all()
+            except Exception as e:
+                self.logger.error(f"File index update error: {str(e)}")
+        if self._inotify is not None:
+            self._inotify.close()
+
+    def search(self, pattern: Optional[str] = None, min_size: Optional[int] = None,
+               max_size: Optional[int] = None, modified_after: Optional[float] = None,
+               modified_before: Optional[float] = None, include_directories: bool = False,
+               limit: int = 100) -> Dict[str, object]:
+        """Match names against a case-insensitive glob plus size and mtime (epoch seconds) filters"""
+        started = time.perf_counter()
+        match = re.compile(fnmatch.translate(pattern), re.IGNORECASE).match if pattern else None
+        results: List[dict] = []
+        truncated = False
+        with self._lock:
+            for directory, entries in self._dirs.items():
+                for name, (size, mtime) in entries.items():
+                    if size == DIRECTORY:
+                        if not include_directories or min_size is not None or max_size is not None:
+                            continue
+                    elif (min_size is not None and size < min_size) or (max_size is not None and size > max_size):
+                        continue
+                    if (modified_after is not None and mtime < modified_after) or \
+                            (modified_before is not None and mtime > modified_before):
+                        continue
+                    if match is not None and not match(name):
+                        continue
+                    if len(results) >= limit:
+                        truncated = True
+                        break
+                    results.append({
+                        'name': name,
+                        'path': os.path.join(directory, name),
+                        'size': max(size, 0),
+                        'modified': datetime.fromtimestamp(mtime).isoformat(),
+                        'is_directory': size == DIRECTORY
+                    })
+                if truncated:
+                    break
+        return {
+            'results': results,
+            'truncated': truncated,
+            'indexing': not self.ready,
+            'elapsed_ms': (time.perf_counter() - started) * 1000
+        }
+
+    def stats(self) -> Dict[str, object]:
+        """Entry counts, approximate memory use and build time of the index; O(1)"""
+        with self._lock:
+            directories = len(self._dirs)
+            entries = self._entries
+            memory = self._memory + sys.getsizeof(self._dirs) + sys.getsizeof(self._versions)
+        return {
+            'root': self.root,
+            'ready': self.ready,
+            'mode': self.mode,
+            'directories': directories,
+            'entries': entries,
+            'memory_bytes': memory,
+            'build_seconds': self.build_seconds,
+            'watches': len(self._watches)
+        }
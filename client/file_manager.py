@@ -1,12 +1,22 @@
+import asyncio
 import os
 import shutil
 import base64
 import hashlib
+import itertools
+import tarfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from pathlib import Path
 from typing import Dict, List, Optional, Union
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime
 
+from content_chunking import ContentChunker, chunk_digest
+from file_index import FileIndex
+
 @dataclass
 class FileInfo:
     name: str
@@ -16,11 +26,137 @@ class FileInfo:
     is_directory: bool
     checksum: Optional[str] = None
 
+class DirEntry:
+    """Compact listing entry; size and mtime are filled in lazily from stat"""
+
+    __slots__ = ('name', 'is_directory', 'size', 'mtime')
+
+    def __init__(self, name: str, is_directory: bool):
+        self.name = name
+        self.is_directory = is_directory
+        self.size = None
+        self.mtime = None
+
+    def copy(self) -> 'DirEntry':
+        entry = DirEntry(self.name, self.is_directory)
+        entry.size, entry.mtime = self.size, self.mtime
+        return entry
+
+    def to_dict(self, parent: str) -> Dict[str, Union[str, int, bool]]:
+        return {
+            'name': self.name,
+            'path': os.path.join(parent, self.name),
+            'size': self.size or 0,
+            'modified': datetime.fromtimestamp(self.mtime).isoformat() if self.mtime is not None else None,
+            'is_directory': self.is_directory
+        }
+
+
+class DirListing:
+    """Cached scan of one directory, valid while the directory's mtime is unchanged"""
+
+    __slots__ = ('version', 'entries', 'stat_complete', 'orders')
+
+    def __init__(self, version: int, entries: List[DirEntry]):
+        self.version = version
+        self.entries = entries
+        self.stat_complete = False
+        self.orders: Dict[tuple, List[DirEntry]] = {}
+
+# Sort keys for listings; directories always come first
+LISTING_SORT_KEYS = {
+    'name': lambda e: e.name.lower(),
+    'size': lambda e: e.size or 0,
+    'modified': lambda e: e.mtime or 0,
+    'type': lambda e: (os.path.splitext(e.name)[1].lower(), e.name.lower()),
+}
+
+class _ArchiveSink:
+    """Write-only file object that hands tar output to an asyncio queue in chunk-sized pieces.
+
+    Output before ``skip`` is discarded, which lets an interrupted archive be
+    regenerated and resumed from a byte offset. Puts are scheduled on the
+    event loop, so the consumer never ties up an I/O worker while waiting.
+    """
+
+    def __init__(self, chunks: asyncio.Queue, loop: asyncio.AbstractEventLoop, chunk_size: int,
+                 skip: int, cancelled: threading.Event):
+        self.chunks = chunks
+        self.loop = loop
+        self.chunk_size = chunk_size
+        self.skip = skip
+        self.cancelled = cancelled
+        self.position = 0
+        self.buffer = bytearray()
+
+    def _put(self, item):
+        if self.cancelled.is_set():
+            raise InterruptedError("Archive cancelled")
+        put = asyncio.run_coroutine_threadsafe(self.chunks.put(item), self.loop)
+        while not self.cancelled.is_set():
+            try:
+                put.result(timeout=0.5)
+                return
+            except FutureTimeoutError:
+                continue
+        put.cancel()
+        raise InterruptedError("Archive cancelled")
+
+    def _emit(self, size: int):
+        chunk = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        self._put((chunk, chunk_digest(chunk)))
+
+    def write(self, data) -> int:
+        length = len(data)
+        start = self.position
+        self.position += length
+        if self.position <= self.skip:
+            return length
+        self.buffer += memoryview(data)[max(self.skip - start, 0):]
+        while len(self.buffer) >= self.chunk_size:
+            self._emit(self.chunk_size)
+        return length
+
+    def close_stream(self):
+        if self.buffer:
+            self._emit(len(self.buffer))
+
+@dataclass
+class UploadSession:
+    upload_id: int
+    path: str
+    full_path: str
+    temp_path: str
+    size: int
+    chunk_size: int
+    file: object
+    received: Dict[int, int] = field(default_factory=dict)
+    bytes_received: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    touched: float = field(default_factory=time.monotonic)  # Last chunk received or seeded
+
 class FileManager:
     def __init__(self, base_path: str = None):
         self.base_path = base_path or os.path.expanduser('~')
         self.chunk_size = 1024 * 1024  # 1MB chunks
         self.transfer_progress: Dict[str, float] = {}
+        # Blocking file I/O is kept off the event loop
+        self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='file-io')
+        self.upload_window = 8  # Chunks a sender may have in flight per upload
+        self.upload_idle_timeout = 300.0  # Seconds without chunks before an upload counts as abandoned
+        self.uploads: Dict[int, UploadSession] = {}
+        self._upload_ids = itertools.count(1)
+        self.chunker = ContentChunker()
+        # Chunk manifests keyed by path, valid while mtime and size are unchanged
+        self._manifests: OrderedDict = OrderedDict()
+        self.manifest_cache_size = 64
+        # Directory scans keyed by path, evicted least recently used first
+        self._listings: OrderedDict = OrderedDict()
+        self.listing_cache_size = 32
+        self.listing_page_size = 1000
+        self._listing_lock = threading.Lock()
+        self.index: Optional[FileIndex] = None
 
     def _validate_path(self, path: str) -> str:
         """Validate and normalize file path to prevent directory traversal attacks"""
@@ -36,15 +172,117 @@ class FileManager:
             raise ValueError(f"Invalid path: {str(e)}")
 
     def _calculate_checksum(self, file_path: str) -> str:
-        """Calculate MD5 checksum of a file"""
-        hash_md5 = hashlib.md5()
-        with open(file_path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
-
-    def list_directory(self, path: str) -> Dict[str, Union[List[FileInfo], str]]:
-        """List contents of a directory with error handling"""
+        """Calculate BLAKE2b checksum of a file, streamed through one reused buffer"""
+        digest = hashlib.blake2b()
+        buffer = bytearray(self.chunk_size)
+        view = memoryview(buffer)
+        with open(file_path, "rb", buffering=0) as f:
+            for size in iter(lambda: f.readinto(buffer), 0):
+                digest.update(view[:size])
+        return digest.hexdigest()
+
+    def _build_manifest(self, full_path: str) -> List[list]:
+        with open(full_path, "rb", buffering=0) as f:
+            return [list(chunk) for chunk in self.chunker.chunks(f)]
+
+    async def get_manifest(self, path: str) -> Dict[str, Union[bool, str, int, list]]:
+        """Content-defined chunk manifest of a file: ``[offset, length, hash]`` per chunk"""
+        try:
+            full_path = self._validate_path(path)
+            if not os.path.isfile(full_path):
+                raise FileNotFoundError(f"File does not exist: {path}")
+            stat = os.stat(full_path)
+            key = (stat.st_mtime_ns, stat.st_size)
+
+            cached = self._manifests.get(full_path)
+            if cached is not None and cached[0] == key:
+                self._manifests.move_to_end(full_path)
+                chunks = cached[1]
+            else:
+                loop = asyncio.get_running_loop()
+                chunks = await loop.run_in_executor(self._executor, self._build_manifest, full_path)
+                self._manifests[full_path] = (key, chunks)
+                while len(self._manifests) > self.manifest_cache_size:
+                    self._manifests.popitem(last=False)
+
+            return {
+                'success': True,
+                'path': path,
+                'size': stat.st_size,
+                'chunks': chunks
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    @staticmethod
+    def _scan_directory(full_path: str, version: int) -> DirListing:
+        """Read names and types only; d_type makes is_dir() free on most filesystems"""
+        entries = []
+        with os.scandir(full_path) as it:
+            for item in it:
+                try:
+                    entries.append(DirEntry(item.name, item.is_dir()))
+                except OSError:
+                    continue  # Skip entries we can't access
+        return DirListing(version, entries)
+
+    @staticmethod
+    def _stat_entries(full_path: str, entries: List[DirEntry]):
+        for entry in entries:
+            try:
+                stats = os.stat(os.path.join(full_path, entry.name))
+            except OSError:
+                continue
+            entry.size = 0 if entry.is_directory else stats.st_size
+            entry.mtime = stats.st_mtime
+
+    def _get_listing_locked(self, full_path: str, sort: str, reverse: bool) -> tuple:
+        """Sorted entries of a directory from the cache, rescanning if it changed; caller holds the listing lock"""
+        version = os.stat(full_path).st_mtime_ns
+        listing = self._listings.get(full_path)
+        if listing is None or listing.version != version:
+            listing = self._scan_directory(full_path, version)
+            self._listings[full_path] = listing
+            while len(self._listings) > self.listing_cache_size:
+                self._listings.popitem(last=False)
+        else:
+            self._listings.move_to_end(full_path)
+
+        order = listing.orders.get((sort, reverse))
+        if order is None:
+            # Size and date ordering needs every entry stat'ed; name ordering does not
+            if sort in ('size', 'modified') and not listing.stat_complete:
+                self._stat_entries(full_path, listing.entries)
+                listing.stat_complete = True
+            key = LISTING_SORT_KEYS[sort]
+            directories = sorted((e for e in listing.entries if e.is_directory), key=key, reverse=reverse)
+            files = sorted((e for e in listing.entries if not e.is_directory), key=key, reverse=reverse)
+            order = listing.orders[(sort, reverse)] = directories + files
+        return listing.version, order
+
+    def _list_page(self, full_path: str, sort: str, reverse: bool, cursor: int,
+                   page_size: Optional[int]) -> tuple:
+        with self._listing_lock:
+            version, order = self._get_listing_locked(full_path, sort, reverse)
+            end = None if page_size is None else cursor + page_size
+            # Copies, so re-stat'ing the page never touches entries shared through the cache
+            page = [entry.copy() for entry in order[cursor:end]]
+            total = len(order)
+        # Files may change without touching the directory mtime, so the page is always re-stat'ed
+        self._stat_entries(full_path, page)
+        return version, total, page
+
+    async def list_directory(self, path: str, cursor: Optional[int] = None, page_size: Optional[int] = None,
+                             sort: str = 'name', reverse: bool = False) -> Dict[str, Union[List[dict], str, int, bool]]:
+        """List a directory sorted by ``sort``.
+
+        Passing ``cursor`` or ``page_size`` returns one page starting at
+        ``cursor`` (``listing_page_size`` entries by default); passing
+        neither returns the whole directory, as before paging existed.
+        """
         try:
             full_path = self._validate_path(path)
             if not os.path.exists(full_path):
@@ -53,24 +291,57 @@ class FileManager:
             if not os.path.isdir(full_path):
                 raise NotADirectoryError(f"Path is not a directory: {path}")
 
-            items = []
-            for item in os.scandir(full_path):
-                try:
-                    stats = item.stat()
-                    items.append(FileInfo(
-                        name=item.name,
-                        path=os.path.join(path, item.name),
-                        size=stats.st_size if item.is_file() else 0,
-                        modified=datetime.fromtimestamp(stats.st_mtime).isoformat(),
-                        is_directory=item.is_dir()
-                    ))
-                except (PermissionError, OSError) as e:
-                    continue  # Skip files we can't access
+            if sort not in LISTING_SORT_KEYS:
+                raise ValueError(f"Unknown sort key: {sort}")
+            if cursor is not None or page_size is not None:
+                page_size = max(int(page_size or self.listing_page_size), 1)
+            cursor = max(int(cursor or 0), 0)
+
+            loop = asyncio.get_running_loop()
+            version, total, page = await loop.run_in_executor(
+                self._executor, self._list_page, full_path, sort, bool(reverse), cursor, page_size
+            )
+            next_cursor = cursor + len(page)
+
+            return {
+                'success': True,
+                'items': [entry.to_dict(path) for entry in page],
+                'current_path': path,
+                'total': total,
+                'cursor': cursor,
+                'next_cursor': next_cursor if next_cursor < total else None,
+                'version': version
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def start_index(self) -> FileIndex:
+        """Build the search index under base_path in the background, once"""
+        if self.index is None:
+            self.index = FileIndex(self.base_path)
+            self.index.start()
+        return self.index
 
+    async def search_files(self, pattern: Optional[str] = None, min_size: Optional[int] = None,
+                           max_size: Optional[int] = None, modified_after: Optional[float] = None,
+                           modified_before: Optional[float] = None, include_directories: bool = False,
+                           limit: int = 100) -> Dict[str, Union[bool, str, list]]:
+        """Search the file index; results are partial while the first crawl is running"""
+        try:
+            index = self.start_index()
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                self._executor, lambda: index.search(
+                    pattern, min_size, max_size, modified_after, modified_before,
+                    include_directories, max(int(limit), 1)
+                )
+            )
             return {
                 'success': True,
-                'items': sorted(items, key=lambda x: (not x.is_directory, x.name.lower())),
-                'current_path': path
+                **result
             }
         except Exception as e:
             return {
@@ -78,45 +349,444 @@ class FileManager:
                 'error': str(e)
             }
 
-    async def read_file_chunks(self, file_path: str):
-        """Generator function to read file in chunks with progress tracking"""
+    def get_index_stats(self) -> Dict[str, Union[bool, str, int, float]]:
+        if self.index is None:
+            return {
+                'success': True,
+                'ready': False,
+                'mode': None
+            }
+        return {
+            'success': True,
+            **self.index.stats()
+        }
+
+    def _read_at(self, file, offset: int, size: int):
+        """Read ``size`` bytes at ``offset`` and checksum them; runs on the I/O pool"""
+        if hasattr(os, 'pread'):
+            chunk = os.pread(file.fileno(), size, offset)
+        else:
+            file.seek(offset)
+            chunk = file.read(size)
+        return chunk, self.chunk_checksum(chunk)
+
+    @staticmethod
+    def chunk_checksum(chunk: bytes) -> str:
+        """Per-chunk integrity hash, cheap enough to compute on every chunk"""
+        return chunk_digest(chunk)
+
+    async def read_file_chunks(self, file_path: str, raw: bool = False,
+                               offset: int = 0, length: Optional[int] = None):
+        """Generator function to read a file (or a byte range of it) in chunks.
+
+        Reads run on a thread pool so slow disks don't block the event loop.
+        Every chunk carries its offset and checksum, which lets the receiver
+        verify chunks as they arrive and resume from any offset. With ``raw``
+        set, chunks are yielded as bytes for binary framing instead of base64
+        strings.
+        """
         try:
             full_path = self._validate_path(file_path)
             if not os.path.isfile(full_path):
                 raise FileNotFoundError(f"File not found: {file_path}")
 
             file_size = os.path.getsize(full_path)
-            bytes_read = 0
-            checksum = hashlib.md5()
+            if offset < 0 or offset > file_size or (length is not None and length < 0):
+                raise ValueError(f"Invalid range: offset={offset} length={length}")
+            end = file_size if length is None else min(file_size, offset + length)
+            position = offset
+            loop = asyncio.get_running_loop()
 
             with open(full_path, 'rb') as file:
-                while chunk := file.read(self.chunk_size):
-                    checksum.update(chunk)
-                    bytes_read += len(chunk)
-                    progress = (bytes_read / file_size) * 100
+                while position < end:
+                    chunk, checksum = await loop.run_in_executor(
+                        self._executor, self._read_at, file, position, min(self.chunk_size, end - position)
+                    )
+                    if not chunk:
+                        break  # File shrank underneath us
+                    chunk_offset = position
+                    position += len(chunk)
+                    progress = (position / file_size) * 100
                     self.transfer_progress[file_path] = progress
-                    
+
                     yield {
-                        'chunk': base64.b64encode(chunk).decode('utf-8'),
+                        'chunk': chunk if raw else base64.b64encode(chunk).decode('utf-8'),
+                        'offset': chunk_offset,
+                        'length': len(chunk),
+                        'checksum': checksum,
                         'progress': progress,
                         'total_size': file_size
                     }
 
-            # Final response with checksum
+            # Final response describing the range that was sent
             yield {
                 'complete': True,
-                'checksum': checksum.hexdigest(),
+                'offset': offset,
+                'length': position - offset,
                 'total_size': file_size
             }
-            
-            del self.transfer_progress[file_path]
+
+            self.transfer_progress.pop(file_path, None)
 
         except Exception as e:
             yield {
                 'error': str(e)
             }
-            if file_path in self.transfer_progress:
-                del self.transfer_progress[file_path]
+            self.transfer_progress.pop(file_path, None)
+
+    def _write_archive(self, full_path: str, sink: _ArchiveSink):
+        """Stream ``full_path`` as a tar archive into ``sink``; runs on its own thread"""
+        try:
+            walk = []
+            total = 0
+            for root, dirs, files in os.walk(full_path):
+                dirs.sort()
+                walk.append(root)
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    walk.append(path)
+                    try:
+                        total += os.lstat(path).st_size
+                    except OSError:
+                        pass
+            sink._put(('total', total))
+
+            parent = os.path.dirname(full_path.rstrip(os.sep))
+            with tarfile.open(fileobj=sink, mode='w|') as tar:
+                for path in walk:
+                    try:
+                        tar.add(path, arcname=os.path.relpath(path, parent), recursive=False)
+                    except OSError:
+                        continue  # Skip files we can't read
+            sink.close_stream()
+            sink._put(None)
+        except InterruptedError:
+            pass
+        except Exception as e:
+            try:
+                sink._put(e)
+            except InterruptedError:
+                pass
+
+    async def read_directory_archive(self, dir_path: str, raw: bool = False, offset: int = 0):
+        """Generator streaming a directory as a tar archive built on the fly.
+
+        Nothing is staged on disk: a producer thread writes the archive into
+        a small bounded asyncio queue. Chunks carry the same fields as
+        ``read_file_chunks``, with offsets into the archive; progress is
+        measured against the total size of the files.
+        """
+        cancelled = threading.Event()
+        chunks = asyncio.Queue(maxsize=4)
+        try:
+            full_path = self._validate_path(dir_path)
+            if not os.path.isdir(full_path):
+                raise NotADirectoryError(f"Directory not found: {dir_path}")
+
+            sink = _ArchiveSink(chunks, asyncio.get_running_loop(), self.chunk_size, offset, cancelled)
+            threading.Thread(
+                target=self._write_archive, args=(full_path, sink), name='file-archive', daemon=True
+            ).start()
+            position = offset
+            total = None
+
+            try:
+                while True:
+                    item = await chunks.get()
+                    if item is None:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    if item[0] == 'total':
+                        total = item[1]
+                        continue
+                    chunk, checksum = item
+                    chunk_offset = position
+                    position += len(chunk)
+                    # Tar headers and padding can take the archive past the file total
+                    progress = min((position / total) * 100, 99.9) if total else 0.0
+                    self.transfer_progress[dir_path] = progress
+
+                    yield {
+                        'chunk': chunk if raw else base64.b64encode(chunk).decode('utf-8'),
+                        'offset': chunk_offset,
+                        'length': len(chunk),
+                        'checksum': checksum,
+                        'progress': progress
+                    }
+            finally:
+                # Stops the producer at its next write
+                cancelled.set()
+
+            yield {
+                'complete': True,
+                'offset': offset,
+                'length': position - offset,
+                'total_size': position
+            }
+
+            self.transfer_progress.pop(dir_path, None)
+
+        except Exception as e:
+            yield {
+                'error': str(e)
+            }
+            self.transfer_progress.pop(dir_path, None)
+
+    @staticmethod
+    def _preallocate(file, size: int):
+        """Reserve disk space up front so chunk writes don't fragment or run out midway"""
+        if size and hasattr(os, 'posix_fallocate'):
+            os.posix_fallocate(file.fileno(), 0, size)
+        file.truncate(size)
+
+    def begin_upload(self, path: str, size: int, overwrite: bool = False) -> Dict[str, Union[bool, str, int]]:
+        """Start a chunked upload into a pre-allocated temp file next to ``path``"""
+        try:
+            full_path = self._validate_path(path)
+            if os.path.isdir(full_path):
+                raise IsADirectoryError(f"Path is a directory: {path}")
+            if os.path.exists(full_path) and not overwrite:
+                raise FileExistsError(f"Path already exists: {path}")
+            if not os.path.isdir(os.path.dirname(full_path)):
+                raise FileNotFoundError(f"Parent directory does not exist: {path}")
+            size = int(size)
+            if size < 0:
+                raise ValueError(f"Invalid upload size: {size}")
+
+            upload_id = next(self._upload_ids)
+            directory, name = os.path.split(full_path)
+            temp_path = os.path.join(directory, f".{name}.{upload_id}.part")
+            file = open(temp_path, 'w+b')
+            try:
+                self._preallocate(file, size)
+            except Exception:
+                file.close()
+                os.remove(temp_path)
+                raise
+
+            self.uploads[upload_id] = UploadSession(
+                upload_id=upload_id,
+                path=path,
+                full_path=full_path,
+                temp_path=temp_path,
+                size=size,
+                chunk_size=self.chunk_size,
+                file=file
+            )
+            self.transfer_progress[path] = 0.0
+            return {
+                'success': True,
+                'upload_id': upload_id,
+                'chunk_size': self.chunk_size,
+                'window': self.upload_window
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def _write_at(self, upload: UploadSession, offset: int, data: bytes):
+        """Write a chunk at its offset; runs on the I/O pool"""
+        if hasattr(os, 'pwrite'):
+            os.pwrite(upload.file.fileno(), data, offset)
+        else:
+            with upload.lock:
+                upload.file.seek(offset)
+                upload.file.write(data)
+
+    def _record_chunk(self, upload: UploadSession, offset: int, length: int) -> float:
+        """Count a written chunk towards the upload's progress; runs on the event loop only"""
+        # Retransmitted or already seeded chunks must not be counted twice
+        previous = upload.received.get(offset)
+        if previous is None:
+            upload.bytes_received += length
+        elif previous != length:
+            upload.bytes_received += length - previous
+        upload.received[offset] = length
+        upload.touched = time.monotonic()
+        progress = (upload.bytes_received / upload.size) * 100 if upload.size else 100.0
+        self.transfer_progress[upload.path] = progress
+        return progress
+
+    async def write_upload_chunk(self, upload_id: int, offset: int, data: bytes,
+                                 checksum: Optional[str] = None) -> Dict[str, Union[bool, str, int, float]]:
+        """Verify and write one chunk; chunks may arrive in any order"""
+        try:
+            upload = self.uploads.get(upload_id)
+            if upload is None:
+                raise ValueError(f"Unknown upload: {upload_id}")
+            offset = int(offset)
+            if offset < 0 or offset + len(data) > upload.size:
+                raise ValueError(f"Chunk outside upload range: offset={offset} length={len(data)}")
+            if checksum and self.chunk_checksum(data) != checksum:
+                raise ValueError(f"Checksum mismatch at offset {offset}")
+
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self._write_at, upload, offset, data)
+            progress = self._record_chunk(upload, offset, len(data))
+
+            return {
+                'success': True,
+                'upload_id': upload_id,
+                'offset': offset,
+                'length': len(data),
+                'bytes_received': upload.bytes_received,
+                'progress': progress
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'upload_id': upload_id,
+                'offset': offset,
+                'error': str(e)
+            }
+
+    def _copy_chunks(self, upload: UploadSession, basis_path: str, copies: List[tuple]) -> List[tuple]:
+        """Copy chunks the basis file already holds into the upload; runs on the I/O pool.
+
+        Returns the ``(offset, length)`` ranges written; the caller records them
+        on the event loop, where ``write_upload_chunk`` keeps its bookkeeping.
+        """
+        copied = []
+        with open(basis_path, 'rb') as basis:
+            for source, target, length, digest in copies:
+                data, checksum = self._read_at(basis, source, length)
+                # The basis may have changed since its manifest was built
+                if checksum != digest:
+                    continue
+                self._write_at(upload, target, data)
+                copied.append((target, length))
+        return copied
+
+    async def seed_upload(self, upload_id: int, chunks: List[list],
+                          basis: Optional[str] = None) -> Dict[str, Union[bool, str, int, list]]:
+        """Fill an upload from chunks already on disk, so only the rest needs sending.
+
+        ``chunks`` is the manifest of the file being uploaded. Chunks whose hash
+        appears in the manifest of ``basis`` (by default the file being
+        replaced) are copied locally; the response lists the byte ranges the
+        sender still has to transfer.
+        """
+        try:
+            upload = self.uploads.get(upload_id)
+            if upload is None:
+                raise ValueError(f"Unknown upload: {upload_id}")
+            basis = basis or upload.path
+            reused = 0
+            if os.path.isfile(self._validate_path(basis)):
+                manifest = await self.get_manifest(basis)
+                if not manifest['success']:
+                    raise ValueError(manifest['error'])
+                local = {digest: (offset, length) for offset, length, digest in manifest['chunks']}
+                copies = []
+                for offset, length, digest in chunks:
+                    found = local.get(digest)
+                    if found and found[1] == length and offset not in upload.received \
+                            and offset + length <= upload.size:
+                        copies.append((found[0], offset, length, digest))
+                if copies:
+                    loop = asyncio.get_running_loop()
+                    copied = await loop.run_in_executor(
+                        self._executor, self._copy_chunks, upload, self._validate_path(basis), copies
+                    )
+                    for offset, length in copied:
+                        if offset not in upload.received:
+                            reused += length
+                        self._record_chunk(upload, offset, length)
+
+            return {
+                'success': True,
+                'upload_id': upload_id,
+                'reused': reused,
+                'missing': self._missing_ranges(upload)
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'upload_id': upload_id,
+                'error': str(e)
+            }
+
+    def _missing_ranges(self, upload: UploadSession) -> List[List[int]]:
+        """Byte ranges not yet covered by received chunks"""
+        missing = []
+        position = 0
+        for offset in sorted(upload.received):
+            if offset > position:
+                missing.append([position, offset - position])
+            position = max(position, offset + upload.received[offset])
+        if position < upload.size:
+            missing.append([position, upload.size - position])
+        return missing
+
+    def _finish_upload(self, upload: UploadSession):
+        """Flush the temp file to disk and atomically move it into place"""
+        upload.file.flush()
+        os.fsync(upload.file.fileno())
+        upload.file.close()
+        os.replace(upload.temp_path, upload.full_path)
+
+    async def commit_upload(self, upload_id: int) -> Dict[str, Union[bool, str, list]]:
+        """Atomically replace the target with the upload once every byte has arrived"""
+        try:
+            upload = self.uploads.get(upload_id)
+            if upload is None:
+                raise ValueError(f"Unknown upload: {upload_id}")
+            missing = self._missing_ranges(upload)
+            if missing:
+                return {
+                    'success': False,
+                    'upload_id': upload_id,
+                    'error': 'Upload incomplete',
+                    'missing': missing
+                }
+
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self._finish_upload, upload)
+            del self.uploads[upload_id]
+            self.transfer_progress.pop(upload.path, None)
+            return {
+                'success': True,
+                'upload_id': upload_id,
+                'message': f'Upload complete: {upload.path}'
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'upload_id': upload_id,
+                'error': str(e)
+            }
+
+    def abort_upload(self, upload_id: int) -> Dict[str, Union[bool, str]]:
+        """Discard an upload and its temp file"""
+        try:
+            upload = self.uploads.pop(upload_id, None)
+            if upload is None:
+                raise ValueError(f"Unknown upload: {upload_id}")
+            upload.file.close()
+            if os.path.exists(upload.temp_path):
+                os.remove(upload.temp_path)
+            self.transfer_progress.pop(upload.path, None)
+            return {
+                'success': True,
+                'message': f'Upload aborted: {upload.path}'
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': str(e)
+            }
+
+    def abort_uploads(self, idle: Optional[float] = None) -> int:
+        """Abort every upload, or only those idle for ``idle`` seconds; returns how many"""
+        now = time.monotonic()
+        stale = [upload_id for upload_id, upload in self.uploads.items()
+                 if idle is None or now - upload.touched >= idle]
+        for upload_id in stale:
+            self.abort_upload(upload_id)
+        return len(stale)
 
     def delete_item(self, path: str) -> Dict[str, Union[bool, str]]:
         """Delete a file or directory with validation and error handling"""
@@ -0,0 +1,76 @@
+import io
+from collections import deque
+
+
+class FrameBuffer:
+    """Reusable output buffer that encoders write into after some headroom.
+
+    Encoded tiles are appended back to back starting at ``HEADROOM``. Once
+    their sizes are known, the binary message prefix (header plus metadata)
+    is written into the headroom directly in front of them, so the finished
+    message is a single memoryview over the buffer with no join or
+    ``getvalue()`` copies.
+    """
+
+    HEADROOM = 4096
+
+    def __init__(self):
+        self.file = io.BytesIO()
+        self._view = None
+        self.reset()
+
+    def reset(self):
+        """Rewind for the next frame, keeping the allocated storage"""
+        self.release()
+        try:
+            self.file.seek(self.HEADROOM)
+            # Writing fails if an old view is still exported somewhere
+            self.file.write(b'')
+        except BufferError:
+            self.file = io.BytesIO()
+            self.file.seek(self.HEADROOM)
+
+    def release(self):
+        """Drop the exported view so the buffer can be written again"""
+        if self._view is not None:
+            try:
+                self._view.release()
+            except BufferError:
+                pass
+            self._view = None
+
+    def tell(self):
+        return self.file.tell()
+
+    def view(self, start, end):
+        """Zero-copy view of encoded bytes between two offsets"""
+        if self._view is None:
+            self._view = self.file.getbuffer()
+        return self._view[start:end]
+
+    def finish(self, prefix, end):
+        """Place ``prefix`` in the headroom and return the whole message as a view"""
+        if len(prefix) > self.HEADROOM:
+            # Oversized metadata, fall back to one copy
+            return prefix + bytes(self.view(self.HEADROOM, end))
+        start = self.HEADROOM - len(prefix)
+        if self._view is None:
+            self._view = self.file.getbuffer()
+        self._view[start:self.HEADROOM] = prefix
+        return self._view[start:end]
+
+
+class FrameBufferPool:
+    """Small free list of FrameBuffers shared between capture and send"""
+
+    def __init__(self, size: int = 4):
+        self._free = deque(FrameBuffer() for _ in range(size))
+
+    def acquire(self) -> FrameBuffer:
+        buffer = self._free.popleft() if self._free else FrameBuffer()
+        buffer.reset()
+        return buffer
+
+    def release(self, buffer: FrameBuffer):
+        buffer.release()
+        self._free.append(buffer)
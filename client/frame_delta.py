@@ -0,0 +1,108 @@
+import time
+import zlib
+from typing import List, Optional, Tuple
+
+Rect = Tuple[int, int, int, int]
+
+
+class TileDiffer:
+    """Track per-tile hashes of captured frames to find the regions that changed"""
+
+    def __init__(self, tile_size: int = 64, keyframe_interval: float = 5.0,
+                 keyframe_ratio: float = 0.5):
+        self.tile_size = tile_size
+        self.keyframe_interval = keyframe_interval
+        self.keyframe_ratio = keyframe_ratio
+        self.reset()
+
+    def reset(self):
+        """Forget the previous frame so the next diff produces a keyframe"""
+        self._hashes: List[int] = []
+        self._size: Optional[Tuple[int, int]] = None
+        self._last_keyframe = 0.0
+        self.last_dirty: Optional[List[int]] = None
+        # Whether the last diff saw the screen change; periodic keyframes of a static screen do not count
+        self.changed = False
+
+    def request_keyframe(self):
+        """Force the next diff to produce a keyframe"""
+        self._last_keyframe = 0.0
+
+    def invalidate(self, tiles: List[int]):
+        """Mark tiles as changed, e.g. after the delta carrying them was dropped"""
+        for index in tiles:
+            if index < len(self._hashes):
+                self._hashes[index] = -1
+
+    def _hash_tiles(self, raw, width: int, height: int, stride: int) -> List[int]:
+        """Hash every tile of a raw BGRA buffer, row-major from the top-left"""
+        tile = self.tile_size
+        view = memoryview(raw)
+        hashes = []
+        for ty in range(0, height, tile):
+            y_end = min(ty + tile, height)
+            for tx in range(0, width, tile):
+                start = tx * 4
+                end = min(tx + tile, width) * 4
+                crc = 0
+                for y in range(ty, y_end):
+                    offset = y * stride
+                    crc = zlib.crc32(view[offset + start:offset + end], crc)
+                hashes.append(crc)
+        return hashes
+
+    def _merge_runs(self, dirty: List[int], width: int, height: int) -> List[Rect]:
+        """Merge horizontally adjacent dirty tiles into (x, y, w, h) rectangles"""
+        tile = self.tile_size
+        cols = (width + tile - 1) // tile
+        rects: List[Rect] = []
+        run_start = None
+        previous = None
+        for index in dirty + [None]:
+            if (index is not None and previous is not None and index == previous + 1
+                    and index // cols == previous // cols):
+                previous = index
+                continue
+            if run_start is not None:
+                x = (run_start % cols) * tile
+                y = (run_start // cols) * tile
+                x_end = min(((previous % cols) + 1) * tile, width)
+                rects.append((x, y, x_end - x, min(tile, height - y)))
+            run_start = previous = index
+        return rects
+
+    def diff(self, raw, width: int, height: int, stride: int = None,
+             keyframe_interval: Optional[float] = None):
+        """Compare a frame against the previous one.
+
+        Returns ``(keyframe, rects)`` where ``rects`` lists the dirty regions in
+        source pixel coordinates, or ``None`` when nothing changed.
+        ``keyframe_interval`` overrides the periodic keyframe interval for this call.
+        """
+        stride = stride or width * 4
+        hashes = self._hash_tiles(raw, width, height, stride)
+        now = time.monotonic()
+        interval = self.keyframe_interval if keyframe_interval is None else keyframe_interval
+
+        if (self._size != (width, height) or not self._hashes
+                or now - self._last_keyframe >= interval):
+            self.changed = self._size != (width, height) or hashes != self._hashes
+            self._hashes = hashes
+            self._size = (width, height)
+            self._last_keyframe = now
+            self.last_dirty = None
+            return True, [(0, 0, width, height)]
+
+        dirty = [i for i, (old, new) in enumerate(zip(self._hashes, hashes)) if old != new]
+        self._hashes = hashes
+        self.changed = bool(dirty)
+        if not dirty:
+            return None
+
+        if len(dirty) >= len(hashes) * self.keyframe_ratio:
+            self._last_keyframe = now
+            self.last_dirty = None
+            return True, [(0, 0, width, height)]
+
+        self.last_dirty = dirty
+        return False, self._merge_runs(dirty, width, height)
@@ -0,0 +1,121 @@
+from typing import Dict
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+try:
+    from turbojpeg import TJPF_RGB, TJSAMP_420, TurboJPEG
+except ImportError:
+    TurboJPEG = None
+
+
+class FrameEncoder:
+    """Encode an RGB PIL image into a writable binary file object"""
+
+    name = None
+    format = None
+    lossless = False
+
+    def available(self) -> bool:
+        return True
+
+    def encode(self, img, quality: int, out):
+        raise NotImplementedError
+
+
+class PillowJpegEncoder(FrameEncoder):
+    name = 'jpeg'
+    format = 'jpeg'
+
+    def encode(self, img, quality, out):
+        img.save(out, format='JPEG', quality=quality)
+
+
+class PillowPngEncoder(FrameEncoder):
+    """Lossless PNG, mostly useful for text-heavy regions"""
+
+    name = 'png'
+    format = 'png'
+    lossless = True
+
+    def encode(self, img, quality, out):
+        # Favour speed over size; quality does not apply to PNG
+        img.save(out, format='PNG', compress_level=1)
+
+
+class OpenCVEncoder(FrameEncoder):
+    """JPEG or WebP through ``cv2.imencode``"""
+
+    def __init__(self, name, format, extension, quality_flag):
+        self.name = name
+        self.format = format
+        self._extension = extension
+        self._quality_flag = quality_flag
+
+    def available(self):
+        return cv2 is not None and np is not None
+
+    def encode(self, img, quality, out):
+        # OpenCV expects BGR channel order
+        pixels = np.asarray(img)[:, :, ::-1]
+        ok, encoded = cv2.imencode(self._extension, pixels, [getattr(cv2, self._quality_flag), int(quality)])
+        if not ok:
+            raise ValueError(f"OpenCV failed to encode {self.format}")
+        out.write(encoded.data)
+
+
+class TurboJpegEncoder(FrameEncoder):
+    """libjpeg-turbo through PyTurboJPEG, when it is installed"""
+
+    name = 'turbojpeg'
+    format = 'jpeg'
+
+    def __init__(self):
+        self._jpeg = None
+
+    def available(self):
+        if TurboJPEG is None or np is None:
+            return False
+        try:
+            self._jpeg = self._jpeg or TurboJPEG()
+        except (OSError, RuntimeError):
+            # Python bindings present but the shared library is missing
+            return False
+        return True
+
+    def encode(self, img, quality, out):
+        out.write(self._jpeg.encode(np.asarray(img), quality=int(quality),
+                                    pixel_format=TJPF_RGB, jpeg_subsample=TJSAMP_420))
+
+
+ENCODERS: Dict[str, FrameEncoder] = {
+    encoder.name: encoder for encoder in (
+        PillowJpegEncoder(),
+        PillowPngEncoder(),
+        OpenCVEncoder('cv-jpeg', 'jpeg', '.jpg', 'IMWRITE_JPEG_QUALITY'),
+        OpenCVEncoder('cv-webp', 'webp', '.webp', 'IMWRITE_WEBP_QUALITY'),
+        TurboJpegEncoder(),
+    )
+}
+
+
+def available_encoders():
+    """Names of the encoders usable on this machine"""
+    return [name for name, encoder in ENCODERS.items() if encoder.available()]
+
+
+def get_encoder(name: str) -> FrameEncoder:
+    """Look up an encoder by name, failing if it is unknown or unavailable"""
+    encoder = ENCODERS.get(name)
+    if encoder is None:
+        raise ValueError(f"Unknown frame encoder: {name}")
+    if not encoder.available():
+        raise ValueError(f"Frame encoder not available: {name}")
+    return encoder
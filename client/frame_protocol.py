@@ -0,0 +1,69 @@
+import json
+import struct
+from typing import Dict, Iterable, Optional
+
+# Binary message layout (network byte order):
+#   magic(2s) version(B) msg_type(B) flags(B) pad(x) meta_len(H)
+#   stream_id(I) seq(I) payload_len(I)
+# followed by ``meta_len`` bytes of compact JSON metadata and
+# ``payload_len`` bytes of raw payload.
+MAGIC = b'RD'
+VERSION = 1
+HEADER = struct.Struct('!2sBBBxHIII')
+
+# Message types
+SCREEN_FRAME = 1
+FILE_CHUNK = 2
+SCREENSHOT = 3
+
+MESSAGE_TYPES = {
+    SCREEN_FRAME: 'screen_frame',
+    FILE_CHUNK: 'file_chunk',
+    SCREENSHOT: 'screenshot',
+}
+
+# Flags
+FLAG_KEYFRAME = 0x01
+FLAG_FINAL = 0x02
+
+
+def pack_prefix(msg_type: int, stream_id: int, seq: int, payload_len: int,
+                meta: Optional[Dict] = None, flags: int = 0) -> bytes:
+    """Pack the header and metadata that precede a payload of ``payload_len`` bytes"""
+    meta_bytes = json.dumps(meta, separators=(',', ':')).encode() if meta else b''
+    if len(meta_bytes) > 0xFFFF:
+        raise ValueError("Binary message metadata too large")
+    header = HEADER.pack(MAGIC, VERSION, msg_type, flags, len(meta_bytes),
+                         stream_id & 0xFFFFFFFF, seq & 0xFFFFFFFF, payload_len)
+    return header + meta_bytes
+
+
+def pack_message(msg_type: int, stream_id: int, seq: int, payload: Iterable[bytes] = (),
+                 meta: Optional[Dict] = None, flags: int = 0) -> bytes:
+    """Pack a header, optional metadata and raw payload parts into one binary message"""
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        payload = (payload,)
+    parts = list(payload)
+    prefix = pack_prefix(msg_type, stream_id, seq, sum(len(part) for part in parts), meta, flags)
+    return b''.join([prefix, *parts])
+
+
+def unpack_message(data) -> Dict:
+    """Unpack a binary message into its header fields, metadata and payload view"""
+    view = memoryview(data)
+    if len(view) < HEADER.size:
+        raise ValueError("Binary message shorter than header")
+    magic, version, msg_type, flags, meta_len, stream_id, seq, payload_len = HEADER.unpack_from(view)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Unsupported binary message format")
+    meta_end = HEADER.size + meta_len
+    if len(view) != meta_end + payload_len:
+        raise ValueError("Binary message length mismatch")
+    return {
+        'msg_type': msg_type,
+        'flags': flags,
+        'stream_id': stream_id,
+        'seq': seq,
+        'meta': json.loads(bytes(view[HEADER.size:meta_end])) if meta_len else {},
+        'payload': view[meta_end:]
+    }
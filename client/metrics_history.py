@@ -0,0 +1,162 @@
+import math
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from telemetry import FIELDS, RingBuffer, TelemetrySampler
+
+METRICS = FIELDS[1:]
+ROLLUPS = ('min', 'max', 'avg')
+
+
+class MetricsHistory:
+    """Local metrics history at several resolutions.
+
+    The sampler's own ring buffer is the finest level (one row per sample).
+    Coarser levels keep min/max/avg rollups per bucket in their own
+    fixed-size ring buffers, e.g. one row per minute for a day. Buckets are
+    filled from samples as they arrive, so nothing is recomputed on query.
+    """
+
+    def __init__(self, sampler: TelemetrySampler, levels: Sequence[Tuple[int, int]] = ((60, 1440), (900, 672))):
+        self.sampler = sampler
+        # Guards the rollup levels; the sampler's own level is read through its snapshot API
+        self._lock = threading.Lock()
+        rollup_fields = ['timestamp'] + [f'{metric}_{rollup}' for metric in METRICS for rollup in ROLLUPS]
+        self.rollups = {resolution: RingBuffer(rollup_fields, capacity) for resolution, capacity in levels}
+        self._buckets: Dict[int, Optional[list]] = {resolution: None for resolution in self.rollups}
+        sampler.subscribe(self.add)
+
+    def add(self, sample: Dict[str, object]):
+        """Fold one sample into the open bucket of every rollup level"""
+        timestamp = sample['sampled_at']
+        values = [sample[metric] for metric in METRICS]
+        with self._lock:
+            for resolution in self.rollups:
+                start = timestamp - timestamp % resolution
+                bucket = self._buckets[resolution]
+                if bucket is not None and bucket[0] != start:
+                    self._flush(resolution, bucket)
+                    bucket = None
+                if bucket is None:
+                    bucket = self._buckets[resolution] = [start, 0, [0.0] * len(values), list(values), list(values)]
+                bucket[1] += 1
+                sums, mins, maxs = bucket[2], bucket[3], bucket[4]
+                for i, value in enumerate(values):
+                    sums[i] += value
+                    if value < mins[i]:
+                        mins[i] = value
+                    elif value > maxs[i]:
+                        maxs[i] = value
+
+    def _flush(self, resolution: int, bucket: list):
+        start, count, sums, mins, maxs = bucket
+        row = [start]
+        for i in range(len(sums)):
+            row.extend((mins[i], maxs[i], sums[i] / count))
+        self.rollups[resolution].append(row)
+
+    def _levels(self):
+        """``(resolution, ring, rolled_up)`` from finest to coarsest"""
+        levels = [(self.sampler.interval, self.sampler.samples, False)]
+        levels.extend((resolution, ring, True) for resolution, ring in sorted(self.rollups.items()))
+        return levels
+
+    def _oldest(self, level) -> Optional[Dict[str, float]]:
+        _, ring, rolled_up = level
+        if not rolled_up:
+            return self.sampler.oldest()
+        with self._lock:
+            return ring.oldest()
+
+    def _snapshot(self, level, fields: List[str]) -> Dict[str, List[float]]:
+        _, ring, rolled_up = level
+        if not rolled_up:
+            return self.sampler.snapshot(fields)
+        with self._lock:
+            return ring.snapshot(fields)
+
+    def _choose_level(self, start: Optional[float], resolution: Optional[float]):
+        """Finest level no coarser than ``resolution`` that still reaches back to ``start``"""
+        levels = self._levels()
+        usable = [level for level in levels if resolution is None or level[0] <= resolution] or levels[:1]
+        for level in usable:
+            oldest = self._oldest(level)
+            if oldest is None:
+                continue
+            if start is None or oldest['timestamp'] <= start or not level[1].full:
+                return level
+        # Nothing covers the range; the level with the longest retention comes closest
+        return max(levels, key=lambda level: level[0] * level[1].capacity)
+
+    def query(self, start: Optional[float] = None, end: Optional[float] = None,
+              resolution: Optional[float] = None, metrics: Optional[List[str]] = None) -> Dict[str, object]:
+        """Columnar history between ``start`` and ``end`` (epoch seconds).
+
+        Levels finer than ``resolution`` are downsampled into buckets of that
+        size. Series carry ``avg`` values, plus ``min``/``max`` once rolled up.
+        """
+        metrics = list(metrics or METRICS)
+        unknown = set(metrics) - set(METRICS)
+        if unknown:
+            raise ValueError(f"Unknown metrics: {', '.join(sorted(unknown))}")
+        start = None if start is None else float(start)
+        end = math.inf if end is None else float(end)
+        resolution = None if resolution is None else float(resolution)
+
+        level = self._choose_level(start, resolution)
+        level_resolution, _, rolled_up = level
+        if rolled_up:
+            fields = [f'{metric}_{rollup}' for metric in metrics for rollup in ROLLUPS]
+        else:
+            fields = list(metrics)
+        columns = self._snapshot(level, ['timestamp'] + fields)
+        timestamps = columns['timestamp']
+        indexes = [
+            i for i, timestamp in enumerate(timestamps) if (start is None or timestamp >= start) and timestamp <= end
+        ]
+        times = [timestamps[i] for i in indexes]
+        series = {}
+        for metric in metrics:
+            if rolled_up:
+                series[metric] = {
+                    rollup: [columns[f'{metric}_{rollup}'][i] for i in indexes] for rollup in ROLLUPS
+                }
+            else:
+                values = [columns[metric][i] for i in indexes]
+                series[metric] = {'avg': values, 'min': values, 'max': values}
+
+        if resolution is not None and resolution > level_resolution and times:
+            times, series = self._downsample(times, series, resolution)
+            level_resolution, rolled_up = resolution, True
+        if not rolled_up:
+            for values in series.values():
+                del values['min'], values['max']
+
+        return {
+            'resolution': level_resolution,
+            'timestamps': times,
+            'series': series
+        }
+
+    @staticmethod
+    def _downsample(times: List[float], series: Dict[str, Dict[str, list]], resolution: float):
+        buckets = []
+        for index, timestamp in enumerate(times):
+            start = timestamp - timestamp % resolution
+            if not buckets or buckets[-1][0] != start:
+                buckets.append((start, []))
+            buckets[-1][1].append(index)
+
+        merged = {}
+        for metric, values in series.items():
+            merged[metric] = {
+                'min': [min(values['min'][i] for i in members) for _, members in buckets],
+                'max': [max(values['max'][i] for i in members) for _, members in buckets],
+                'avg': [sum(values['avg'][i] for i in members) / len(members) for _, members in buckets],
+            }
+        return [start for start, _ in buckets], merged
+
+    def since(self, timestamp: float) -> List[List[float]]:
+        """Raw sample rows newer than ``timestamp``, as ``[timestamp, *METRICS]`` lists"""
+        columns = self.sampler.snapshot(FIELDS)
+        return [list(row) for row in zip(*(columns[field] for field in FIELDS)) if row[0] > timestamp]
@@ -0,0 +1,191 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+import psutil
+
+BASE_FIELDS = ('pid', 'name', 'cpu_percent', 'memory_percent', 'create_time')
+# Costlier fields, only collected while some caller keeps asking for them
+EXTRA_FIELDS = ('rss', 'threads', 'io_read_bytes', 'io_write_bytes', 'username', 'status')
+
+
+def _read_extra(proc: psutil.Process, field: str):
+    if field == 'rss':
+        return proc.memory_info().rss
+    if field == 'threads':
+        return proc.num_threads()
+    if field in ('io_read_bytes', 'io_write_bytes'):
+        counters = proc.io_counters()
+        return counters.read_bytes if field == 'io_read_bytes' else counters.write_bytes
+    if field == 'username':
+        return proc.username()
+    if field == 'status':
+        return proc.status()
+    raise ValueError(f"Unknown process field: {field}")
+
+
+class ProcessTracker:
+    """Keep process state between calls and answer with deltas.
+
+    Every refresh bumps ``version``. Callers pass back the version they last
+    saw and get only the processes that were added, removed or changed since
+    then within their view (filter, sort, top-N). CPU and memory percentages
+    are rounded so that jitter does not mark every process as changed.
+    Extra fields stop being collected once no snapshot has asked for them
+    for ``field_ttl`` seconds.
+    """
+
+    def __init__(self, min_interval: float = 1.0, views: int = 32, field_ttl: float = 60.0):
+        self.min_interval = min_interval
+        self.field_ttl = field_ttl
+        self.version = 0
+        self.fields = set(BASE_FIELDS)
+        # When each extra field was last requested
+        self._requested: Dict[str, float] = {}
+        self._procs: Dict[int, psutil.Process] = {}
+        self._rows: Dict[int, dict] = {}
+        self._changed_at: Dict[int, int] = {}
+        self._refreshed_at = 0.0
+        # Pids each recent view contained, keyed by (view, version)
+        self._views: OrderedDict = OrderedDict()
+        self._view_limit = views
+        self._lock = threading.Lock()
+
+    def _collect(self, pid: int, proc: psutil.Process, fields) -> dict:
+        with proc.oneshot():
+            row = {
+                'pid': pid,
+                'name': self._rows[pid]['name'] if pid in self._rows else proc.name(),
+                'cpu_percent': round(proc.cpu_percent(None), 1),
+                'memory_percent': round(proc.memory_percent(), 2),
+                'create_time': proc.create_time(),
+            }
+            for field in fields:
+                if field not in row:
+                    try:
+                        row[field] = _read_extra(proc, field)
+                    except (psutil.AccessDenied, psutil.ZombieProcess, NotImplementedError, AttributeError):
+                        row[field] = None
+        return row
+
+    def _refresh(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._refreshed_at < self.min_interval:
+            return
+        self._refreshed_at = now
+        self.version += 1
+        expired = {field for field, at in self._requested.items() if now - at > self.field_ttl}
+        if expired:
+            # Rows lose the field, so they show up as changed in this version's deltas
+            for field in expired:
+                del self._requested[field]
+            self.fields = self.fields - expired
+        fields = self.fields
+        seen = set()
+        for pid in psutil.pids():
+            proc = self._procs.get(pid)
+            try:
+                if proc is None or not proc.is_running():
+                    # New process, or a recycled pid
+                    proc = psutil.Process(pid)
+                    proc.cpu_percent(None)
+                    self._procs[pid] = proc
+                    self._rows.pop(pid, None)
+                row = self._collect(pid, proc, fields)
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+            seen.add(pid)
+            if self._rows.get(pid) != row:
+                self._rows[pid] = row
+                self._changed_at[pid] = self.version
+        for pid in set(self._rows) - seen:
+            del self._rows[pid]
+            self._changed_at.pop(pid, None)
+            self._procs.pop(pid, None)
+        for pid in set(self._procs) - seen:
+            del self._procs[pid]
+
+    def _view(self, name: Optional[str], min_cpu: Optional[float], min_memory: Optional[float],
+              sort: Optional[str], reverse: bool, limit: Optional[int]) -> List[int]:
+        rows: Iterable[dict] = self._rows.values()
+        if name:
+            needle = name.lower()
+            rows = [row for row in rows if needle in row['name'].lower()]
+        if min_cpu is not None:
+            rows = [row for row in rows if row['cpu_percent'] >= min_cpu]
+        if min_memory is not None:
+            rows = [row for row in rows if row['memory_percent'] >= min_memory]
+        rows = list(rows)
+        if sort:
+            if sort not in self.fields:
+                raise ValueError(f"Cannot sort by {sort}")
+            # None sorts last either way
+            present = [row for row in rows if row[sort] is not None]
+            missing = [row for row in rows if row[sort] is None]
+            rows = sorted(present, key=lambda row: row[sort], reverse=reverse) + missing
+        if limit:
+            rows = rows[:int(limit)]
+        return [row['pid'] for row in rows]
+
+    def _output(self, pid: int, now: float) -> dict:
+        row = dict(self._rows[pid])
+        row['running_time'] = now - row['create_time']
+        return row
+
+    def current(self, name: Optional[str] = None) -> List[dict]:
+        """Current rows, optionally filtered by name, refreshed at most every ``min_interval``"""
+        with self._lock:
+            self._refresh()
+            needle = name.lower() if name else None
+            return [dict(row) for row in self._rows.values() if needle is None or needle in row['name'].lower()]
+
+    def snapshot(self, since: Optional[int] = None, fields: Optional[List[str]] = None,
+                 name: Optional[str] = None, min_cpu: Optional[float] = None,
+                 min_memory: Optional[float] = None, sort: Optional[str] = None,
+                 reverse: bool = True, limit: Optional[int] = None) -> Dict[str, object]:
+        """Processes in the requested view, as a delta against ``since`` when possible"""
+        with self._lock:
+            requested = set(fields or ())
+            unknown = requested - set(BASE_FIELDS) - set(EXTRA_FIELDS)
+            if unknown:
+                raise ValueError(f"Unknown process fields: {', '.join(sorted(unknown))}")
+            if sort in EXTRA_FIELDS:
+                # Sorting by a field keeps it collected as much as asking for it
+                requested.add(sort)
+            requested_at = time.monotonic()
+            for field in requested.intersection(EXTRA_FIELDS):
+                self._requested[field] = requested_at
+            new_fields = requested - self.fields
+            if new_fields:
+                # Newly collected fields change every row, so deltas restart from here
+                self.fields = self.fields | new_fields
+                self._views.clear()
+            self._refresh(force=bool(new_fields))
+
+            pids = self._view(name, min_cpu, min_memory, sort, reverse, limit)
+            key = (name, min_cpu, min_memory, sort, reverse, limit)
+            self._views[(key, self.version)] = set(pids)
+            self._views.move_to_end((key, self.version))
+            while len(self._views) > self._view_limit:
+                self._views.popitem(last=False)
+
+            now = time.time()
+            result = {'version': self.version, 'total': len(pids)}
+            previous = self._views.get((key, since)) if since is not None else None
+            if previous is None:
+                result['full'] = True
+                result['processes'] = [self._output(pid, now) for pid in pids]
+                return result
+
+            current = set(pids)
+            result['full'] = False
+            result['added'] = [self._output(pid, now) for pid in pids if pid not in previous]
+            result['changed'] = [
+                self._output(pid, now) for pid in pids
+                if pid in previous and self._changed_at.get(pid, 0) > since
+            ]
+            result['removed'] = [pid for pid in previous if pid not in current]
+            if sort or limit:
+                result['order'] = pids
+            return result
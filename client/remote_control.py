@@ -5,20 +5,46 @@ import logging
 import pyautogui
 from PIL import Image
 import io
+import time
 import mss
 import keyboard
 import mouse
+from activity import ActivityTracker
+from cursor import CursorProbe
+from frame_encoders import get_encoder
+from frame_protocol import FLAG_FINAL, SCREENSHOT, pack_message
+from screen_stream import ScreenStream
 from secure_connection import SecureConnection
 
 class RemoteControl:
-    def __init__(self, server_url, encryption_key):
+    # Seconds before the cached screen size is re-read
+    SCREEN_SIZE_TTL = 5.0
+
+    def __init__(self, server_url=None, encryption_key=None):
         self.logger = logging.getLogger(__name__)
-        self.connection = SecureConnection(server_url, encryption_key)
+        # Without a server URL this runs inside another client and shares its connection
+        self.connection = SecureConnection(server_url, encryption_key) if server_url else None
         self.stream_settings = {
             'quality': 80,
-            'scale': 1.0
+            'scale': 1.0,
+            'delta': True,
+            'tile_size': 64,
+            'keyframe_interval': 5.0,
+            # Frame encoder backend, see frame_encoders.ENCODERS
+            'encoder': 'jpeg',
+            # mss monitor indexes to stream, each as its own stream
+            'monitors': [1],
+            # Optional regions ({left, top, width, height}) streamed instead
+            'regions': []
         }
-        self.sct = mss.mss()
+        self.activity = ActivityTracker(self.stream_settings)
+        self.cursor = CursorProbe()
+        self._screen_size = None
+        self._screen_size_checked = 0.0
+        self.streams = {}
+        self._stream_tasks = []
+        self._stream_target = None
+        self.frame_seq = 0
         self.running = False
         
         # Disable pyautogui safety features for remote control
@@ -26,6 +52,8 @@ class RemoteControl:
         
     async def start(self):
         """Start the remote control session"""
+        if self.connection is None:
+            raise RuntimeError("RemoteControl has no connection of its own")
         if await self.connection.connect():
             self.running = True
             await asyncio.gather(
@@ -36,7 +64,9 @@ class RemoteControl:
     async def stop(self):
         """Stop the remote control session"""
         self.running = False
-        await self.connection.disconnect()
+        self.stop_screen_stream()
+        if self.connection is not None:
+            await self.connection.disconnect()
 
     async def keep_alive(self):
         """Keep the connection alive with periodic pings"""
@@ -62,97 +92,252 @@ class RemoteControl:
         """Process received messages based on their action type"""
         action = message.get('action')
         if action == 'start_stream':
-            self.stream_settings.update(message.get('settings', {}))
-            asyncio.create_task(self.stream_screen())
+            self.update_stream_settings(message.get('settings', {}))
+            self.start_screen_stream(lambda frame, stream_id: self.connection.send_message(frame),
+                                     binary=self.connection.supports_binary)
         elif action == 'stop_stream':
-            self.running = False
+            self.stop_screen_stream()
         elif action == 'mouse_event':
-            await self.handle_mouse_event(message)
+            self.handle_mouse_event(message)
         elif action == 'keyboard_event':
-            await self.handle_keyboard_event(message)
+            self.handle_keyboard_event(message)
+        elif action == 'input_batch':
+            self.handle_input_batch(message.get('events'))
         elif action == 'update_stream_settings':
-            self.stream_settings.update(message.get('settings', {}))
+            self.update_stream_settings(message.get('settings', {}))
+        elif action == 'request_keyframe':
+            self.request_keyframe(message.get('stream_id'))
+        elif action == 'list_monitors':
+            await self.connection.send_message({'type': 'monitors', 'monitors': self.list_monitors()})
 
-    async def stream_screen(self):
-        """Capture and stream screen to the server"""
-        while self.running:
-            try:
-                # Capture the primary monitor
-                screen = self.sct.grab(self.sct.monitors[1])
-                
-                # Convert to PIL Image
-                img = Image.frombytes('RGB', screen.size, screen.rgb)
-                
-                # Apply scaling if needed
-                if self.stream_settings['scale'] != 1.0:
-                    new_size = tuple(int(dim * self.stream_settings['scale']) for dim in img.size)
-                    img = img.resize(new_size, Image.LANCZOS)
-
-                # Encode image with quality setting
-                buffer = io.BytesIO()
-                img.save(buffer, format='JPEG', quality=self.stream_settings['quality'])
-                buffer = buffer.getvalue()
-                
-                # Convert to base64
-                img_base64 = base64.b64encode(buffer).decode()
-
-                # Send frame to server
-                await self.connection.send_message({
-                    'type': 'screen_frame',
-                    'data': img_base64,
-                    'width': img.shape[1],
-                    'height': img.shape[0]
-                })
-
-                # Control frame rate based on quality
-                delay = max(1.0 / 30, 1.0 - (self.stream_settings['quality'] / 100))
-                await asyncio.sleep(delay)
+    def list_monitors(self):
+        """Describe the monitors available for streaming; index 0 is the whole desktop"""
+        # mss handles are thread-local, and this may run on any worker thread
+        with mss.mss() as sct:
+            return [{'index': index, **monitor} for index, monitor in enumerate(sct.monitors)]
+
+    def _stream_sources(self):
+        """Monitors or regions selected in the stream settings"""
+        regions = self.stream_settings.get('regions') or []
+        if regions:
+            return [dict(region) for region in regions]
+        return [int(monitor) for monitor in self.stream_settings.get('monitors') or [1]]
+
+    def update_stream_settings(self, settings):
+        """Apply new stream settings to every stream.
+
+        Besides ``quality``/``scale``/``fps`` (upper bounds when adaptive), the
+        adaptive controller accepts ``adaptive``, ``target_bitrate``,
+        ``target_latency`` and the ``min_*``/``max_*`` limits, which apply to
+        each stream separately. ``encoder`` selects the frame encoder backend,
+        and ``boost_fps``/``boost_window``/``idle_after``/``heartbeat_interval``
+        tune activity-driven pacing. Changing ``monitors`` or ``regions`` restarts
+        a running stream with the new sources.
+        """
+        if 'encoder' in settings:
+            # Fail before touching any settings if the backend is unusable
+            get_encoder(settings['encoder'])
+        sources = self._stream_sources()
+        self.stream_settings.update(settings)
+        self.activity.configure(settings)
+        for stream in self.streams.values():
+            stream.update_settings(settings)
+
+        if self._stream_target and self._stream_sources() != sources:
+            self.start_screen_stream(*self._stream_target)
+
+    def request_keyframe(self, stream_id=None):
+        """Force a keyframe on one stream, or all of them"""
+        for stream in self.streams.values():
+            if stream_id is None or stream.stream_id == stream_id:
+                stream.request_keyframe()
+
+    def start_screen_stream(self, send_frame, binary=False, send_cursor=None):
+        """Start one stream per selected monitor or region.
 
+        Frames are passed to ``send_frame(payload, stream_id)`` as binary or
+        JSON messages; cursor updates go to ``send_cursor(message)``, or to
+        ``send_frame`` with stream id 0 when it is not given.
+        """
+        self.stop_screen_stream()
+        self._stream_target = (send_frame, binary, send_cursor)
+        for stream_id, source in enumerate(self._stream_sources(), start=1):
+            stream = ScreenStream(stream_id, source, self.stream_settings, self.activity,
+                                  on_resize=self.invalidate_screen_size)
+            self.streams[stream_id] = stream
+            self._stream_tasks.append(asyncio.create_task(stream.run(send_frame, binary)))
+        send_cursor = send_cursor or (lambda message: send_frame(message, 0))
+        self._stream_tasks.append(asyncio.create_task(self.track_cursor(send_cursor)))
+
+    async def track_cursor(self, send_cursor):
+        """Send cursor position and shape as small messages whenever they change"""
+        last = None
+        while self.streams:
+            try:
+                state = self.cursor.read()
+                if state != last:
+                    x, y, shape = state
+                    await send_cursor({'type': 'cursor', 'x': x, 'y': y, 'shape': shape})
+                    last = state
             except Exception as e:
-                self.logger.error(f"Screen streaming error: {e}")
-                await asyncio.sleep(1)  # Prevent rapid retries on error
+                self.logger.error(f"Cursor tracking error: {e}")
+                await asyncio.sleep(1)
+            await asyncio.sleep(self.activity.cursor_interval())
+
+    def note_input(self):
+        """Boost capture rate after remote input"""
+        self.activity.note_input()
+
+    def stop_screen_stream(self):
+        """Stop all running screen streams"""
+        for stream in self.streams.values():
+            stream.stop()
+        for task in self._stream_tasks:
+            if not task.done():
+                task.cancel()
+        self.streams = {}
+        self._stream_tasks = []
+        self._stream_target = None
+
+    def take_screenshot(self, binary=False, monitor=1, region=None):
+        """Capture a monitor or region as a PNG screenshot"""
+        with mss.mss() as sct:
+            screen = sct.grab(region or sct.monitors[monitor])
+        img = Image.frombuffer('RGB', screen.size, screen.raw, 'raw', 'BGRX', 0, 1)
+        buffer = io.BytesIO()
+        img.save(buffer, format='PNG')
+        meta = {'width': img.size[0], 'height': img.size[1], 'format': 'png'}
+
+        if binary:
+            self.frame_seq += 1
+            return pack_message(SCREENSHOT, 0, self.frame_seq, buffer.getvalue(), meta, FLAG_FINAL)
+        return {**meta, 'data': base64.b64encode(buffer.getvalue()).decode()}
+
+    def _get_screen_size(self):
+        """Screen size for mapping normalized coordinates, cached between events"""
+        now = time.monotonic()
+        if self._screen_size is None or now - self._screen_size_checked > self.SCREEN_SIZE_TTL:
+            self._screen_size = tuple(pyautogui.size())
+            self._screen_size_checked = now
+        return self._screen_size
+
+    def invalidate_screen_size(self):
+        """Drop the cached screen size after a display change"""
+        self._screen_size = None
+
+    def _input_rect(self, stream_id=None):
+        """Desktop rectangle (left, top, width, height) that normalized coordinates map onto.
 
-    async def handle_mouse_event(self, event):
+        That is the source of the stream the viewer is interacting with; with
+        no usable ``stream_id`` a single running stream is implied, and
+        without streams the primary screen is used.
+        """
+        stream = None
+        if stream_id is not None:
+            try:
+                stream = self.streams.get(int(stream_id))
+            except (TypeError, ValueError):
+                stream = None
+        if stream is None and len(self.streams) == 1:
+            stream = next(iter(self.streams.values()))
+        if stream is not None and stream.rect is not None:
+            return stream.rect
+        width, height = self._get_screen_size()
+        return (0, 0, width, height)
+
+    def _apply_mouse_event(self, event, rect):
+        event_type = event['event_type']
+        button = event.get('button') or 'left'
+
+        if event_type == 'mousedown':
+            mouse.press(button=button)
+        elif event_type == 'mouseup':
+            mouse.release(button=button)
+        elif event_type == 'mousemove':
+            left, top, width, height = rect
+            mouse.move(left + int(event['x'] * width), top + int(event['y'] * height))
+        elif event_type == 'contextmenu':
+            mouse.click(button='right')
+
+    def _apply_keyboard_event(self, event):
+        key = event['key']
+        event_type = event['event_type']
+        modifiers = event.get('modifiers') or []
+
+        # Handle modifier keys
+        for mod in modifiers:
+            keyboard.press(mod)
+
+        if event_type == 'keydown':
+            keyboard.press(key)
+        elif event_type == 'keyup':
+            keyboard.release(key)
+
+        # Release modifier keys
+        for mod in modifiers:
+            keyboard.release(mod)
+
+    def handle_mouse_event(self, event):
         """Handle mouse events from the client"""
+        self.note_input()
         try:
-            event_type = event['event_type']
-            x = int(event['x'] * pyautogui.size()[0])
-            y = int(event['y'] * pyautogui.size()[1])
-
-            if event_type == 'mousedown':
-                mouse.press(button='left')
-            elif event_type == 'mouseup':
-                mouse.release(button='left')
-            elif event_type == 'mousemove':
-                mouse.move(x, y)
-            elif event_type == 'contextmenu':
-                mouse.click(button='right')
-
+            self._apply_mouse_event(event, self._input_rect(event.get('stream_id')))
+            return {'success': True}
         except Exception as e:
             self.logger.error(f"Mouse event error: {e}")
+            return {'success': False, 'error': str(e)}
 
-    async def handle_keyboard_event(self, event):
+    def handle_keyboard_event(self, event):
         """Handle keyboard events from the client"""
+        self.note_input()
         try:
-            key = event['key']
-            event_type = event['event_type']
-            modifiers = event.get('modifiers', [])
-
-            # Handle modifier keys
-            for mod in modifiers:
-                keyboard.press(mod)
+            self._apply_keyboard_event(event)
+            return {'success': True}
+        except Exception as e:
+            self.logger.error(f"Keyboard event error: {e}")
+            return {'success': False, 'error': str(e)}
 
-            if event_type == 'keydown':
-                keyboard.press(key)
-            elif event_type == 'keyup':
-                keyboard.release(key)
+    @staticmethod
+    def coalesce_input(events):
+        """Collapse runs of consecutive mousemoves to the latest position"""
+        coalesced = []
+        for event in events:
+            if (event.get('event_type') == 'mousemove' and coalesced
+                    and coalesced[-1].get('event_type') == 'mousemove'):
+                coalesced[-1] = event
+            else:
+                coalesced.append(event)
+        return coalesced
 
-            # Release modifier keys
-            for mod in modifiers:
-                keyboard.release(mod)
+    def handle_input_batch(self, events):
+        """Apply a batch of timestamped mouse/keyboard events in order.
 
-        except Exception as e:
-            self.logger.error(f"Keyboard event error: {e}")
+        Each event carries ``kind`` ('mouse' or 'key'), an optional ``t``
+        timestamp and the usual event fields.
+        """
+        self.note_input()
+        events = sorted(events or [], key=lambda event: event.get('t', 0))
+        coalesced = self.coalesce_input(events)
+        rects = {}
+        errors = 0
+        for event in coalesced:
+            try:
+                if event.get('kind') == 'key':
+                    self._apply_keyboard_event(event)
+                else:
+                    stream_id = event.get('stream_id')
+                    if stream_id not in rects:
+                        rects[stream_id] = self._input_rect(stream_id)
+                    self._apply_mouse_event(event, rects[stream_id])
+            except Exception as e:
+                errors += 1
+                self.logger.error(f"Input batch event error: {e}")
+        return {
+            'success': errors == 0,
+            'received': len(events),
+            'applied': len(coalesced) - errors,
+            'coalesced': len(events) - len(coalesced)
+        }
 
 if __name__ == "__main__":
     import os
@@ -0,0 +1,308 @@
+import asyncio
+import base64
+import logging
+import threading
+import time
+from collections import deque
+from PIL import Image
+from capture_pipeline import CapturePipeline
+from frame_buffer import FrameBuffer, FrameBufferPool
+from frame_delta import TileDiffer
+from frame_encoders import get_encoder
+from frame_protocol import FLAG_KEYFRAME, SCREEN_FRAME, pack_prefix
+from stream_controller import StreamController
+
+
+class ScreenStream:
+    """One independently paced stream of a monitor or a screen region.
+
+    ``source`` is either an mss monitor index or a region dict with
+    ``left``/``top``/``width``/``height`` in virtual desktop coordinates.
+    Each stream has its own capture thread, delta tracking and adaptive
+    controller, so viewers only pay for the screens they watch.
+    """
+
+    def __init__(self, stream_id, source, settings, activity=None, on_resize=None):
+        self.logger = logging.getLogger(__name__)
+        self.stream_id = stream_id
+        self.source = source
+        self.settings = dict(settings)
+        self.differ = TileDiffer(settings['tile_size'], settings['keyframe_interval'])
+        self.encoder = get_encoder(settings.get('encoder', 'jpeg'))
+        self.controller = StreamController(settings)
+        self.activity = activity
+        self._on_resize = on_resize
+        self._source_size = None
+        # Desktop rectangle (left, top, width, height) last captured, for mapping input
+        self.rect = None
+        if isinstance(source, dict):
+            self.rect = (source['left'], source['top'], source['width'], source['height'])
+        self.last_change = time.monotonic()
+        self.frame_seq = 0
+        self._frame_scale = None
+        # Guards the differ, which the capture thread uses while settings change
+        self._lock = threading.Lock()
+        # Invalidations from the event loop: dirty rects, or None for a keyframe.
+        # The capture thread applies them before its next diff, so the loop
+        # never waits for the lock while a frame is being encoded.
+        self._invalidations = deque()
+        # Output buffers cycle between the capture thread and the sender
+        self._buffers = FrameBufferPool()
+        self._pipeline = None
+        self.streaming = False
+
+    def describe(self):
+        """Stream metadata identifying what is being captured"""
+        if isinstance(self.source, dict):
+            return {'stream_id': self.stream_id, 'region': self.source}
+        return {'stream_id': self.stream_id, 'monitor': self.source}
+
+    def update_settings(self, settings):
+        """Apply new stream settings and restart delta tracking"""
+        encoder = get_encoder(settings['encoder']) if 'encoder' in settings else self.encoder
+        with self._lock:
+            self.encoder = encoder
+            self.settings.update(settings)
+            self.controller.configure(settings)
+            self.differ.tile_size = int(self.settings['tile_size'])
+            self.differ.keyframe_interval = float(self.settings['keyframe_interval'])
+            # Tile coordinates are only meaningful against the same scale and tiling
+            self.differ.reset()
+
+    def request_keyframe(self):
+        self._invalidations.append(None)
+        if self._pipeline:
+            self._pipeline.wake()
+
+    def _apply_invalidations(self):
+        """Hand queued invalidations to the differ; caller holds the lock"""
+        while self._invalidations:
+            dirty = self._invalidations.popleft()
+            if dirty is None:
+                self.differ.request_keyframe()
+            else:
+                self.differ.invalidate(dirty)
+
+    def _grab(self, sct):
+        """Capture this stream's monitor or region"""
+        if isinstance(self.source, dict):
+            return sct.grab(self.source)
+        if not 0 < self.source < len(sct.monitors):
+            raise ValueError(f"Monitor {self.source} not found")
+        return sct.grab(sct.monitors[self.source])
+
+    def _encode(self, img, quality, buffer):
+        """Append an encoded image to ``buffer`` and return its (start, end) offsets"""
+        start = buffer.tell()
+        self.encoder.encode(img, quality, buffer.file)
+        return start, buffer.tell()
+
+    def _build_frame(self, screen, buffer):
+        """Build a keyframe or delta frame into ``buffer``, or None if the screen is unchanged"""
+        width, height = screen.size
+        params = self.controller.parameters()
+        scale, quality = params['scale'], params['quality']
+        if scale != self._frame_scale:
+            # The viewer canvas changes size, so deltas cannot be composited
+            self.differ.request_keyframe()
+            self._frame_scale = scale
+
+        keyframe_interval = None
+        if self.activity is not None and self.activity.is_idle(self.last_change):
+            keyframe_interval = self.activity.settings['idle_keyframe_interval']
+        # Without delta encoding every frame is whole, but unchanged screens are still skipped
+        result = self.differ.diff(screen.raw, width, height, keyframe_interval=keyframe_interval)
+        if result is None:
+            return None
+        if self.settings['delta']:
+            keyframe, rects = result
+        else:
+            keyframe, rects = True, [(0, 0, width, height)]
+
+        # Decode straight from the raw BGRA capture, skipping the screen.rgb copy
+        img = Image.frombuffer('RGB', screen.size, screen.raw, 'raw', 'BGRX', 0, 1)
+
+        # Apply scaling if needed
+        if scale != 1.0:
+            new_size = tuple(int(dim * scale) for dim in img.size)
+            img = img.resize(new_size, Image.LANCZOS)
+
+        self.frame_seq += 1
+        frame = {
+            'seq': self.frame_seq,
+            'keyframe': keyframe,
+            'changed': self.differ.changed,
+            'dirty': self.differ.last_dirty if self.settings['delta'] else None,
+            'width': img.size[0],
+            'height': img.size[1],
+            'params': {**params, 'format': self.encoder.format},
+            'buffer': buffer
+        }
+        if keyframe:
+            frame['tiles'] = [(0, 0, img.size[0], img.size[1], *self._encode(img, quality, buffer))]
+            return frame
+
+        tiles = []
+        for x, y, w, h in rects:
+            # Map source tile edges to scaled edges so neighbouring tiles meet exactly
+            left, top = int(x * scale), int(y * scale)
+            right, bottom = int((x + w) * scale), int((y + h) * scale)
+            if right <= left or bottom <= top:
+                continue
+            tiles.append((left, top, right - left, bottom - top,
+                          *self._encode(img.crop((left, top, right, bottom)), quality, buffer)))
+        frame['tiles'] = tiles
+        return frame
+
+    def _serialize_frame(self, frame, binary):
+        """Turn a built frame into a binary message or a base64 JSON message"""
+        tiles = frame['tiles']
+        buffer = frame['buffer']
+        if binary:
+            meta = {'width': frame['width'], 'height': frame['height'], **frame['params'], **self.describe()}
+            if not frame['keyframe']:
+                meta['tiles'] = [[x, y, w, h, end - start] for x, y, w, h, start, end in tiles]
+            end = tiles[-1][5] if tiles else FrameBuffer.HEADROOM
+            prefix = pack_prefix(
+                SCREEN_FRAME, self.stream_id, frame['seq'], end - FrameBuffer.HEADROOM, meta,
+                FLAG_KEYFRAME if frame['keyframe'] else 0
+            )
+            # Tiles are already contiguous after the headroom
+            return buffer.finish(prefix, end)
+
+        message = {
+            'type': 'screen_frame',
+            'seq': frame['seq'],
+            'keyframe': frame['keyframe'],
+            'width': frame['width'],
+            'height': frame['height'],
+            **frame['params'],
+            **self.describe()
+        }
+        if frame['keyframe']:
+            message['data'] = base64.b64encode(buffer.view(*tiles[0][4:])).decode()
+        else:
+            message['tiles'] = [{
+                'x': x,
+                'y': y,
+                'width': w,
+                'height': h,
+                'data': base64.b64encode(buffer.view(start, end)).decode()
+            } for x, y, w, h, start, end in tiles]
+        return message
+
+    def _capture_frame(self, sct, binary):
+        """Capture, diff and encode one frame; runs on the capture thread"""
+        captured = time.monotonic()
+        screen = self._grab(sct)
+        if screen.size != self._source_size:
+            if self._source_size is not None and self._on_resize:
+                # Display geometry changed underneath us
+                self._on_resize()
+            self._source_size = screen.size
+        self.rect = (screen.left, screen.top, screen.width, screen.height)
+
+        buffer = self._buffers.acquire()
+        try:
+            with self._lock:
+                self._apply_invalidations()
+                # Static screens produce no frame at all
+                frame = self._build_frame(screen, buffer)
+            if frame is None:
+                self._buffers.release(buffer)
+                return None
+            if frame['changed']:
+                self.last_change = captured
+            payload = self._serialize_frame(frame, binary)
+        except Exception:
+            self._buffers.release(buffer)
+            raise
+
+        self.controller.record_encode(
+            time.monotonic() - captured,
+            sum(end - start for *_, start, end in frame['tiles'])
+        )
+        if not binary:
+            # The base64 JSON message no longer references the buffer
+            self._buffers.release(buffer)
+            buffer = None
+        return {
+            'payload': payload,
+            'buffer': buffer,
+            'keyframe': frame['keyframe'],
+            'dirty': frame['dirty'],
+            'captured': captured
+        }
+
+    def _interval(self):
+        """Capture interval from the controller, adjusted for user activity"""
+        base = self.controller.interval()
+        if self.activity is None:
+            return base
+        return self.activity.interval(base, self.last_change)
+
+    def _release_frame(self, item):
+        """Return a sent or dropped frame's buffer to the pool"""
+        if item['buffer'] is None:
+            return
+        if isinstance(item['payload'], memoryview):
+            try:
+                item['payload'].release()
+            except BufferError:
+                pass
+        self._buffers.release(item['buffer'])
+        item['buffer'] = None
+
+    def _drop_frame(self, item):
+        """Discard a stale frame and make sure its regions are sent again"""
+        self._release_frame(item)
+        self.controller.record_drop()
+        self._invalidations.append(None if item['keyframe'] or item['dirty'] is None else item['dirty'])
+
+    def stop(self):
+        """Stop capturing; the send loop exits on its next frame"""
+        self.streaming = False
+        if self._pipeline:
+            self._pipeline.stop()
+
+    async def run(self, send_frame, binary=False):
+        """Capture and stream this source through ``send_frame(payload, stream_id)``"""
+        with self._lock:
+            self.differ.reset()
+        self.streaming = True
+
+        # Capture and encoding run on a worker thread; this loop only sends
+        self._pipeline = CapturePipeline(
+            lambda sct: self._capture_frame(sct, binary),
+            self._interval,
+            name=f'capture-{self.stream_id}',
+            on_drop=self._drop_frame
+        )
+        self._pipeline.start()
+        if self.activity:
+            self.activity.subscribe(self._pipeline.wake)
+        try:
+            while self.streaming:
+                item = await self._pipeline.get()
+                if self.controller.is_stale(time.monotonic() - item['captured']):
+                    self._drop_frame(item)
+                    continue
+
+                started = time.monotonic()
+                try:
+                    sent = await send_frame(item['payload'], self.stream_id)
+                except Exception as e:
+                    self._release_frame(item)
+                    self.logger.error(f"Screen streaming error: {e}")
+                    await asyncio.sleep(1)  # Prevent rapid retries on error
+                    continue
+                self._release_frame(item)
+                if sent is False:
+                    # Superseded in the outbound queue before reaching the wire
+                    self._drop_frame(item)
+                    continue
+                self.controller.record_send(time.monotonic() - started)
+        finally:
+            if self.activity:
+                self.activity.unsubscribe(self._pipeline.wake)
+            self._pipeline.stop()
@@ -2,49 +2,186 @@ import ssl
 import json
 import base64
 import asyncio
+import itertools
+import os
+import struct
 import websockets
 import logging
+from collections import OrderedDict
+from functools import lru_cache
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.backends import default_backend
 
+KDF_SALT = b'remote_desktop_salt'  # Fixed salt for key derivation
+KDF_ITERATIONS = 100000
+
+# AEAD wire format: cipher id, payload kind, 16-byte session salt, 12-byte
+# nonce, ciphertext + tag. The header before the nonce is authenticated as
+# associated data. Every sender picks a random salt per session and encrypts
+# under an HKDF subkey of the shared key for that salt, so the nonce counter
+# restarting at zero never repeats a (key, nonce) pair across sessions.
+AEAD_CIPHERS = {
+    'aesgcm': (1, AESGCM),
+    'chacha20': (2, ChaCha20Poly1305),
+}
+KIND_JSON = 0
+KIND_BINARY = 1
+SALT_SIZE = 16
+_HEADER = struct.Struct(f'!BB{SALT_SIZE}s')
+NONCE_SIZE = 12
+# Peer session subkeys kept for decryption
+PEER_SESSIONS = 64
+# Sent (as Fernet, which every peer reads) right after connecting; peers
+# that do not know it ignore it and keep receiving Fernet
+HELLO = 'cipher_hello'
+
+
+@lru_cache(maxsize=16)
+def derive_key(secret: str, salt: bytes = KDF_SALT, iterations: int = KDF_ITERATIONS) -> bytes:
+    """PBKDF2-SHA256 key for a shared secret, computed once per process"""
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        iterations=iterations,
+        backend=default_backend()
+    )
+    return kdf.derive(secret.encode())
+
+
+def session_key(key: bytes, cipher_id: int, salt: bytes) -> bytes:
+    """Per-session AEAD subkey of ``key`` for one sender's random salt"""
+    hkdf = HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        info=b'remote_desktop aead ' + bytes([cipher_id]),
+        backend=default_backend()
+    )
+    return hkdf.derive(key)
+
+
 class SecureConnection:
-    def __init__(self, server_url, encryption_key):
+    """Encrypted WebSocket connection.
+
+    Messages start out as JSON + Fernet tokens, which every peer reads. Each
+    side advertises the AEAD ciphers (AES-GCM or ChaCha20-Poly1305) it
+    supports in a hello after connecting, and switches to raw binary AEAD
+    messages only once the peer's hello lists one of ``aead``'s choices.
+    Each connection encrypts under its own subkey, derived from a random
+    salt carried in every message header, with a counter as the nonce.
+    Received Fernet tokens are always accepted.
+    """
+
+    def __init__(self, server_url, encryption_key, cipher='fernet', aead='aesgcm'):
         self.server_url = server_url
         self.websocket = None
         self.connected = False
         self.logger = logging.getLogger(__name__)
-        self._setup_encryption(encryption_key)
+        self._setup_encryption(encryption_key, cipher, aead)
 
-    def _setup_encryption(self, key):
+    def _setup_encryption(self, key, cipher='fernet', aead='aesgcm'):
         """Initialize encryption using provided key"""
-        # Generate a secure key from the provided encryption key
-        kdf = PBKDF2HMAC(
-            algorithm=hashes.SHA256(),
-            length=32,
-            salt=b'remote_desktop_salt',  # Fixed salt for key derivation
-            iterations=100000,
-            backend=default_backend()
-        )
-        key_bytes = key.encode()
-        derived_key = base64.urlsafe_b64encode(kdf.derive(key_bytes))
-        self.fernet = Fernet(derived_key)
+        for name in (cipher, aead):
+            if name is not None and name != 'fernet' and name not in AEAD_CIPHERS:
+                raise ValueError(f"Unknown cipher: {name}")
+        key_bytes = derive_key(key)
+        self.initial_cipher = cipher
+        self.aead = None if aead == 'fernet' else aead
+        self.cipher = cipher
+        self.fernet = Fernet(base64.urlsafe_b64encode(key_bytes))
+        self._key = key_bytes
+        self._peer_aeads = OrderedDict()
+        self._new_session()
+
+    def _new_session(self):
+        """Pick a fresh salt, and so a fresh subkey, for what this side sends"""
+        self._salt = os.urandom(SALT_SIZE)
+        self._aead = None
+        if self.cipher != 'fernet':
+            cipher_id, aead = AEAD_CIPHERS[self.cipher]
+            self._aead = aead(session_key(self._key, cipher_id, self._salt))
+        self._nonce_counter = itertools.count()
+
+    def _peer_aead(self, cipher_id, salt):
+        """Decryptor for a peer session, derived once per salt"""
+        aead = self._peer_aeads.get((cipher_id, salt))
+        if aead is None:
+            aead_class = next(aead for known_id, aead in AEAD_CIPHERS.values() if known_id == cipher_id)
+            aead = self._peer_aeads[(cipher_id, salt)] = aead_class(session_key(self._key, cipher_id, salt))
+            while len(self._peer_aeads) > PEER_SESSIONS:
+                self._peer_aeads.popitem(last=False)
+        else:
+            self._peer_aeads.move_to_end((cipher_id, salt))
+        return aead
+
+    def offered_ciphers(self):
+        """AEAD ciphers this side will switch to, most preferred first"""
+        if self.aead is None:
+            return []
+        return [self.aead] + [name for name in AEAD_CIPHERS if name != self.aead]
+
+    def hello(self):
+        return {'type': HELLO, 'ciphers': self.offered_ciphers()}
+
+    def negotiate(self, ciphers):
+        """Switch to the preferred AEAD cipher the peer advertised; otherwise keep the current one"""
+        choice = next((name for name in self.offered_ciphers() if name in (ciphers or ())), None)
+        if choice is not None and choice != self.cipher:
+            self.cipher = choice
+            self._new_session()
+            self.logger.info(f"Peer supports {choice}; switching from Fernet")
+        return self.cipher
+
+    @property
+    def supports_binary(self):
+        """Whether binary payloads can be sent as-is rather than wrapped in JSON"""
+        return self.cipher != 'fernet'
+
+    def _next_nonce(self):
+        return next(self._nonce_counter).to_bytes(NONCE_SIZE, 'big')
 
     def encrypt_message(self, message):
-        """Encrypt a message before sending"""
+        """Encrypt a message before sending; dicts are sent as JSON, bytes as-is"""
         try:
-            message_bytes = json.dumps(message).encode()
-            return self.fernet.encrypt(message_bytes)
+            binary = isinstance(message, (bytes, bytearray, memoryview))
+            if self.cipher == 'fernet':
+                if binary:
+                    raise TypeError("Fernet connections cannot carry binary messages")
+                return self.fernet.encrypt(json.dumps(message).encode())
+
+            cipher_id = AEAD_CIPHERS[self.cipher][0]
+            header = _HEADER.pack(cipher_id, KIND_BINARY if binary else KIND_JSON, self._salt)
+            payload = message if binary else json.dumps(message, separators=(',', ':')).encode()
+            nonce = self._next_nonce()
+            return header + nonce + self._aead.encrypt(nonce, payload, header)
         except Exception as e:
             self.logger.error(f"Encryption error: {str(e)}")
             raise
 
     def decrypt_message(self, encrypted_message):
-        """Decrypt a received message"""
+        """Decrypt a received message: a dict for JSON payloads, bytes for binary ones"""
         try:
-            decrypted_bytes = self.fernet.decrypt(encrypted_message)
-            return json.loads(decrypted_bytes.decode())
+            if isinstance(encrypted_message, str):
+                encrypted_message = encrypted_message.encode()
+            known = {cipher_id for cipher_id, _ in AEAD_CIPHERS.values()}
+            if not encrypted_message or encrypted_message[0] not in known:
+                # Not an AEAD message; Fernet tokens start with a base64 version byte
+                decrypted_bytes = self.fernet.decrypt(encrypted_message)
+                return json.loads(decrypted_bytes.decode())
+
+            view = memoryview(encrypted_message)
+            header = bytes(view[:_HEADER.size])
+            cipher_id, _, salt = _HEADER.unpack(header)
+            nonce = bytes(view[_HEADER.size:_HEADER.size + NONCE_SIZE])
+            payload = self._peer_aead(cipher_id, salt).decrypt(nonce, view[_HEADER.size + NONCE_SIZE:], header)
+            if header[1] == KIND_BINARY:
+                return payload
+            return json.loads(payload)
         except Exception as e:
             self.logger.error(f"Decryption error: {str(e)}")
             raise
@@ -61,7 +198,12 @@ class SecureConnection:
                 self.server_url,
                 ssl=ssl_context
             )
+            # A new peer may be an older one: start from the initial cipher until it says otherwise
+            self.cipher = self.initial_cipher
+            self._new_session()
             self.connected = True
+            if self.aead is not None:
+                await self.send_message(self.hello())
             self.logger.info("Secure connection established")
             return True
         except Exception as e:
@@ -95,8 +237,12 @@ class SecureConnection:
             raise ConnectionError("Not connected to server")
 
         try:
-            encrypted_message = await self.websocket.recv()
-            return self.decrypt_message(encrypted_message)
+            while True:
+                message = self.decrypt_message(await self.websocket.recv())
+                if isinstance(message, dict) and message.get('type') == HELLO:
+                    self.negotiate(message.get('ciphers'))
+                    continue
+                return message
         except Exception as e:
             self.logger.error(f"Receive error: {str(e)}")
             raise
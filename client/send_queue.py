@@ -0,0 +1,167 @@
+import asyncio
+from collections import OrderedDict, deque
+from typing import Dict, Optional
+
+# Lower values are written first
+PRIORITY_INPUT = 0
+PRIORITY_CONTROL = 1
+PRIORITY_FILE = 2
+PRIORITY_FRAME = 3
+
+# Logical channel each priority class is multiplexed onto
+PRIORITY_NAMES = {
+    PRIORITY_INPUT: 'input',
+    PRIORITY_CONTROL: 'control',
+    PRIORITY_FILE: 'file',
+    PRIORITY_FRAME: 'video',
+}
+CHANNELS = tuple(PRIORITY_NAMES.values())
+
+# Bytes each channel may have in flight before the server grants more credit
+DEFAULT_WINDOWS = {
+    'input': 64 * 1024,
+    'control': 1024 * 1024,
+    'file': 4 * 1024 * 1024,
+    'video': 4 * 1024 * 1024,
+}
+
+
+def wire_size(message) -> int:
+    """Bytes a message occupies on the wire, as the server counts them"""
+    if isinstance(message, str):
+        # json.dumps output is ASCII unless ensure_ascii was turned off
+        return len(message) if message.isascii() else len(message.encode('utf-8'))
+    if isinstance(message, memoryview):
+        return message.nbytes
+    return len(message)
+
+
+class OutboundQueue:
+    """Priority-aware bounded queue multiplexing logical channels onto one connection writer.
+
+    Input acks go first, then command responses, file chunks and screen
+    frames. Input, control and file messages block the producer when their
+    queue is full; frames are coalesced per stream key so only the latest
+    pending frame is kept.
+
+    Once the server accepts flow control, each channel also has a credit
+    window: bytes written reduce it and the server's ``window_update``
+    messages restore it. A channel out of credit is skipped, so bulk file
+    data cannot pile up ahead of input and control traffic on the link.
+    """
+
+    def __init__(self, input_limit: int = 256, control_limit: int = 256, file_limit: int = 8):
+        self._limits = {PRIORITY_INPUT: input_limit, PRIORITY_CONTROL: control_limit, PRIORITY_FILE: file_limit}
+        self._queues = {priority: deque() for priority in self._limits}
+        self._frames = OrderedDict()
+        self._cond = asyncio.Condition()
+        self.closed = False
+        # None until flow control is negotiated: no limit
+        self.credit: Dict[str, Optional[int]] = {name: None for name in CHANNELS}
+        self.sent = {name: 0 for name in CHANNELS}
+        self.sent_bytes = {name: 0 for name in CHANNELS}
+        self.dropped = {name: 0 for name in CHANNELS}
+        self.stalled = {name: 0 for name in CHANNELS}
+        self.high_water = {name: 0 for name in CHANNELS}
+
+    def _depths(self):
+        depths = {PRIORITY_NAMES[priority]: len(queue) for priority, queue in self._queues.items()}
+        depths['video'] = len(self._frames)
+        return depths
+
+    def _pending(self, priority: int):
+        return self._frames if priority == PRIORITY_FRAME else self._queues[priority]
+
+    def _next_priority(self) -> Optional[int]:
+        """Highest-priority channel with something queued and credit left"""
+        for priority, name in PRIORITY_NAMES.items():
+            if self._pending(priority):
+                credit = self.credit[name]
+                if credit is None or credit > 0:
+                    return priority
+        return None
+
+    def enable_flow_control(self, windows: Dict[str, int]):
+        """Start enforcing per-channel windows, as granted by the server"""
+        for name in CHANNELS:
+            if name in windows:
+                self.credit[name] = int(windows[name])
+
+    async def grant(self, channel: str, increment: int):
+        """Return credit to a channel after the server consumed its bytes"""
+        async with self._cond:
+            if self.credit.get(channel) is not None:
+                self.credit[channel] += int(increment)
+                self._cond.notify_all()
+
+    async def put(self, message, priority: int = PRIORITY_CONTROL, key=None, done=None):
+        """Queue a message; ``done`` is resolved with True once written, False if dropped"""
+        async with self._cond:
+            if self.closed:
+                raise ConnectionError("Outbound queue is closed")
+            if priority == PRIORITY_FRAME:
+                replaced = self._frames.pop(key, None)
+                if replaced is not None:
+                    # Latest frame wins; the superseded one never hits the wire
+                    self.dropped['video'] += 1
+                    if replaced[1] and not replaced[1].done():
+                        replaced[1].set_result(False)
+                self._frames[key] = (message, done)
+            else:
+                await self._cond.wait_for(
+                    lambda: self.closed or len(self._queues[priority]) < self._limits[priority]
+                )
+                if self.closed:
+                    raise ConnectionError("Outbound queue is closed")
+                self._queues[priority].append((message, done))
+
+            name = PRIORITY_NAMES[priority]
+            self.high_water[name] = max(self.high_water[name], self._depths()[name])
+            if self.credit[name] is not None and self.credit[name] <= 0:
+                self.stalled[name] += 1
+            self._cond.notify_all()
+
+    async def get(self):
+        """Wait for the highest-priority pending message whose channel has credit"""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._next_priority() is not None)
+            priority = self._next_priority()
+            name = PRIORITY_NAMES[priority]
+            if priority == PRIORITY_FRAME:
+                item = self._frames.popitem(last=False)[1]
+            else:
+                item = self._queues[priority].popleft()
+            size = wire_size(item[0])
+            # A message may overdraw the window; the channel then waits for credit
+            if self.credit[name] is not None:
+                self.credit[name] -= size
+            self.sent[name] += 1
+            self.sent_bytes[name] += size
+            self._cond.notify_all()
+            return item
+
+    async def close(self):
+        """Drop everything still queued and release blocked producers"""
+        async with self._cond:
+            self.closed = True
+            pending = [item for queue in self._queues.values() for item in queue]
+            pending.extend(self._frames.values())
+            for queue in self._queues.values():
+                queue.clear()
+            self._frames.clear()
+            for _, done in pending:
+                if done and not done.done():
+                    done.set_result(False)
+            self._cond.notify_all()
+
+    def metrics(self):
+        """Per-channel queue depths, high-water marks, credit and sent/dropped/stalled counters"""
+        return {
+            'depth': self._depths(),
+            'high_water': dict(self.high_water),
+            'credit': dict(self.credit),
+            'sent': dict(self.sent),
+            'sent_bytes': dict(self.sent_bytes),
+            'dropped': dict(self.dropped),
+            'stalled': dict(self.stalled),
+        }
@@ -0,0 +1,124 @@
+import time
+
+
+class StreamController:
+    """Adapt frame rate, scale and JPEG quality to a bitrate and latency budget.
+
+    The capture thread reports encode time and frame size, the sender reports
+    how long each send took to drain. Every ``adjust_interval`` seconds the
+    controller steps quality first and scale second, and derives the frame rate
+    the budget can afford.
+    """
+
+    QUALITY_STEP = 5
+    SCALE_STEP = 0.1
+
+    def __init__(self, settings=None):
+        self.settings = {
+            'adaptive': True,
+            'target_bitrate': 4_000_000,  # bits per second
+            'target_latency': 0.15,  # seconds a send may take to drain
+            'min_fps': 2,
+            'max_fps': 30,
+            'min_quality': 30,
+            'max_quality': 80,
+            'min_scale': 0.5,
+            'max_scale': 1.0,
+            'adjust_interval': 1.0,
+        }
+        self.fps = self.settings['max_fps']
+        self.quality = self.settings['max_quality']
+        self.scale = self.settings['max_scale']
+        self.encode_time = 0.0
+        self.frame_bytes = 0.0
+        self.send_latency = 0.0
+        self.frames = 0
+        self.dropped = 0
+        self._recent_drops = 0
+        self._last_adjust = time.monotonic()
+        if settings:
+            self.configure(settings)
+
+    @staticmethod
+    def _ewma(current, sample, alpha=0.2):
+        return sample if not current else current + alpha * (sample - current)
+
+    def configure(self, settings):
+        """Apply controller settings; fixed quality/scale pin the matching range"""
+        for key in self.settings:
+            if key in settings:
+                self.settings[key] = settings[key]
+        if 'quality' in settings:
+            self.settings['max_quality'] = settings['quality']
+        if 'scale' in settings:
+            self.settings['max_scale'] = settings['scale']
+        if 'fps' in settings:
+            self.settings['max_fps'] = settings['fps']
+
+        if not self.settings['adaptive']:
+            self.fps = self.settings['max_fps']
+            self.quality = self.settings['max_quality']
+            self.scale = self.settings['max_scale']
+        else:
+            self.fps = min(self.fps, self.settings['max_fps'])
+            self.quality = min(self.quality, self.settings['max_quality'])
+            self.scale = min(self.scale, self.settings['max_scale'])
+
+    def interval(self):
+        """Seconds between captures at the current frame rate"""
+        return 1.0 / max(self.fps, 0.1)
+
+    def record_encode(self, seconds, nbytes):
+        """Record the encode time and size of a produced frame"""
+        self.encode_time = self._ewma(self.encode_time, seconds)
+        self.frame_bytes = self._ewma(self.frame_bytes, nbytes)
+        self.frames += 1
+
+    def record_send(self, seconds):
+        """Record how long a frame took to be written to the socket"""
+        self.send_latency = self._ewma(self.send_latency, seconds)
+        self._maybe_adjust()
+
+    def record_drop(self):
+        """Record a frame dropped because it went stale before sending"""
+        self.dropped += 1
+        self._recent_drops += 1
+
+    def is_stale(self, age):
+        """Whether a frame captured ``age`` seconds ago is too old to send"""
+        return age > max(self.settings['target_latency'] * 2, self.interval() * 2)
+
+    def _maybe_adjust(self):
+        now = time.monotonic()
+        if not self.settings['adaptive'] or now - self._last_adjust < self.settings['adjust_interval']:
+            return
+        self._last_adjust = now
+        s = self.settings
+
+        congested = self.send_latency > s['target_latency'] or self._recent_drops > 0
+        bitrate_fps = s['target_bitrate'] / max(self.frame_bytes * 8, 1)
+        encode_fps = 1.0 / max(self.encode_time, 1e-3)
+
+        if congested or bitrate_fps < s['min_fps']:
+            # Shed bytes per frame: quality is cheap to lose, resolution last
+            if self.quality > s['min_quality']:
+                self.quality = max(s['min_quality'], self.quality - self.QUALITY_STEP)
+            elif self.scale > s['min_scale']:
+                self.scale = max(s['min_scale'], round(self.scale - self.SCALE_STEP, 2))
+        elif self.send_latency < s['target_latency'] / 2 and bitrate_fps > s['max_fps']:
+            # Headroom at full frame rate: win back resolution first, then quality
+            if self.scale < s['max_scale']:
+                self.scale = min(s['max_scale'], round(self.scale + self.SCALE_STEP, 2))
+            elif self.quality < s['max_quality']:
+                self.quality = min(s['max_quality'], self.quality + self.QUALITY_STEP)
+
+        self.fps = max(s['min_fps'], min(s['max_fps'], bitrate_fps, encode_fps * 0.8))
+        self._recent_drops = 0
+
+    def parameters(self):
+        """Currently chosen stream parameters, reported in frame metadata"""
+        return {
+            'fps': round(self.fps, 1),
+            'quality': int(self.quality),
+            'scale': self.scale,
+        }
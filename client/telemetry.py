@@ -0,0 +1,239 @@
+import logging
+import platform
+import threading
+import time
+from array import array
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import psutil
+
+FIELDS = (
+    'timestamp', 'cpu_percent', 'memory_percent', 'memory_used', 'swap_percent',
+    'disk_percent', 'disk_used', 'net_sent_rate', 'net_recv_rate',
+    'disk_read_rate', 'disk_write_rate',
+)
+
+
+class RingBuffer:
+    """Fixed-capacity series stored column-wise in ``array('d')``, oldest samples overwritten first"""
+
+    def __init__(self, fields: Sequence[str], capacity: int):
+        self.fields = tuple(fields)
+        self.capacity = capacity
+        self.columns = {field: array('d', bytes(8 * capacity)) for field in self.fields}
+        self.head = 0  # Next slot to write
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def full(self) -> bool:
+        return self.count == self.capacity
+
+    def append(self, values: Sequence[float]):
+        """Append one row, ordered like ``fields``"""
+        for field, value in zip(self.fields, values):
+            self.columns[field][self.head] = value
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def _indexes(self, last: Optional[int] = None):
+        count = self.count if last is None else min(last, self.count)
+        start = self.head - count
+        return [(start + i) % self.capacity for i in range(count)]
+
+    def column(self, field: str, last: Optional[int] = None) -> List[float]:
+        """Values of one field, oldest first"""
+        values = self.columns[field]
+        return [values[i] for i in self._indexes(last)]
+
+    def rows(self, last: Optional[int] = None) -> List[Dict[str, float]]:
+        """Rows as dicts, oldest first"""
+        return [{field: self.columns[field][i] for field in self.fields} for i in self._indexes(last)]
+
+    def snapshot(self, fields: Optional[Sequence[str]] = None, last: Optional[int] = None) -> Dict[str, List[float]]:
+        """Copies of several columns over the same rows, oldest first"""
+        indexes = self._indexes(last)
+        return {field: [self.columns[field][i] for i in indexes] for field in (fields or self.fields)}
+
+    def latest(self) -> Optional[Dict[str, float]]:
+        rows = self.rows(1)
+        return rows[0] if rows else None
+
+    def oldest(self) -> Optional[Dict[str, float]]:
+        if not self.count:
+            return None
+        i = (self.head - self.count) % self.capacity
+        return {field: self.columns[field][i] for field in self.fields}
+
+    def nbytes(self) -> int:
+        return sum(column.itemsize * len(column) for column in self.columns.values())
+
+
+def _busy_percent(previous, current) -> float:
+    """CPU busy percentage between two ``cpu_times`` readings"""
+    total = sum(current) - sum(previous)
+    if total <= 0:
+        return 0.0
+    idle = current.idle - previous.idle
+    idle += getattr(current, 'iowait', 0.0) - getattr(previous, 'iowait', 0.0)
+    return max(0.0, min(100.0, 100.0 * (1.0 - idle / total)))
+
+
+class TelemetrySampler:
+    """Sample system metrics on a background thread and serve them from cache.
+
+    Nothing here blocks: CPU usage is computed from the difference between
+    consecutive ``cpu_times`` readings instead of sleeping inside
+    ``psutil.cpu_percent(interval=...)``, and network/disk rates from
+    counter deltas. Recent samples are kept in a ring buffer.
+    """
+
+    def __init__(self, interval: float = 1.0, capacity: int = 600, disk_path: str = '/'):
+        self.logger = logging.getLogger(__name__)
+        self.interval = interval
+        self.disk_path = disk_path
+        self.cores = psutil.cpu_count() or 1
+        self.samples = RingBuffer(FIELDS, capacity)
+        self.per_core = RingBuffer([f'cpu{i}' for i in range(self.cores)], capacity)
+        self.static = {
+            'hostname': platform.node(),
+            'os': platform.system(),
+            'os_version': platform.version(),
+            'cpu_count': self.cores,
+        }
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._listeners = []
+        self._latest = None
+        self._latest_at = 0.0
+        # Counter readings from the previous sample, for deltas
+        self._cpu_times = psutil.cpu_times()
+        self._core_times = psutil.cpu_times(percpu=True)
+        self._net = psutil.net_io_counters()
+        self._disk_io = self._read_disk_io()
+        self._counters_at = time.monotonic()
+
+    @staticmethod
+    def _read_disk_io():
+        try:
+            return psutil.disk_io_counters()
+        except (RuntimeError, OSError):
+            return None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='telemetry', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def subscribe(self, listener):
+        """Call ``listener(sample)`` after every recorded sample"""
+        self._listeners.append(listener)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                self.logger.error(f"Telemetry sampling error: {str(e)}")
+
+    def sample(self) -> Dict[str, object]:
+        """Take a sample now, record it and notify listeners; normally only the sampler thread calls this"""
+        with self._lock:
+            now = time.monotonic()
+            latest, row, per_core, counters = self._measure(now)
+            self._cpu_times, self._core_times, self._net, self._disk_io = counters
+            self._counters_at = now
+            self.samples.append(row)
+            self.per_core.append(per_core)
+            self._latest = latest
+            self._latest_at = now
+        for listener in self._listeners:
+            listener(latest)
+        return latest
+
+    def peek(self) -> Dict[str, object]:
+        """A sample computed against the last recorded one, without recording it.
+
+        The counter baseline and ring buffer are left alone, so on-demand
+        reads cannot skew the sampler's rates or its evenly spaced history.
+        """
+        with self._lock:
+            return self._measure(time.monotonic())[0]
+
+    def _measure(self, now: float):
+        """Read counters and compute a sample from the baseline; caller holds the lock"""
+        elapsed = max(now - self._counters_at, 1e-3)
+        cpu_times = psutil.cpu_times()
+        core_times = psutil.cpu_times(percpu=True)
+        memory = psutil.virtual_memory()
+        swap = psutil.swap_memory()
+        disk = psutil.disk_usage(self.disk_path)
+        net = psutil.net_io_counters()
+        disk_io = self._read_disk_io()
+
+        cpu_percent = _busy_percent(self._cpu_times, cpu_times)
+        per_core = [_busy_percent(previous, current) for previous, current in zip(self._core_times, core_times)]
+        net_sent_rate = (net.bytes_sent - self._net.bytes_sent) / elapsed
+        net_recv_rate = (net.bytes_recv - self._net.bytes_recv) / elapsed
+        if disk_io is not None and self._disk_io is not None:
+            disk_read_rate = (disk_io.read_bytes - self._disk_io.read_bytes) / elapsed
+            disk_write_rate = (disk_io.write_bytes - self._disk_io.write_bytes) / elapsed
+        else:
+            disk_read_rate = disk_write_rate = 0.0
+        timestamp = time.time()
+        row = (
+            timestamp, cpu_percent, memory.percent, memory.used, swap.percent,
+            disk.percent, disk.used, net_sent_rate, net_recv_rate, disk_read_rate, disk_write_rate,
+        )
+        latest = {
+            **self.static,
+            'cpu_percent': cpu_percent,
+            'cpu_per_core': per_core,
+            'memory_total': memory.total,
+            'memory_used': memory.used,
+            'memory_percent': memory.percent,
+            'swap_percent': swap.percent,
+            'disk_total': disk.total,
+            'disk_used': disk.used,
+            'disk_percent': disk.percent,
+            'net_sent_rate': net_sent_rate,
+            'net_recv_rate': net_recv_rate,
+            'disk_read_rate': disk_read_rate,
+            'disk_write_rate': disk_write_rate,
+            'sampled_at': timestamp,
+        }
+        return latest, row, per_core, (cpu_times, core_times, net, disk_io)
+
+    def latest(self, max_age: Optional[float] = None) -> Dict[str, object]:
+        """Most recent sample, or a fresh unrecorded reading if it is older than ``max_age`` seconds"""
+        max_age = self.interval * 2 if max_age is None else max_age
+        with self._lock:
+            latest, age = self._latest, time.monotonic() - self._latest_at
+        if latest is None or age > max_age:
+            latest, age = self.peek(), 0.0
+        return {
+            **latest,
+            'timestamp': datetime.fromtimestamp(latest['sampled_at']).isoformat(),
+            'sample_age': age,
+        }
+
+    def recent(self, last: Optional[int] = None) -> List[Dict[str, float]]:
+        with self._lock:
+            return self.samples.rows(last)
+
+    def snapshot(self, fields: Optional[Sequence[str]] = None, last: Optional[int] = None) -> Dict[str, List[float]]:
+        """Recorded samples as columns, oldest first, read consistently with the sampler thread"""
+        with self._lock:
+            return self.samples.snapshot(fields, last)
+
+    def oldest(self) -> Optional[Dict[str, float]]:
+        """Oldest sample still held in the ring"""
+        with self._lock:
+            return self.samples.oldest()
@@ -0,0 +1,183 @@
+import lzma
+import os
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Formats that are already compressed; recompressing them only burns CPU
+COMPRESSED_EXTENSIONS = {
+    '.7z', '.aac', '.apk', '.avi', '.br', '.bz2', '.cab', '.docx', '.flac', '.gif', '.gz',
+    '.heic', '.jar', '.jpeg', '.jpg', '.lz', '.lz4', '.lzma', '.m4a', '.mkv', '.mov', '.mp3',
+    '.mp4', '.msi', '.odt', '.ogg', '.opus', '.png', '.pptx', '.rar', '.tgz', '.txz', '.webm',
+    '.webp', '.xlsx', '.xz', '.zip', '.zst',
+}
+
+
+class Codec:
+    """Compress each chunk independently, so chunks stay resumable and levels can change per chunk"""
+
+    name = None
+    levels = range(1, 10)
+    default_level = 6
+
+    def available(self) -> bool:
+        return True
+
+    def compress(self, data, level: int) -> bytes:
+        raise NotImplementedError
+
+
+class ZlibCodec(Codec):
+    name = 'zlib'
+
+    def compress(self, data, level):
+        return zlib.compress(data, level)
+
+
+class LzmaCodec(Codec):
+    name = 'lzma'
+    levels = range(0, 10)
+    default_level = 1
+
+    def compress(self, data, level):
+        return lzma.compress(data, preset=level)
+
+
+class ZstdCodec(Codec):
+    name = 'zstd'
+    levels = range(1, 20)
+    default_level = 3
+
+    def __init__(self):
+        # ZstdCompressor objects must not be shared between threads
+        self._local = threading.local()
+
+    def available(self):
+        return zstandard is not None
+
+    def compress(self, data, level):
+        compressors = self._local.__dict__.setdefault('compressors', {})
+        compressor = compressors.get(level)
+        if compressor is None:
+            compressor = compressors[level] = zstandard.ZstdCompressor(level=level)
+        return compressor.compress(data)
+
+
+CODECS: Dict[str, Codec] = {codec.name: codec for codec in (ZlibCodec(), LzmaCodec(), ZstdCodec())}
+
+
+def available_codecs():
+    return [name for name, codec in CODECS.items() if codec.available()]
+
+
+def get_codec(name: str) -> Codec:
+    """Look up a codec by name; 'auto' picks zstd when installed, zlib otherwise"""
+    if name == 'auto':
+        name = 'zstd' if CODECS['zstd'].available() else 'zlib'
+    codec = CODECS.get(name)
+    if codec is None:
+        raise ValueError(f"Unknown compression: {name}")
+    if not codec.available():
+        raise ValueError(f"Compression not available: {name}")
+    return codec
+
+
+def is_compressed_type(path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in COMPRESSED_EXTENSIONS
+
+
+class CompressionTuner:
+    """Pick the compression level from measured link throughput versus CPU throughput.
+
+    Compressing at a level is worthwhile while the CPU can produce input
+    faster than the link drains it. When compression is the bottleneck the
+    level steps down; when the link is clearly the bottleneck it steps up and
+    trades spare CPU for fewer bytes on the wire. A chunk that barely shrinks
+    pauses compression for the next ``probe_interval`` chunks, since mixed
+    content such as a directory archive can become compressible again.
+
+    ``compress`` runs on an I/O worker while ``record_send`` runs on the event
+    loop, so the tuning state is guarded by a lock; the codec itself runs
+    outside it.
+    """
+
+    def __init__(self, codec: Codec, level: Optional[int] = None, smoothing: float = 0.3,
+                 skip_ratio: float = 0.95, probe_interval: int = 8):
+        self.codec = codec
+        self.level = codec.default_level if level is None else level
+        self.fixed = level is not None
+        self.smoothing = smoothing
+        self.skip_ratio = skip_ratio
+        self.probe_interval = probe_interval
+        self.skipping = 0
+        self.cpu_rate: Optional[float] = None   # input bytes/s compressed
+        self.link_rate: Optional[float] = None  # wire bytes/s sent
+        self.ratio = 1.0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._lock = threading.Lock()
+
+    def _average(self, previous, value):
+        if previous is None:
+            return value
+        return previous + self.smoothing * (value - previous)
+
+    def compress(self, data):
+        """Compress one chunk at the current level; returns ``(payload, level)`` or ``(data, None)``"""
+        with self._lock:
+            if self.skipping:
+                self.skipping -= 1
+                return data, None
+            level = self.level
+        started = time.perf_counter()
+        compressed = self.codec.compress(data, level)
+        elapsed = max(time.perf_counter() - started, 1e-6)
+        ratio = len(compressed) / max(len(data), 1)
+        with self._lock:
+            # Rates are per level; drop a measurement taken at a level that was since changed
+            if level == self.level:
+                self.cpu_rate = self._average(self.cpu_rate, len(data) / elapsed)
+            self.ratio = self._average(self.ratio, ratio)
+            if ratio >= self.skip_ratio:
+                # Incompressible content: send it as-is and stop trying for a while
+                self.skipping = self.probe_interval
+                return data, None
+            self.bytes_in += len(data)
+            self.bytes_out += len(compressed)
+        return compressed, level
+
+    def record_send(self, wire_bytes: int, seconds: float):
+        """Feed back how long a chunk took to reach the socket, then adjust the level"""
+        if seconds <= 0:
+            return
+        with self._lock:
+            self.link_rate = self._average(self.link_rate, wire_bytes / seconds)
+            if self.fixed or self.skipping or self.cpu_rate is None:
+                return
+            # Input bytes per second the link can absorb at the current ratio
+            link_input_rate = self.link_rate / max(self.ratio, 0.01)
+            levels = self.codec.levels
+            if self.cpu_rate < link_input_rate and self.level > levels[0]:
+                self.level -= 1
+                # CPU rates are per level, so measure the new level afresh
+                self.cpu_rate = None
+            elif self.cpu_rate > 2 * link_input_rate and self.level < levels[-1]:
+                self.level += 1
+                self.cpu_rate = None
+
+    def describe(self):
+        with self._lock:
+            return {
+                'codec': self.codec.name,
+                'skipping': self.skipping,
+                'level': self.level,
+                'ratio': (self.bytes_out / self.bytes_in) if self.bytes_in else None,
+                'cpu_rate': self.cpu_rate,
+                'link_rate': self.link_rate,
+            }
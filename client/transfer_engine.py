@@ -0,0 +1,371 @@
+import asyncio
+import base64
+import itertools
+import logging
+import time
+from typing import Dict, List, Optional
+
+import frame_protocol
+from send_queue import PRIORITY_FILE
+from transfer_compression import CompressionTuner, get_codec, is_compressed_type
+
+
+class Transfer:
+    """State of one download: its byte range, how far it got and its reader.
+
+    ``ranges`` holds further ``(offset, length)`` ranges to send once the
+    current one is done, as used by delta downloads. ``kind`` is 'file' or
+    'directory'; directories are sent as a tar archive.
+    """
+
+    def __init__(self, transfer_id: int, path: str, offset: int, length: Optional[int], binary: bool,
+                 ranges: Optional[List[tuple]] = None, kind: str = 'file',
+                 tuner: Optional[CompressionTuner] = None):
+        self.transfer_id = transfer_id
+        self.path = path
+        self.start = offset
+        self.end = None if length is None else offset + length
+        self.position = offset
+        self.binary = binary
+        self.ranges = list(ranges or [])
+        self.kind = kind
+        self.tuner = tuner
+        self.seq = 0
+        self.status = 'queued'
+        self.error = None
+        self._reader = None
+        self._pending = None
+
+    def describe(self):
+        return {
+            'transfer_id': self.transfer_id,
+            'path': self.path,
+            'kind': self.kind,
+            'offset': self.start,
+            'position': self.position,
+            'end': self.end,
+            'ranges': self.ranges,
+            'status': self.status,
+            'error': self.error,
+            'compression': self.tuner.describe() if self.tuner else None,
+        }
+
+
+class TransferEngine:
+    """Run file downloads concurrently with a fair round-robin scheduler.
+
+    Each active transfer reads ahead one chunk on the file manager's I/O pool
+    while the scheduler sends one chunk per transfer in turn, so a large file
+    cannot starve smaller ones. Transfers are byte ranges and can be resumed
+    from any offset, e.g. after a reconnect.
+    """
+
+    def __init__(self, file_manager, send, max_active: int = 4):
+        self.logger = logging.getLogger(__name__)
+        self.file_manager = file_manager
+        self.send = send
+        self.max_active = max_active
+        self.transfers: Dict[int, Transfer] = {}
+        self._ids = itertools.count(1)
+        self._wakeup = asyncio.Event()
+        self._pump_task = None
+
+    def _ensure_pump(self):
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        self._wakeup.set()
+
+    @staticmethod
+    def _tuner(path, compression, level, kind='file'):
+        """Compression state for a transfer, or None when it is off or pointless for the file type"""
+        if not compression or (kind == 'file' and is_compressed_type(path)):
+            return None
+        return CompressionTuner(get_codec(compression), None if level is None else int(level))
+
+    def _start(self, transfer):
+        self.transfers[transfer.transfer_id] = transfer
+        transfer.status = 'active'
+        self._ensure_pump()
+        return transfer.describe()
+
+    @staticmethod
+    def _normalize_id(transfer_id) -> int:
+        """Transfer ids are ints; receivers may send them as strings"""
+        try:
+            return int(transfer_id)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid transfer id: {transfer_id!r}")
+
+    def _new_id(self, transfer_id):
+        if transfer_id is None:
+            transfer_id = next(self._ids)
+            while transfer_id in self.transfers:
+                transfer_id = next(self._ids)
+            return transfer_id
+        transfer_id = self._normalize_id(transfer_id)
+        if transfer_id in self.transfers:
+            raise ValueError(f"Transfer {transfer_id} already exists")
+        return transfer_id
+
+    def download(self, path, offset=0, length=None, transfer_id=None, binary=False,
+                 compression=None, level=None):
+        """Queue a download of ``path`` from ``offset`` for ``length`` bytes (to EOF if None).
+
+        ``compression`` names a codec ('zlib', 'lzma', 'zstd' or 'auto');
+        without ``level`` the level follows link and CPU throughput.
+        """
+        tuner = self._tuner(path, compression, level)
+        transfer = Transfer(self._new_id(transfer_id), path, int(offset or 0), length, binary, tuner=tuner)
+        return self._start(transfer)
+
+    def download_directory(self, path, offset=0, transfer_id=None, binary=False,
+                           compression=None, level=None):
+        """Queue a directory as a tar archive streamed from ``offset`` into the archive"""
+        tuner = self._tuner(path, compression, level, kind='directory')
+        transfer = Transfer(self._new_id(transfer_id), path, int(offset or 0), None, binary,
+                            kind='directory', tuner=tuner)
+        return self._start(transfer)
+
+    @staticmethod
+    def _coalesce(chunks):
+        """Merge adjacent ``[offset, length, hash]`` chunks into byte ranges"""
+        ranges = []
+        for offset, length, _ in chunks:
+            if ranges and ranges[-1][0] + ranges[-1][1] == offset:
+                ranges[-1][1] += length
+            else:
+                ranges.append([offset, length])
+        return ranges
+
+    async def download_delta(self, path, have, transfer_id=None, binary=False):
+        """Send only the chunks of ``path`` whose hashes are not in ``have``.
+
+        The receiver passes the chunk hashes of its own copy; the response
+        carries this file's manifest so it can rebuild the file from the
+        chunks it holds plus the ranges streamed by this transfer.
+        """
+        manifest = await self.file_manager.get_manifest(path)
+        if not manifest['success']:
+            raise ValueError(manifest['error'])
+        have = set(have or ())
+        ranges = self._coalesce(chunk for chunk in manifest['chunks'] if chunk[2] not in have)
+        result = {
+            'path': path,
+            'size': manifest['size'],
+            'chunks': manifest['chunks'],
+            'missing': ranges,
+            'bytes_to_send': sum(length for _, length in ranges),
+        }
+        if not ranges:
+            result['status'] = 'complete'
+            return result
+
+        offset, length = ranges[0]
+        transfer = Transfer(self._new_id(transfer_id), path, offset, length, binary, ranges[1:])
+        result.update(self._start(transfer))
+        return result
+
+    def resume(self, transfer_id, offset=None, binary=None):
+        """Continue a paused transfer from ``offset``, normally the bytes the receiver holds"""
+        transfer_id = self._normalize_id(transfer_id)
+        transfer = self.transfers.get(transfer_id)
+        if transfer is None:
+            raise ValueError(f"Unknown transfer: {transfer_id}")
+        self._close_reader(transfer)
+        if offset is not None:
+            transfer.position = int(offset)
+        if binary is not None:
+            transfer.binary = binary
+        transfer.status = 'active'
+        self._ensure_pump()
+        return transfer.describe()
+
+    def cancel(self, transfer_id):
+        transfer_id = self._normalize_id(transfer_id)
+        transfer = self.transfers.pop(transfer_id, None)
+        if transfer is None:
+            raise ValueError(f"Unknown transfer: {transfer_id}")
+        self._close_reader(transfer)
+        transfer.status = 'cancelled'
+        return transfer.describe()
+
+    def pause_all(self):
+        """Pause every transfer, e.g. when the connection drops; they keep their position"""
+        for transfer in self.transfers.values():
+            if transfer.status == 'active':
+                transfer.status = 'paused'
+            self._close_reader(transfer)
+
+    def discard_paused(self):
+        """Forget paused transfers, e.g. when no receiver is left to resume them"""
+        paused = [transfer for transfer in self.transfers.values() if transfer.status == 'paused']
+        for transfer in paused:
+            self.transfers.pop(transfer.transfer_id, None)
+            self._close_reader(transfer)
+            transfer.status = 'cancelled'
+        return len(paused)
+
+    def restart_paused(self):
+        """Resume paused transfers from the start of their current range.
+
+        For transfers the server holds no offset for: none of their chunks
+        reached it, so the receiver has nothing yet.
+        """
+        paused = [transfer for transfer in self.transfers.values() if transfer.status == 'paused']
+        for transfer in paused:
+            self.resume(transfer.transfer_id, transfer.start)
+        return len(paused)
+
+    def list_transfers(self):
+        return [transfer.describe() for transfer in self.transfers.values()]
+
+    @staticmethod
+    async def _discard(pending, reader):
+        if pending is not None:
+            pending.cancel()
+            try:
+                await pending
+            except (asyncio.CancelledError, StopAsyncIteration):
+                pass
+        if reader is not None:
+            await reader.aclose()
+
+    def _close_reader(self, transfer):
+        """Stop a transfer's read-ahead and close its file"""
+        if transfer._pending is not None or transfer._reader is not None:
+            asyncio.ensure_future(self._discard(transfer._pending, transfer._reader))
+        transfer._pending = None
+        transfer._reader = None
+
+    def _prefetch(self, transfer):
+        """Start reading (and compressing) the transfer's next chunk in the background"""
+        if transfer._reader is None:
+            if transfer.kind == 'directory':
+                transfer._reader = self.file_manager.read_directory_archive(
+                    transfer.path, raw=True, offset=transfer.position
+                )
+            else:
+                length = None if transfer.end is None else transfer.end - transfer.position
+                transfer._reader = self.file_manager.read_file_chunks(
+                    transfer.path, raw=True, offset=transfer.position, length=length
+                )
+        transfer._pending = asyncio.ensure_future(self._read_next(transfer, transfer._reader))
+
+    async def _read_next(self, transfer, reader):
+        item = await reader.__anext__()
+        if 'chunk' in item and transfer.tuner is not None:
+            loop = asyncio.get_running_loop()
+            payload, level = await loop.run_in_executor(
+                self.file_manager._executor, transfer.tuner.compress, item['chunk']
+            )
+            if level is not None:
+                # Offsets, lengths and checksums keep describing the uncompressed bytes
+                item['chunk'] = payload
+                item['encoding'] = transfer.tuner.codec.name
+                item['level'] = level
+                item['compressed_length'] = len(payload)
+        return item
+
+    async def _next_item(self, transfer):
+        if transfer._pending is None:
+            self._prefetch(transfer)
+        item = await transfer._pending
+        transfer._pending = None
+        if 'chunk' in item:
+            # Read ahead while this chunk is being sent
+            self._prefetch(transfer)
+        return item
+
+    def _chunk_message(self, transfer, item):
+        transfer.seq += 1
+        if transfer.binary:
+            chunk = item.pop('chunk')
+            return frame_protocol.pack_message(
+                frame_protocol.FILE_CHUNK, transfer.transfer_id, transfer.seq, chunk,
+                {'file_path': transfer.path, 'transfer_id': transfer.transfer_id, **item}
+            )
+        item['chunk'] = base64.b64encode(item['chunk']).decode('utf-8')
+        return {
+            'type': 'file_chunk',
+            'file_path': transfer.path,
+            'transfer_id': transfer.transfer_id,
+            'seq': transfer.seq,
+            **item
+        }
+
+    async def _step(self, transfer):
+        """Send the transfer's next chunk, or its completion/error message"""
+        try:
+            item = await self._next_item(transfer)
+        except StopAsyncIteration:
+            item = {'complete': True}
+
+        if 'chunk' in item:
+            end = item['offset'] + item['length']
+            if transfer.tuner is None:
+                await self.send(self._chunk_message(transfer, item), PRIORITY_FILE)
+            else:
+                # Wait for the write so the tuner sees real link throughput
+                wire_bytes = len(item['chunk'])
+                started = time.perf_counter()
+                await self.send(self._chunk_message(transfer, item), PRIORITY_FILE, wait=True)
+                transfer.tuner.record_send(wire_bytes, time.perf_counter() - started)
+            transfer.position = end
+            return
+
+        if 'error' not in item and transfer.ranges:
+            # Move on to the next range of a delta download
+            self._close_reader(transfer)
+            offset, length = transfer.ranges.pop(0)
+            transfer.start = transfer.position = offset
+            transfer.end = offset + length
+            return
+
+        # Completion or error ends the transfer
+        self.transfers.pop(transfer.transfer_id, None)
+        self._close_reader(transfer)
+        transfer.status = 'failed' if 'error' in item else 'complete'
+        transfer.error = item.get('error')
+        await self.send({
+            'type': 'file_chunk',
+            'file_path': transfer.path,
+            'transfer_id': transfer.transfer_id,
+            **item
+        }, PRIORITY_FILE)
+
+    async def _pump(self):
+        while True:
+            active = [t for t in self.transfers.values() if t.status == 'active'][:self.max_active]
+            if not active:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            # One chunk per active transfer per round keeps the schedule fair
+            for transfer in active:
+                if transfer.status != 'active':
+                    continue
+                try:
+                    await self._step(transfer)
+                except ConnectionError:
+                    self.pause_all()
+                    break
+                except Exception as e:
+                    self.logger.error(f"Transfer {transfer.transfer_id} error: {str(e)}")
+                    await self._fail(transfer, str(e))
+
+    async def _fail(self, transfer, error):
+        """Drop a transfer that cannot continue and tell the receiver"""
+        self.transfers.pop(transfer.transfer_id, None)
+        self._close_reader(transfer)
+        transfer.status = 'failed'
+        transfer.error = error
+        try:
+            await self.send({
+                'type': 'file_chunk',
+                'file_path': transfer.path,
+                'transfer_id': transfer.transfer_id,
+                'error': error
+            }, PRIORITY_FILE)
+        except ConnectionError:
+            pass
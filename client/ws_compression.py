@@ -0,0 +1,177 @@
+import re
+import threading
+from typing import Dict, Optional
+
+from websockets import frames
+from websockets.extensions.permessage_deflate import ClientPerMessageDeflateFactory, PerMessageDeflate
+
+# Message types sent uncompressed by default: their payloads are JPEG/PNG
+# data, file contents or ciphertext, which deflate cannot shrink
+BYPASS_TYPES = ('file_chunk', 'screen_frame', 'screenshot', 'encrypted')
+
+# Accepted ranges for the integer network settings
+SETTING_LIMITS = {
+    'compressionLevel': (0, 9),
+    'compressionWindowBits': (9, 15),
+    'compressionMemLevel': (1, 9),
+    'compressionMinSize': (0, 1 << 30),
+}
+FLAG_SETTINGS = ('compression', 'compressBinary')
+
+# json.dumps writes keys in insertion order and every message starts with its type
+_MESSAGE_TYPE = re.compile(rb'\{"type": ?"([A-Za-z0-9_]+)"')
+
+
+def validate_settings(settings: Dict[str, object]) -> Dict[str, object]:
+    """Checked copy of network settings; raises ValueError on unknown keys or out-of-range values"""
+    validated = {}
+    for key, value in settings.items():
+        if key in FLAG_SETTINGS:
+            if not isinstance(value, bool):
+                raise ValueError(f"{key} must be true or false")
+            validated[key] = value
+        elif key in SETTING_LIMITS:
+            low, high = SETTING_LIMITS[key]
+            if isinstance(value, bool) or not isinstance(value, int) or not low <= value <= high:
+                raise ValueError(f"{key} must be an integer between {low} and {high}")
+            validated[key] = value
+        else:
+            raise ValueError(f"Unknown network setting: {key}")
+    return validated
+
+
+class CompressionPolicy:
+    """Decide per message whether permessage-deflate compresses it, and count the result.
+
+    Binary messages (frames, file chunks, screenshots) bypass compression
+    unless ``compress_binary`` is set. Text messages are compressed when
+    they are at least ``min_size`` bytes and their type is not bypassed.
+    Counters survive reconnects.
+    """
+
+    def __init__(self, min_size: int = 256, compress_binary: bool = False, bypass_types=BYPASS_TYPES):
+        self.min_size = min_size
+        self.compress_binary = compress_binary
+        self.bypass_types = set(bypass_types)
+        self.counters: Dict[str, Dict[str, int]] = {}
+        self.inbound = {'messages': 0, 'wire_bytes': 0, 'bytes': 0}
+        self._lock = threading.Lock()
+
+    def decide(self, frame: frames.Frame):
+        """``(compress, category)`` for the first frame of an outgoing message"""
+        if frame.opcode is frames.OP_BINARY:
+            return self.compress_binary, 'binary'
+        match = _MESSAGE_TYPE.match(frame.data, 0, 64)
+        category = match.group(1).decode() if match else 'text'
+        if category in self.bypass_types or len(frame.data) < self.min_size:
+            return False, category
+        return True, category
+
+    def record(self, category: str, first: bool, compressed: bool, size: int, wire_size: int):
+        with self._lock:
+            counters = self.counters.get(category)
+            if counters is None:
+                counters = self.counters[category] = {
+                    'messages': 0, 'compressed': 0, 'bytes': 0, 'wire_bytes': 0
+                }
+            if first:
+                counters['messages'] += 1
+                counters['compressed'] += compressed
+            counters['bytes'] += size
+            counters['wire_bytes'] += wire_size
+
+    def record_inbound(self, wire_size: int, size: int):
+        with self._lock:
+            self.inbound['messages'] += 1
+            self.inbound['wire_bytes'] += wire_size
+            self.inbound['bytes'] += size
+
+    def stats(self) -> Dict[str, object]:
+        """Bytes before (``bytes``) and after (``wire_bytes``) compression, per message type"""
+        with self._lock:
+            by_type = {category: dict(counters) for category, counters in self.counters.items()}
+            inbound = dict(self.inbound)
+        for counters in by_type.values():
+            counters['ratio'] = counters['wire_bytes'] / counters['bytes'] if counters['bytes'] else 1.0
+        total = sum(counters['bytes'] for counters in by_type.values())
+        wire = sum(counters['wire_bytes'] for counters in by_type.values())
+        return {
+            'outbound': by_type,
+            'inbound_compressed': inbound,
+            'bytes': total,
+            'wire_bytes': wire,
+            'ratio': wire / total if total else 1.0,
+        }
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.inbound = {'messages': 0, 'wire_bytes': 0, 'bytes': 0}
+
+
+class PolicyDeflate(PerMessageDeflate):
+    """permessage-deflate that leaves messages uncompressed when the policy says so.
+
+    RFC 7692 lets a sender clear RSV1 on any message; uncompressed messages
+    do not touch the shared LZ77 context, so the peer needs no changes.
+    """
+
+    def __init__(self, policy: CompressionPolicy, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.policy = policy
+        # Decision for the message in progress, followed by its continuation frames
+        self._compressing = False
+        self._category = 'text'
+
+    def encode(self, frame: frames.Frame) -> frames.Frame:
+        if frame.opcode in frames.CTRL_OPCODES:
+            return frame
+        first = frame.opcode is not frames.OP_CONT
+        if first:
+            self._compressing, self._category = self.policy.decide(frame)
+        if not self._compressing:
+            self.policy.record(self._category, first, False, len(frame.data), len(frame.data))
+            return frame
+        encoded = super().encode(frame)
+        self.policy.record(self._category, first, True, len(frame.data), len(encoded.data))
+        return encoded
+
+    def decode(self, frame: frames.Frame, *, max_size: Optional[int] = None) -> frames.Frame:
+        decoded = super().decode(frame, max_size=max_size)
+        if decoded is not frame:
+            self.policy.record_inbound(len(frame.data), len(decoded.data))
+        return decoded
+
+
+class PolicyDeflateFactory(ClientPerMessageDeflateFactory):
+    """Negotiates permessage-deflate like the stock factory, but builds a ``PolicyDeflate``"""
+
+    def __init__(self, policy: CompressionPolicy, **kwargs):
+        super().__init__(**kwargs)
+        self.policy = policy
+
+    def process_response_params(self, params, accepted_extensions):
+        extension = super().process_response_params(params, accepted_extensions)
+        return PolicyDeflate(
+            self.policy,
+            extension.remote_no_context_takeover,
+            extension.local_no_context_takeover,
+            extension.remote_max_window_bits,
+            extension.local_max_window_bits,
+            extension.compress_settings,
+        )
+
+
+def client_extensions(policy: CompressionPolicy, level: int = 6, window_bits: int = 12, mem_level: int = 5):
+    """Extension list for ``websockets.connect``.
+
+    ``window_bits`` caps the LZ77 window in both directions (2**bits bytes),
+    and with ``mem_level`` bounds the zlib memory each side spends per
+    connection; ``level`` trades CPU for ratio on the client's messages.
+    """
+    return [PolicyDeflateFactory(
+        policy,
+        server_max_window_bits=window_bits,
+        client_max_window_bits=window_bits,
+        compress_settings={'level': level, 'memLevel': mem_level},
+    )]
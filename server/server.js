@@ -14,29 +14,86 @@ const io = new Server(httpServer, {
 const WebSocket = require('ws');
 const http = require('http');
 const url = require('url');
+const crypto = require('crypto');
 
 const server = http.createServer();
-const wss = new WebSocket.Server({ server });
+// permessage-deflate is negotiated per connection, but only JSON is
+// compressed: binary frames, file chunks and screenshots are sent as-is
+// (see client/ws_compression.py for the client's side of the policy)
+const wss = new WebSocket.Server({
+    server,
+    perMessageDeflate: {
+        zlibDeflateOptions: {
+            level: parseInt(process.env.DEFLATE_LEVEL || '6', 10),
+            memLevel: parseInt(process.env.DEFLATE_MEM_LEVEL || '5', 10)
+        },
+        serverMaxWindowBits: parseInt(process.env.DEFLATE_WINDOW_BITS || '12', 10),
+        // Messages smaller than this are not worth compressing
+        threshold: 256
+    }
+});
 
 const clients = new Map();
 let nextClientId = 1;
 
+// Version of the binary frame protocol (see client/frame_protocol.py)
+const BINARY_FRAME_VERSION = 1;
+const FRAME_HEADER_SIZE = 20;
+const FILE_CHUNK = 2;
+
+// Logical channels multiplexed on each desktop client's connection
+// (see client/send_queue.py). Binary messages are assigned a channel by
+// message type; JSON messages name theirs and default to control.
+const CHANNELS = ['input', 'control', 'file', 'video'];
+const BINARY_CHANNELS = { 1: 'video', 2: 'file', 3: 'file' };
+const MAX_WINDOW = 64 * 1024 * 1024;
+// Bulk credit is held back while one of the agent's viewers has more than
+// this still buffered; input and control credit is never held back
+const VIEWER_BUFFER_LIMIT = 1024 * 1024;
+const BULK_CHANNELS = new Set(['file', 'video']);
+const CREDIT_RETRY_MS = 50;
+
+// A disconnected client's session (id, token, transfer offsets, queued
+// commands) is kept this long so a reconnect can resume it
+const SESSION_GRACE_MS = parseInt(process.env.SESSION_GRACE_MS || '120000', 10);
+const MAX_PENDING_COMMANDS = 100;
+
 wss.on('connection', (ws) => {
     ws.isAlive = true;
     ws.on('pong', () => { ws.isAlive = true; });
 
-    ws.on('message', (message) => {
+    ws.on('message', (message, isBinary) => {
+        if (isBinary) {
+            if (!ws.clientId) {
+                // From a viewer: upload chunks for the desktop client named in the metadata
+                relayViewerBinary(ws, message);
+                return;
+            }
+            // Binary screen frames, file chunks and screenshots are relayed untouched
+            recordBinaryFileChunk(ws, message);
+            broadcastToWebClients(ws, message, true);
+            consumeWindow(ws, BINARY_CHANNELS[message[3]] || 'control', message.length);
+            return;
+        }
+
         try {
             const data = JSON.parse(message);
             
             if (data.type === 'register') {
                 handleClientRegistration(ws, data);
+            } else if (ws.clientId) {
+                // Everything a desktop client sends is for the web clients
+                if (data.type === 'file_chunk') {
+                    recordFileChunk(ws, data);
+                }
+                broadcastToWebClients(ws, data);
+                consumeWindow(ws, data.channel || 'control', message.length);
             } else if (data.type === 'screen_frame') {
                 // Forward screen frames directly to the web client
                 broadcastToWebClients(ws, data);
             } else if (data.client_id) {
                 // Forward command to specific client
-                handleClientCommand(data);
+                handleClientCommand(ws, data);
             }
         } catch (error) {
             console.error('Error processing message:', error);
@@ -44,45 +101,230 @@ wss.on('connection', (ws) => {
     });
 
     ws.on('close', () => {
-        // Remove client when disconnected
-        for (const [clientId, client] of clients.entries()) {
-            if (client.ws === ws) {
-                clients.delete(clientId);
-                broadcastClientList();
-                break;
+        clearTimeout(ws.creditTimer);
+        if (!ws.clientId) {
+            for (const client of clients.values()) {
+                client.viewers.delete(ws);
             }
+            return;
         }
+        // Keep the session for a grace period so the client can resume it
+        const client = ws.clientId && clients.get(ws.clientId);
+        if (!client || client.ws !== ws) {
+            return;
+        }
+        client.ws = null;
+        client.expiry = setTimeout(() => {
+            clients.delete(ws.clientId);
+            broadcastClientList();
+        }, SESSION_GRACE_MS);
+        broadcastClientList();
     });
 });
 
 function handleClientRegistration(ws, data) {
     const clientId = data.client_id || `client_${nextClientId++}`;
-    clients.set(clientId, {
-        ws,
-        info: data.system_info || {},
-        type: 'desktop_client'
-    });
+    const existing = clients.get(clientId);
+    const resumed = Boolean(existing && data.session_token && data.session_token === existing.token);
+    let client;
+
+    if (resumed) {
+        // Reattach the session: same id, transfer offsets and queued commands
+        client = existing;
+        clearTimeout(client.expiry);
+        client.expiry = null;
+        if (client.ws && client.ws !== ws) {
+            client.ws.terminate();
+        }
+        client.ws = ws;
+        if (data.system_info) {
+            client.info = data.system_info;
+        }
+    } else {
+        if (existing) {
+            clearTimeout(existing.expiry);
+        }
+        client = {
+            ws,
+            token: crypto.randomBytes(24).toString('hex'),
+            info: data.system_info || {},
+            type: 'desktop_client',
+            transfers: new Map(),
+            // Viewers that have sent this client commands
+            viewers: new Set(),
+            pending: [],
+            expiry: null
+        };
+        clients.set(clientId, client);
+    }
+    ws.clientId = clientId;
     
-    // Send confirmation to client
+    // Send confirmation to client, accepting binary framing when offered
+    const capabilities = data.capabilities || {};
+    ws.flowControl = acceptWindows(capabilities.flow_control);
+    ws.consumed = {};
     ws.send(JSON.stringify({
         type: 'registration_complete',
-        client_id: clientId
+        client_id: clientId,
+        session_token: client.token,
+        resumed,
+        // Bytes of each unfinished download that reached the server
+        transfers: Array.from(client.transfers, ([transferId, offset]) => ({ transfer_id: transferId, offset })),
+        binary_frames: capabilities.binary_frames === BINARY_FRAME_VERSION ? BINARY_FRAME_VERSION : 0,
+        flow_control: ws.flowControl
     }));
 
+    // Commands that arrived while the client was away
+    for (const command of client.pending.splice(0)) {
+        ws.send(command);
+    }
+
     broadcastClientList();
 }
 
-function handleClientCommand(data) {
+function acceptWindows(requested) {
+    if (!requested || typeof requested !== 'object') {
+        return null;
+    }
+    const windows = {};
+    for (const channel of CHANNELS) {
+        const size = Number(requested[channel]);
+        if (size > 0) {
+            windows[channel] = Math.min(size, MAX_WINDOW);
+        }
+    }
+    return Object.keys(windows).length ? windows : null;
+}
+
+function viewerBacklog(ws) {
+    // Measured on the viewers working with this client; until one has sent
+    // it a command its traffic is only being broadcast, so all viewers count
+    const client = clients.get(ws.clientId);
+    const viewers = client && client.viewers.size ? client.viewers : wss.clients;
+    let backlog = 0;
+    viewers.forEach((viewer) => {
+        if (!viewer.clientId && viewer.readyState === WebSocket.OPEN) {
+            backlog = Math.max(backlog, viewer.bufferedAmount);
+        }
+    });
+    return backlog;
+}
+
+function consumeWindow(ws, channel, bytes) {
+    const window = ws.flowControl && ws.flowControl[channel];
+    if (!window) {
+        return;
+    }
+    ws.consumed[channel] = (ws.consumed[channel] || 0) + bytes;
+    returnCredit(ws);
+}
+
+function returnCredit(ws) {
+    // Relaying only buffers data for the viewers, so bulk credit goes back
+    // once half a window has been relayed *and* the client's viewers have
+    // drained their send buffers. Until then the bulk channel stays blocked
+    // instead of piling data up in the viewers' bufferedAmount. Input and
+    // control are small and must never wait behind a slow viewer.
+    if (ws.readyState !== WebSocket.OPEN) {
+        return;
+    }
+    let backlogged = false;
+    let backlog = null;
+    for (const [channel, consumed] of Object.entries(ws.consumed)) {
+        if (consumed < ws.flowControl[channel] / 2) {
+            continue;
+        }
+        if (BULK_CHANNELS.has(channel)) {
+            if (backlog === null) {
+                backlog = viewerBacklog(ws);
+            }
+            if (backlog >= VIEWER_BUFFER_LIMIT) {
+                backlogged = true;
+                continue;
+            }
+        }
+        ws.consumed[channel] = 0;
+        ws.send(JSON.stringify({ type: 'window_update', channel, increment: consumed }));
+    }
+    if (backlogged && !ws.creditTimer) {
+        ws.creditTimer = setTimeout(() => {
+            ws.creditTimer = null;
+            returnCredit(ws);
+        }, CREDIT_RETRY_MS);
+    }
+}
+
+function recordFileChunk(ws, meta) {
+    const client = ws.clientId && clients.get(ws.clientId);
+    if (!client || meta.transfer_id === undefined) {
+        return;
+    }
+    if (meta.complete || meta.error) {
+        client.transfers.delete(meta.transfer_id);
+    } else if (meta.offset !== undefined && meta.length !== undefined) {
+        client.transfers.set(meta.transfer_id, meta.offset + meta.length);
+    }
+}
+
+function recordBinaryFileChunk(ws, message) {
+    if (!ws.clientId || message.length < FRAME_HEADER_SIZE || message[3] !== FILE_CHUNK) {
+        return;
+    }
+    try {
+        recordFileChunk(ws, binaryMeta(message));
+    } catch (error) {
+        console.error('Invalid file chunk metadata:', error);
+    }
+}
+
+function binaryMeta(message) {
+    // Header layout matches HEADER in client/frame_protocol.py
+    const metaLength = message.readUInt16BE(6);
+    return JSON.parse(message.subarray(FRAME_HEADER_SIZE, FRAME_HEADER_SIZE + metaLength));
+}
+
+function relayViewerBinary(ws, message) {
+    if (message.length < FRAME_HEADER_SIZE) {
+        return;
+    }
+    let meta;
+    try {
+        meta = binaryMeta(message);
+    } catch (error) {
+        console.error('Invalid binary message metadata:', error);
+        return;
+    }
+    const targetClient = meta && clients.get(meta.client_id);
+    if (!targetClient) {
+        return;
+    }
+    targetClient.viewers.add(ws);
+    // Not queued while the client is away: unacknowledged chunks are resent
+    if (targetClient.ws && targetClient.ws.readyState === WebSocket.OPEN) {
+        targetClient.ws.send(message, { binary: true, compress: false });
+    }
+}
+
+function handleClientCommand(ws, data) {
     const targetClient = clients.get(data.client_id);
-    if (targetClient && targetClient.ws.readyState === WebSocket.OPEN) {
+    if (!targetClient) {
+        return;
+    }
+    targetClient.viewers.add(ws);
+    if (targetClient.ws && targetClient.ws.readyState === WebSocket.OPEN) {
         targetClient.ws.send(JSON.stringify(data));
+    } else if (targetClient.pending.length < MAX_PENDING_COMMANDS) {
+        // Delivered if the client resumes its session in time
+        targetClient.pending.push(JSON.stringify(data));
     }
 }
 
-function broadcastToWebClients(sourceWs, data) {
+function broadcastToWebClients(sourceWs, data, isBinary = false) {
+    const payload = isBinary ? data : JSON.stringify(data);
     wss.clients.forEach((client) => {
-        if (client !== sourceWs && client.readyState === WebSocket.OPEN) {
-            client.send(JSON.stringify(data));
+        // Desktop clients (registered sockets) are not viewers
+        if (client !== sourceWs && !client.clientId && client.readyState === WebSocket.OPEN) {
+            client.send(payload, { binary: isBinary, compress: !isBinary });
         }
     });
 }
@@ -90,7 +332,8 @@ function broadcastToWebClients(sourceWs, data) {
 function broadcastClientList() {
     const clientList = Array.from(clients.entries()).map(([id, client]) => ({
         id,
-        ...client.info
+        ...client.info,
+        connected: client.ws !== null
     }));
 
     wss.clients.forEach((client) => {
@@ -1,7 +1,7 @@
 'use client';
 
 import { useEffect, useRef, useState } from 'react';
-import { Box, Paper, LoadingOverlay, Slider, Group, ActionIcon, Stack } from '@mantine/core';
+import { Box, Paper, LoadingOverlay, Slider, Group, ActionIcon, Stack, SegmentedControl } from '@mantine/core';
 import { IconMaximize, IconMinimize, IconAdjustments } from '@tabler/icons-react';
 import { wsService } from '@/services/websocket';
 import { useNotifications } from '@/context/NotificationContext';
@@ -15,6 +15,11 @@ export default function RemoteControl({ clientId }) {
     quality: 50,
     scale: 0.75
   });
+  // Each monitor or region is its own stream, drawn on its own offscreen canvas
+  const streamsRef = useRef(new Map());
+  const selectedStreamRef = useRef(null);
+  const [streamIds, setStreamIds] = useState([]);
+  const [selectedStream, setSelectedStream] = useState(null);
   const { showStreamNotification } = useNotifications();
 
   useEffect(() => {
@@ -38,14 +43,63 @@ export default function RemoteControl({ clientId }) {
           settings: streamSettings
         });
 
-        wsService.onMessage('screen_frame', ({ data, width, height }) => {
-          setIsLoading(false);
+        // Keyframes replace a stream's whole canvas, delta frames patch changed tiles
+        streamsRef.current = new Map();
+        selectedStreamRef.current = null;
+        const streamState = (streamId) => {
+          let state = streamsRef.current.get(streamId);
+          if (!state) {
+            const frameCanvas = document.createElement('canvas');
+            state = { frameCanvas, frameCtx: frameCanvas.getContext('2d'), hasKeyframe: false };
+            streamsRef.current.set(streamId, state);
+            if (selectedStreamRef.current === null) {
+              selectedStreamRef.current = streamId;
+              setSelectedStream(streamId);
+            }
+            setStreamIds(Array.from(streamsRef.current.keys()));
+          }
+          return state;
+        };
+
+        const drawTile = (frameCtx, data, format, x, y, w, h) => new Promise((resolve) => {
           const img = new Image();
           img.onload = () => {
-            ctx.clearRect(0, 0, canvas.width, canvas.height);
-            ctx.drawImage(img, 0, 0, canvas.width, canvas.height);
+            frameCtx.drawImage(img, x, y, w, h);
+            if (data instanceof Blob) URL.revokeObjectURL(img.src);
+            resolve();
           };
-          img.src = `data:image/jpeg;base64,${data}`;
+          img.onerror = resolve;
+          // Binary frames arrive as Blobs, JSON frames as base64 strings
+          img.src = data instanceof Blob ? URL.createObjectURL(data) : `data:image/${format};base64,${data}`;
+        });
+
+        wsService.onMessage('screen_frame', async ({
+          stream_id: streamId = 0, data, width, height, keyframe = true, tiles = [], format = 'jpeg'
+        }) => {
+          const state = streamState(streamId);
+          const { frameCanvas, frameCtx } = state;
+          if (keyframe) {
+            frameCanvas.width = width;
+            frameCanvas.height = height;
+            await drawTile(frameCtx, data, format, 0, 0, width, height);
+            state.hasKeyframe = true;
+          } else if (state.hasKeyframe) {
+            await Promise.all(tiles.map((tile) => (
+              drawTile(frameCtx, tile.data, format, tile.x, tile.y, tile.width, tile.height)
+            )));
+          } else {
+            wsService.sendCommand(clientId, { action: 'request_keyframe', stream_id: streamId });
+            return;
+          }
+          if (streamId !== selectedStreamRef.current) return;
+          setIsLoading(false);
+          ctx.clearRect(0, 0, canvas.width, canvas.height);
+          ctx.drawImage(frameCanvas, 0, 0, canvas.width, canvas.height);
+        });
+
+        // Cursor moves arrive separately from frames; mirror the remote shape
+        wsService.onMessage('cursor', ({ shape }) => {
+          if (shape) canvas.style.cursor = shape;
         });
 
         showStreamNotification('started');
@@ -54,6 +108,28 @@ export default function RemoteControl({ clientId }) {
       }
     };
 
+    // Input is batched per animation frame; mousemoves are coalesced on the client
+    let pendingInput = [];
+    let flushScheduled = false;
+
+    const flushInput = () => {
+      flushScheduled = false;
+      if (!pendingInput.length) return;
+      const events = pendingInput;
+      pendingInput = [];
+      wsService.sendCommand(clientId, { action: 'input_batch', events });
+    };
+
+    const queueInput = (inputEvent, immediate = false) => {
+      pendingInput.push({ ...inputEvent, t: performance.now() });
+      if (immediate) {
+        flushInput();
+      } else if (!flushScheduled) {
+        flushScheduled = true;
+        animationFrame = requestAnimationFrame(flushInput);
+      }
+    };
+
     const handleMouseEvent = (event) => {
       if (!canvas) return;
 
@@ -61,12 +137,14 @@ export default function RemoteControl({ clientId }) {
       const x = (event.clientX - rect.left) / canvas.width;
       const y = (event.clientY - rect.top) / canvas.height;
 
-      wsService.sendCommand(clientId, {
-        action: 'mouse_event',
+      queueInput({
+        kind: 'mouse',
         event_type: event.type,
+        // Coordinates are relative to the stream being shown
+        stream_id: selectedStreamRef.current,
         x,
         y
-      });
+      }, event.type !== 'mousemove');
     };
 
     const handleKeyEvent = (event) => {
@@ -75,12 +153,12 @@ export default function RemoteControl({ clientId }) {
       if (event.altKey) modifiers.push('alt');
       if (event.shiftKey) modifiers.push('shift');
 
-      wsService.sendCommand(clientId, {
-        action: 'keyboard_event',
+      queueInput({
+        kind: 'key',
         event_type: event.type,
         key: event.key,
         modifiers
-      });
+      }, true);
     };
 
     if (canvas && clientId) {
@@ -123,6 +201,19 @@ export default function RemoteControl({ clientId }) {
     setIsFullscreen(!isFullscreen);
   };
 
+  const selectStream = (value) => {
+    const streamId = Number(value);
+    selectedStreamRef.current = streamId;
+    setSelectedStream(streamId);
+    const state = streamsRef.current.get(streamId);
+    const canvas = canvasRef.current;
+    if (state && state.hasKeyframe && canvas) {
+      const ctx = canvas.getContext('2d');
+      ctx.clearRect(0, 0, canvas.width, canvas.height);
+      ctx.drawImage(state.frameCanvas, 0, 0, canvas.width, canvas.height);
+    }
+  };
+
   const updateStreamSettings = (newSettings) => {
     setStreamSettings(prev => {
       const updated = { ...prev, ...newSettings };
@@ -137,6 +228,13 @@ export default function RemoteControl({ clientId }) {
   return (
     <Stack spacing="md">
       <Group position="right" spacing="xs">
+        {streamIds.length > 1 && (
+          <SegmentedControl
+            value={String(selectedStream)}
+            onChange={selectStream}
+            data={streamIds.map((streamId, index) => ({ value: String(streamId), label: `Screen ${index + 1}` }))}
+          />
+        )}
         <Slider
           label="Quality"
           min={10}
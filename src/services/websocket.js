@@ -1,5 +1,43 @@
 import { io } from 'socket.io-client';
 
+// Binary frame protocol (see client/frame_protocol.py): 20 byte header,
+// JSON metadata, then raw payload bytes.
+const BINARY_HEADER_SIZE = 20;
+const BINARY_MESSAGE_TYPES = { 1: 'screen_frame', 2: 'file_chunk', 3: 'screenshot' };
+const FLAG_KEYFRAME = 0x01;
+
+function decodeBinaryMessage(buffer) {
+  const view = new DataView(buffer);
+  const msgType = view.getUint8(3);
+  const flags = view.getUint8(4);
+  const metaLength = view.getUint16(6);
+  const streamId = view.getUint32(8);
+  const seq = view.getUint32(12);
+  const payloadLength = view.getUint32(16);
+  const metaBytes = new Uint8Array(buffer, BINARY_HEADER_SIZE, metaLength);
+  const meta = metaLength ? JSON.parse(new TextDecoder().decode(metaBytes)) : {};
+  const payloadOffset = BINARY_HEADER_SIZE + metaLength;
+  const message = { ...meta, type: BINARY_MESSAGE_TYPES[msgType], stream_id: streamId, seq };
+
+  if (message.type === 'screen_frame') {
+    const mimeType = `image/${meta.format || 'jpeg'}`;
+    message.keyframe = Boolean(flags & FLAG_KEYFRAME);
+    if (message.keyframe) {
+      message.data = new Blob([new Uint8Array(buffer, payloadOffset, payloadLength)], { type: mimeType });
+    } else {
+      let offset = payloadOffset;
+      message.tiles = (meta.tiles || []).map(([x, y, width, height, length]) => {
+        const data = new Blob([new Uint8Array(buffer, offset, length)], { type: mimeType });
+        offset += length;
+        return { x, y, width, height, data };
+      });
+    }
+  } else {
+    message.data = new Uint8Array(buffer, payloadOffset, payloadLength);
+  }
+  return message;
+}
+
 class WebSocketService {
   constructor() {
     this.socket = null;
@@ -13,6 +51,7 @@ class WebSocketService {
     return new Promise((resolve, reject) => {
       try {
         this.socket = new WebSocket(url);
+        this.socket.binaryType = 'arraybuffer';
 
         this.socket.onopen = () => {
           this.reconnectAttempts = 0;
@@ -30,7 +69,9 @@ class WebSocketService {
 
         this.socket.onmessage = (event) => {
           try {
-            const message = JSON.parse(event.data);
+            const message = event.data instanceof ArrayBuffer
+              ? decodeBinaryMessage(event.data)
+              : JSON.parse(event.data);
             this.handleMessage(message);
           } catch (error) {
             console.error('Error parsing message:', error);